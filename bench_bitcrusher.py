@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for Bitcrusher
+
+Builds synthetic WAV files (mono/stereo, 8/16/24-bit PCM and 32-bit float,
+any duration) and times the paths the app depends on: loading peaks (cold
+and from the peak cache), querying the peak pyramid for a view, rendering
+every preset, and, when GTK and a display are available, setting and
+drawing a WaveformWidget offscreen.
+
+Each case runs in a fresh process, so its peak RSS is its own. Results are
+reported as latency percentiles, samples/s and peak RSS, optionally saved
+as JSON, and can be checked against a saved baseline:
+
+    python3 bench_bitcrusher.py --durations 10 60 -o baseline.json
+    python3 bench_bitcrusher.py --durations 10 60 --baseline baseline.json
+
+A run fails (exit code 1) when any case is slower or bigger than its
+baseline by more than the tolerance.
+"""
+
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bitcrusher as bc
+
+# Encodings of the synthetic inputs: the app's own output formats
+FORMATS = list(bc.OUTPUT_FORMATS)
+CHANNELS = {"mono": 1, "stereo": 2, "5.1": 6}
+SAMPLE_RATE = 44100
+
+# Width in pixels of the drawn and queried waveform views
+VIEW_WIDTH = 1200
+VIEW_HEIGHT = 120
+
+RESULTS_VERSION = 1
+
+
+class Skip(Exception):
+    """Raised by a case that can't run in this environment"""
+
+
+def write_synthetic_wav(path, n_channels, fmt, seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """Write a sine-plus-noise WAV a block at a time, encoded by the app's WavWriter"""
+    n_frames = int(seconds * sample_rate)
+    rng = np.random.default_rng(seed)
+
+    with bc.WavWriter(path, n_channels, sample_rate, fmt) as writer:
+        for start in range(0, n_frames, bc.BLOCK_FRAMES):
+            n = min(bc.BLOCK_FRAMES, n_frames - start)
+            t = np.arange(start, start + n) / sample_rate
+            block = 0.5 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, 0.1, (n_channels, n))
+            writer.write(np.clip(block, -1, 1))
+    return path
+
+
+def _gui_widget():
+    """A WaveformWidget and cairo, or Skip if there is no GTK or display"""
+    try:
+        import cairo
+        import bitcrusher_gui
+        from gi.repository import Gtk
+    except (ImportError, ValueError) as e:
+        raise Skip(f"GUI unavailable: {e}")
+    if not Gtk.init_check():
+        raise Skip("GUI unavailable: no display")
+    return bitcrusher_gui.WaveformWidget(), cairo
+
+
+def case_load_peaks(path, workdir):
+    """Open a file and build its peak pyramid (a cold `load_waveform`)"""
+    with bc.WavReader(path) as reader:
+        samples = reader.n_frames * reader.n_channels
+
+    def run():
+        with bc.WavReader(path) as reader:
+            bc.PeakPyramid.from_reader(reader)
+    return run, samples
+
+
+def case_load_peaks_cached(path, workdir):
+    """Open a file and load its peaks from the peak cache (a warm `load_waveform`)"""
+    cache = bc.PeakCache(os.path.join(workdir, "peaks"))
+    with bc.WavReader(path) as reader:
+        samples = reader.n_frames * reader.n_channels
+        cache.store(reader, bc.PeakPyramid.from_reader(reader))
+
+    def run():
+        with bc.WavReader(path) as reader:
+            if cache.load(reader) is None:
+                raise RuntimeError("peak cache missed")
+    return run, samples
+
+
+def case_peak_query(path, workdir):
+    """Query one view-width of columns, from the whole file down to 1/1024 of it"""
+    reader = bc.WavReader(path)
+    pyramid = bc.PeakPyramid.from_reader(reader)
+    spans = [pyramid.n_samples / 2 ** i for i in range(0, 11)]
+
+    def run():
+        for span in spans:
+            start = (pyramid.n_samples - span) / 2
+            pyramid.query(start, start + span, VIEW_WIDTH)
+    return run, None
+
+
+def case_render(preset):
+    def case(path, workdir):
+        params = bc.CrushParams.from_preset(preset)
+        output = os.path.join(workdir, f"render-{preset}.wav")
+        with bc.WavReader(path) as reader:
+            samples = reader.n_frames * reader.n_channels
+
+        def run():
+            bc.render_stream(path, output, params, log=lambda line: None)
+        return run, samples
+    case.__doc__ = f"Streaming render with the {preset} preset"
+    return case
+
+
+def case_audition(path, workdir):
+    """Every preset rendered from one shared decode (compare with one render/<preset>)"""
+    with bc.WavReader(path) as reader:
+        samples = reader.n_frames * reader.n_channels * len(bc.PRESETS)
+
+    def run():
+        for _ in bc.audition_presets(path):
+            pass
+    return run, samples
+
+
+def case_pipeline_mix(path, workdir):
+    """Re-render after a mix-only change, reusing the cached wet stage"""
+    pipeline = bc.RenderPipeline(path)
+    params = bc.CrushParams.from_preset("sega")
+    pipeline.render(params)
+    mixes = iter(np.tile([0.5, 0.6], 1000))
+
+    def run():
+        pipeline.render(bc.replace(params, mix=float(next(mixes))))
+    return run, pipeline.dry.size
+
+
+def case_gui_set_waveform(path, workdir):
+    """WaveformWidget.set_waveform with a prebuilt pyramid"""
+    widget, _ = _gui_widget()
+    with bc.WavReader(path) as reader:
+        pyramid = bc.PeakPyramid.from_reader(reader)
+
+    def run():
+        widget.set_waveform(pyramid)
+    return run, pyramid.n_samples
+
+
+def case_gui_draw(path, workdir):
+    """Offscreen WaveformWidget.on_draw of the whole file, cache cold"""
+    widget, cairo = _gui_widget()
+    widget.set_waveform(bc.PeakPyramid.from_reader(bc.WavReader(path)))
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, VIEW_WIDTH, VIEW_HEIGHT)
+
+    def run():
+        widget.waveform_cache = None
+        widget.on_draw(widget, cairo.Context(surface), VIEW_WIDTH, VIEW_HEIGHT)
+        surface.flush()
+    return run, None
+
+
+CASES = {
+    "load_peaks": case_load_peaks,
+    "load_peaks_cached": case_load_peaks_cached,
+    "peak_query": case_peak_query,
+    **{f"render/{preset}": case_render(preset) for preset in bc.PRESETS},
+    "audition": case_audition,
+    "pipeline/mix": case_pipeline_mix,
+    "gui/set_waveform": case_gui_set_waveform,
+    "gui/draw": case_gui_draw,
+}
+
+
+def _run_case(name, path, workdir, repeat):
+    """Set up and time one case (runs in its own process)"""
+    try:
+        run, samples = CASES[name](path, workdir)
+        run()  # Warm up caches and lazy imports
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+    except Skip as e:
+        return {"skipped": str(e)}
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    result = {
+        "repeat": repeat,
+        "min_s": min(latencies),
+        "p50_s": float(p50),
+        "p90_s": float(p90),
+        "p99_s": float(p99),
+        "peak_rss_mib": bc.peak_rss() / 2 ** 20,
+    }
+    if samples:
+        result["samples_per_s"] = samples / float(p50)
+    return result
+
+
+def run_benchmarks(formats, channels, durations, patterns, repeat, workdir, log=print):
+    """Run every selected case on every selected file; returns {case id: result}"""
+    names = [name for name in CASES if any(fnmatch.fnmatch(name, p) for p in patterns)]
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for seconds in durations:
+        for fmt in formats:
+            for layout in channels:
+                label = f"{fmt}/{layout}/{seconds:g}s"
+                path = os.path.join(workdir, f"{fmt}-{layout}-{seconds:g}s.wav")
+                if not os.path.exists(path):
+                    write_synthetic_wav(path, CHANNELS[layout], fmt, seconds)
+                for name in names:
+                    # A fresh process per case keeps peak RSS per case
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(_run_case, name, path, workdir, repeat).result()
+                    case_id = f"{name}@{label}"
+                    results[case_id] = result
+                    log(format_result(case_id, result))
+    return results
+
+
+def _format_rate(samples_per_s):
+    return f"{samples_per_s / 1e6:8.1f} M samples/s"
+
+
+def format_result(case_id, result, baseline=None):
+    if "skipped" in result:
+        return f"{case_id:<42} skipped ({result['skipped']})"
+    line = (f"{case_id:<42} p50 {result['p50_s'] * 1000:9.2f} ms  "
+            f"p90 {result['p90_s'] * 1000:9.2f} ms  p99 {result['p99_s'] * 1000:9.2f} ms  "
+            f"{result['peak_rss_mib']:7.1f} MiB")
+    if "samples_per_s" in result:
+        line += f"  {_format_rate(result['samples_per_s'])}"
+    return line
+
+
+def compare(results, baseline, tolerance=0.25, rss_tolerance=0.25):
+    """Cases whose p50 or peak RSS regressed past the tolerances
+
+    Returns a list of (case id, metric, baseline value, current value).
+    Cases missing from either side, or skipped on either side, are ignored.
+    """
+    regressions = []
+    for case_id, result in results.items():
+        base = baseline.get(case_id)
+        if not base or "skipped" in base or "skipped" in result:
+            continue
+        if result["p50_s"] > base["p50_s"] * (1 + tolerance):
+            regressions.append((case_id, "p50_s", base["p50_s"], result["p50_s"]))
+        if result["peak_rss_mib"] > base["peak_rss_mib"] * (1 + rss_tolerance):
+            regressions.append((case_id, "peak_rss_mib", base["peak_rss_mib"],
+                                result["peak_rss_mib"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--formats', nargs='+', choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument('--channels', nargs='+', choices=list(CHANNELS), default=['mono', 'stereo'])
+    parser.add_argument('--durations', nargs='+', type=float, default=[10],
+                        metavar='SECONDS', help='Lengths of the synthetic files (default: 10)')
+    parser.add_argument('--cases', nargs='+', default=['*'], metavar='PATTERN',
+                        help=f"Glob patterns over case names: {', '.join(CASES)}")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Timed runs per case')
+    parser.add_argument('-o', '--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Fail if results regress against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p50 slowdown as a fraction (default: 0.25)')
+    parser.add_argument('--rss-tolerance', type=float, default=0.25,
+                        help='Allowed peak RSS growth as a fraction (default: 0.25)')
+    parser.add_argument('--workdir', help='Keep synthetic files here and reuse them')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = args.workdir or tmpdir
+        os.makedirs(workdir, exist_ok=True)
+        results = run_benchmarks(args.formats, args.channels, args.durations, args.cases,
+                                 args.repeat, workdir)
+
+    if args.output:
+        report = {
+            "version": RESULTS_VERSION,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        for case_id, metric, before, after in regressions:
+            print(f"✗ {case_id}: {metric} {before:.4g} -> {after:.4g} "
+                  f"({(after / before - 1) * 100:+.0f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
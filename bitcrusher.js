@@ -166,6 +166,60 @@ export class Bitcrusher {
 
     return output;
   }
+
+  /**
+   * Process any number of planar channels (e.g. 5.1 or 8-channel stems)
+   * Channels are filtered independently; with monoDownmix every channel
+   * holds the average of all input channels
+   * @param {Float32Array[]} channels - One array of samples per channel
+   * @param {number} sampleRate - Original sample rate
+   * @returns {Float32Array[]} Processed channels
+   */
+  processChannels(channels, sampleRate) {
+    const numChannels = channels.length;
+    const length = numChannels ? channels[0].length : 0;
+    const outputs = channels.map(() => new Float32Array(length));
+    const steps = Math.pow(2, this.bitDepth) - 1;
+
+    const holdSamples = new Array(numChannels).fill(0);
+    const filterStates = new Array(numChannels).fill(0);
+
+    for (let i = 0; i < length; i++) {
+      // Sample rate reduction
+      if (i % this.sampleRateReduction === 0) {
+        if (this.monoDownmix) {
+          let sum = 0;
+          for (let c = 0; c < numChannels; c++) {
+            sum += channels[c][i];
+          }
+          holdSamples.fill(sum / numChannels);
+        } else {
+          for (let c = 0; c < numChannels; c++) {
+            holdSamples[c] = channels[c][i];
+          }
+        }
+      }
+
+      for (let c = 0; c < numChannels; c++) {
+        // Bit depth reduction and hard clipping
+        let processed = Math.round(holdSamples[c] * steps) / steps;
+        processed = this.clip(processed, this.clipThreshold);
+
+        // Low-pass filter
+        if (this.lowpassFreq) {
+          const filtered = this.lowpass(processed, filterStates[c], this.lowpassFreq, sampleRate);
+          processed = filtered.output;
+          filterStates[c] = filtered.state;
+        }
+
+        // Mix wet/dry signal and clamp
+        outputs[c][i] = Math.max(-1, Math.min(1,
+          processed * this.mix + channels[c][i] * (1 - this.mix)));
+      }
+    }
+
+    return outputs;
+  }
 }
 
 /**
@@ -272,3 +326,34 @@ export const presets = {
     description: 'Maximum destruction'
   }
 };
+
+/**
+ * Output encodings as WAV format tag and bits per sample
+ */
+export const outputFormats = {
+  pcm8: { float: false, bitDepth: 8 },
+  pcm16: { float: false, bitDepth: 16 },
+  pcm24: { float: false, bitDepth: 24 },
+  float32: { float: true, bitDepth: 32 }
+};
+
+/**
+ * The "auto" output encoding: the smallest that keeps the crushed detail
+ *
+ * A fully wet signal without the low-pass filter only takes
+ * 2^bitDepth - 1 levels each side of zero, and two more bits keep every
+ * level at least one code apart after normalization. A dry mix or the
+ * filter brings back finer detail, which gets the input's own format.
+ */
+export function chooseOutputFormat(options, inputFormat) {
+  if (options.mix >= 1 && !options.lowpassFreq) {
+    const needed = Math.ceil(options.bitDepth) + 2;
+    for (const name of ['pcm8', 'pcm16', 'pcm24']) {
+      if (outputFormats[name].bitDepth >= needed) {
+        return name;
+      }
+    }
+    return 'float32';
+  }
+  return inputFormat;
+}
@@ -1,799 +1,2142 @@
 #!/usr/bin/env python3
 """
-Bitcrusher GUI - A GNOME application for applying bitcrusher effects to WAV files
+Bitcrusher - chiptune-style bitcrusher effects for WAV files
+
+This module holds the audio engine, WAV I/O, peak data and the headless
+batch command, and imports nothing from GTK or GStreamer. The GNOME GUI
+lives in bitcrusher_gui and is only loaded when the app is launched.
 """
 
-import gi
-import subprocess
+import argparse
+import atexit
+import glob
+import hashlib
+import json
+import math
 import os
+import resource
 import sys
 import struct
-import wave
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import parent_process
+from dataclasses import dataclass, replace
+from fractions import Fraction
 from pathlib import Path
 
-gi.require_version('Gtk', '4.0')
-gi.require_version('Adw', '1')
-gi.require_version('Gst', '1.0')
-
-from gi.repository import Gtk, Adw, Gio, GLib, Gst
-
-# Initialize GStreamer
-Gst.init(None)
-
-
-class WaveformWidget(Gtk.DrawingArea):
-    """Custom widget to draw audio waveform"""
-    def __init__(self):
-        super().__init__()
-        self.waveform_data = None
-        self.playback_position = 0.0  # 0.0 to 1.0
-        self.set_content_height(120)
-        self.set_draw_func(self.on_draw)
-
-    def set_waveform(self, samples):
-        """Set waveform data from audio samples"""
-        if samples is None or len(samples) == 0:
-            self.waveform_data = None
-        else:
-            # Downsample for display (max 2000 points)
-            target_points = 2000
-            step = max(1, len(samples) // target_points)
-
-            # Calculate min/max for each segment
-            downsampled = []
-            for i in range(0, len(samples), step):
-                segment = samples[i:i+step]
-                if len(segment) > 0:
-                    downsampled.append((min(segment), max(segment)))
-
-            self.waveform_data = downsampled
-
-        self.queue_draw()
-
-    def set_playback_position(self, position):
-        """Set playback position (0.0 to 1.0)"""
-        self.playback_position = max(0.0, min(1.0, position))
-        self.queue_draw()
-
-    def on_draw(self, area, cr, width, height):
-        """Draw the waveform"""
-        # Background
-        cr.set_source_rgb(0.95, 0.95, 0.95)
-        cr.rectangle(0, 0, width, height)
-        cr.fill()
-
-        if not self.waveform_data:
-            # Draw placeholder text
-            cr.set_source_rgb(0.5, 0.5, 0.5)
-            cr.select_font_face("Sans", 0, 0)
-            cr.set_font_size(14)
-            text = "No audio loaded"
-            extents = cr.text_extents(text)
-            cr.move_to((width - extents.width) / 2, (height + extents.height) / 2)
-            cr.show_text(text)
-            return
-
-        # Draw waveform
-        center_y = height / 2
-        scale_y = height / 2 * 0.9  # Leave some margin
-
-        cr.set_source_rgb(0.2, 0.6, 0.8)
-        cr.set_line_width(1)
-
-        points_per_pixel = len(self.waveform_data) / width
-
-        for x in range(width):
-            idx = int(x * points_per_pixel)
-            if idx < len(self.waveform_data):
-                min_val, max_val = self.waveform_data[idx]
-
-                y1 = center_y - (min_val * scale_y)
-                y2 = center_y - (max_val * scale_y)
-
-                cr.move_to(x, y1)
-                cr.line_to(x, y2)
-                cr.stroke()
-
-        # Draw playback position line
-        if self.playback_position > 0:
-            position_x = width * self.playback_position
-            cr.set_source_rgba(1, 0, 0, 0.7)
-            cr.set_line_width(2)
-            cr.move_to(position_x, 0)
-            cr.line_to(position_x, height)
-            cr.stroke()
-
-
-class BitcrusherWindow(Adw.ApplicationWindow):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        self.set_title("Bitcrusher")
-        self.set_default_size(600, 950)
-
-        # Main container
-        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-
-        # Header bar
-        header = Adw.HeaderBar()
-        self.main_box.append(header)
-
-        # Content area with margins
-        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=20)
-        content.set_margin_top(20)
-        content.set_margin_bottom(20)
-        content.set_margin_start(20)
-        content.set_margin_end(20)
-
-        # Input file section
-        input_group = Adw.PreferencesGroup()
-        input_group.set_title("Input File")
-
-        self.input_row = Adw.ActionRow()
-        self.input_row.set_title("Select WAV file")
-        self.input_row.set_subtitle("No file selected")
-
-        input_button = Gtk.Button(label="Browse")
-        input_button.set_valign(Gtk.Align.CENTER)
-        input_button.connect("clicked", self.on_input_file_clicked)
-        self.input_row.add_suffix(input_button)
-
-        input_group.add(self.input_row)
-        content.append(input_group)
-
-        # Preview section
-        preview_group = Adw.PreferencesGroup()
-        preview_group.set_title("Audio Preview")
-        preview_group.set_description("Visualize and compare original vs. processed audio")
-
-        # Original waveform
-        original_label = Gtk.Label(label="Original")
-        original_label.set_xalign(0)
-        original_label.set_margin_top(5)
-        preview_group.add(original_label)
-
-        self.original_waveform = WaveformWidget()
-        preview_group.add(self.original_waveform)
-
-        # Original playback controls
-        original_controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-        original_controls.set_margin_top(5)
-        original_controls.set_margin_bottom(10)
-
-        self.original_play_btn = Gtk.Button(icon_name="media-playback-start-symbolic")
-        self.original_play_btn.set_sensitive(False)
-        self.original_play_btn.connect("clicked", lambda b: self.toggle_playback("original"))
-        original_controls.append(self.original_play_btn)
-
-        self.original_stop_btn = Gtk.Button(icon_name="media-playback-stop-symbolic")
-        self.original_stop_btn.set_sensitive(False)
-        self.original_stop_btn.connect("clicked", lambda b: self.stop_playback("original"))
-        original_controls.append(self.original_stop_btn)
-
-        self.original_time_label = Gtk.Label(label="0:00 / 0:00")
-        self.original_time_label.set_margin_start(10)
-        original_controls.append(self.original_time_label)
-
-        preview_group.add(original_controls)
-
-        # Processed waveform
-        processed_label = Gtk.Label(label="Processed")
-        processed_label.set_xalign(0)
-        processed_label.set_margin_top(15)
-        preview_group.add(processed_label)
-
-        self.processed_waveform = WaveformWidget()
-        preview_group.add(self.processed_waveform)
-
-        # Processed playback controls
-        processed_controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-        processed_controls.set_margin_top(5)
-
-        self.processed_play_btn = Gtk.Button(icon_name="media-playback-start-symbolic")
-        self.processed_play_btn.set_sensitive(False)
-        self.processed_play_btn.connect("clicked", lambda b: self.toggle_playback("processed"))
-        processed_controls.append(self.processed_play_btn)
-
-        self.processed_stop_btn = Gtk.Button(icon_name="media-playback-stop-symbolic")
-        self.processed_stop_btn.set_sensitive(False)
-        self.processed_stop_btn.connect("clicked", lambda b: self.stop_playback("processed"))
-        processed_controls.append(self.processed_stop_btn)
-
-        self.processed_time_label = Gtk.Label(label="0:00 / 0:00")
-        self.processed_time_label.set_margin_start(10)
-        processed_controls.append(self.processed_time_label)
-
-        preview_group.add(processed_controls)
-
-        content.append(preview_group)
-
-        # Preset section
-        preset_group = Adw.PreferencesGroup()
-        preset_group.set_title("Effect Preset")
-        preset_group.set_description("Choose a classic console/computer preset or use custom settings")
-
-        preset_row = Adw.ComboRow()
-        preset_row.set_title("Preset")
-
-        # Create preset list
-        self.presets = Gtk.StringList()
-        self.preset_values = ["custom", "gameboy", "nes", "sega", "snes", "c64", "atari", "mild", "heavy", "extreme"]
-        preset_names = [
-            "Custom Settings",
-            "Game Boy",
-            "Nintendo NES",
-            "Sega Genesis",
-            "Super Nintendo",
-            "Commodore 64",
-            "Atari 2600",
-            "Mild Crunch",
-            "Heavy Crush",
-            "Extreme"
-        ]
-
-        for name in preset_names:
-            self.presets.append(name)
-
-        preset_row.set_model(self.presets)
-        preset_row.set_selected(0)
-        preset_row.connect("notify::selected", self.on_preset_changed)
-        self.preset_row = preset_row
-
-        preset_group.add(preset_row)
-        content.append(preset_group)
-
-        # Custom parameters section
-        self.params_group = Adw.PreferencesGroup()
-        self.params_group.set_title("Custom Parameters")
-
-        # Bit depth
-        self.bit_depth_row = Adw.SpinRow()
-        self.bit_depth_row.set_title("Bit Depth")
-        self.bit_depth_row.set_subtitle("Lower values = more lo-fi sound (1-16)")
-        adjustment = Gtk.Adjustment(value=8, lower=1, upper=16, step_increment=1)
-        self.bit_depth_row.set_adjustment(adjustment)
-        self.bit_depth_row.set_digits(0)
-        self.params_group.add(self.bit_depth_row)
-
-        # Sample rate reduction
-        self.sample_rate_row = Adw.SpinRow()
-        self.sample_rate_row.set_title("Sample Rate Reduction")
-        self.sample_rate_row.set_subtitle("Higher values = more aliasing (1-32)")
-        adjustment = Gtk.Adjustment(value=4, lower=1, upper=32, step_increment=1)
-        self.sample_rate_row.set_adjustment(adjustment)
-        self.sample_rate_row.set_digits(0)
-        self.params_group.add(self.sample_rate_row)
-
-        # Mix
-        self.mix_row = Adw.SpinRow()
-        self.mix_row.set_title("Wet/Dry Mix")
-        self.mix_row.set_subtitle("0.0 = original, 1.0 = fully crushed")
-        adjustment = Gtk.Adjustment(value=1.0, lower=0.0, upper=1.0, step_increment=0.1)
-        self.mix_row.set_adjustment(adjustment)
-        self.mix_row.set_digits(1)
-        self.params_group.add(self.mix_row)
-
-        content.append(self.params_group)
-
-        # Output section
-        output_group = Adw.PreferencesGroup()
-        output_group.set_title("Output")
-
-        self.output_row = Adw.ActionRow()
-        self.output_row.set_title("Output file")
-        self.output_row.set_subtitle("Auto-generated from input filename")
-
-        output_button = Gtk.Button(label="Change")
-        output_button.set_valign(Gtk.Align.CENTER)
-        output_button.connect("clicked", self.on_output_file_clicked)
-        self.output_row.add_suffix(output_button)
-
-        output_group.add(self.output_row)
-        content.append(output_group)
-
-        # Process button
-        self.process_button = Gtk.Button(label="Process Audio")
-        self.process_button.add_css_class("suggested-action")
-        self.process_button.add_css_class("pill")
-        self.process_button.set_sensitive(False)
-        self.process_button.connect("clicked", self.on_process_clicked)
-        self.process_button.set_margin_top(10)
-        content.append(self.process_button)
-
-        # Progress bar
-        self.progress_bar = Gtk.ProgressBar()
-        self.progress_bar.set_margin_top(10)
-        self.progress_bar.set_show_text(True)
-        self.progress_bar.set_visible(False)
-        content.append(self.progress_bar)
-
-        # Status text view for detailed output
-        self.status_frame = Gtk.Frame()
-        self.status_frame.set_margin_top(10)
-        self.status_frame.set_visible(False)
-
-        status_scroll = Gtk.ScrolledWindow()
-        status_scroll.set_min_content_height(150)
-        status_scroll.set_max_content_height(200)
-
-        self.status_buffer = Gtk.TextBuffer()
-        self.status_view = Gtk.TextView()
-        self.status_view.set_buffer(self.status_buffer)
-        self.status_view.set_editable(False)
-        self.status_view.set_wrap_mode(Gtk.WrapMode.WORD)
-        self.status_view.set_margin_top(5)
-        self.status_view.set_margin_bottom(5)
-        self.status_view.set_margin_start(5)
-        self.status_view.set_margin_end(5)
-
-        status_scroll.set_child(self.status_view)
-        self.status_frame.set_child(status_scroll)
-        content.append(self.status_frame)
-
-        # Status label
-        self.status_label = Gtk.Label(label="")
-        self.status_label.set_wrap(True)
-        self.status_label.set_margin_top(10)
-        content.append(self.status_label)
-
-        # Scroll window
-        scrolled = Gtk.ScrolledWindow()
-        scrolled.set_child(content)
-        scrolled.set_vexpand(True)
-
-        self.main_box.append(scrolled)
-        self.set_content(self.main_box)
-
-        # State
-        self.input_file = None
-        self.output_file = None
-        self.process = None
-        self.process_watch_id = None
-
-        # Audio players
-        self.original_player = None
-        self.processed_player = None
-        self.original_duration = 0
-        self.processed_duration = 0
-        self.update_position_id = None
-
-    def on_preset_changed(self, combo_row, param):
-        selected = combo_row.get_selected()
-        if selected == 0:  # Custom
-            self.params_group.set_sensitive(True)
-        else:
-            self.params_group.set_sensitive(False)
-
-    def on_input_file_clicked(self, button):
-        dialog = Gtk.FileDialog()
-
-        # Add WAV filter
-        wav_filter = Gtk.FileFilter()
-        wav_filter.set_name("WAV files")
-        wav_filter.add_pattern("*.wav")
-        wav_filter.add_pattern("*.WAV")
-
-        all_filter = Gtk.FileFilter()
-        all_filter.set_name("All files")
-        all_filter.add_pattern("*")
-
-        filters = Gio.ListStore.new(Gtk.FileFilter)
-        filters.append(wav_filter)
-        filters.append(all_filter)
-        dialog.set_filters(filters)
-        dialog.set_default_filter(wav_filter)
-
-        dialog.open(self, None, self.on_input_file_selected)
-
-    def on_input_file_selected(self, dialog, result):
-        try:
-            file = dialog.open_finish(result)
-            if file:
-                self.input_file = file.get_path()
-                self.input_row.set_subtitle(os.path.basename(self.input_file))
-
-                # Auto-generate output filename
-                path = Path(self.input_file)
-                self.output_file = str(path.parent / f"{path.stem}_crushed{path.suffix}")
-                self.output_row.set_subtitle(os.path.basename(self.output_file))
-
-                self.process_button.set_sensitive(True)
-
-                # Load waveform and setup player
-                samples, duration = self.load_waveform(self.input_file)
-                if samples:
-                    self.original_waveform.set_waveform(samples)
-                    self.setup_player(self.input_file, "original")
-                    self.original_play_btn.set_sensitive(True)
-                    self.original_stop_btn.set_sensitive(True)
-                    self.update_time_label("original", 0)
-
-        except Exception as e:
-            print(f"Error selecting file: {e}")
-
-    def on_output_file_clicked(self, button):
-        dialog = Gtk.FileDialog()
-        dialog.set_initial_name("output_crushed.wav")
-
-        # Add WAV filter
-        wav_filter = Gtk.FileFilter()
-        wav_filter.set_name("WAV files")
-        wav_filter.add_pattern("*.wav")
-
-        filters = Gio.ListStore.new(Gtk.FileFilter)
-        filters.append(wav_filter)
-        dialog.set_filters(filters)
-
-        dialog.save(self, None, self.on_output_file_selected)
-
-    def on_output_file_selected(self, dialog, result):
+import numpy as np
+
+
+# Effect presets, mirroring `presets` in bitcrusher.js
+PRESETS = {
+    # Classic 8-bit consoles
+    "gameboy": {
+        "name": "Game Boy",
+        "bit_depth": 4,
+        "sample_rate_reduction": 8,
+        "mix": 1.0,
+        "lowpass_freq": 4000,
+        "hard_clip": True,
+        "clip_threshold": 0.85,
+        "mono_downmix": True,
+        "description": "Classic Game Boy lo-fi sound with mono output",
+    },
+    "nes": {
+        "name": "Nintendo NES",
+        "bit_depth": 4,
+        "sample_rate_reduction": 6,
+        "mix": 1.0,
+        "lowpass_freq": 8000,
+        "hard_clip": True,
+        "clip_threshold": 0.9,
+        "mono_downmix": True,
+        "description": "Nintendo Entertainment System style (mono)",
+    },
+    "sega": {
+        "name": "Sega Genesis/Mega Drive",
+        "bit_depth": 8,
+        "sample_rate_reduction": 3,
+        "mix": 1.0,
+        "lowpass_freq": 12000,
+        "hard_clip": False,
+        "mono_downmix": False,
+        "description": "Sega Genesis FM synthesis style (stereo)",
+    },
+    "snes": {
+        "name": "Super Nintendo",
+        "bit_depth": 8,
+        "sample_rate_reduction": 2,
+        "mix": 0.9,
+        "lowpass_freq": 15000,
+        "hard_clip": False,
+        "mono_downmix": False,
+        "description": "SNES higher quality samples (stereo)",
+    },
+    # Retro computers
+    "c64": {
+        "name": "Commodore 64",
+        "bit_depth": 8,
+        "sample_rate_reduction": 4,
+        "mix": 1.0,
+        "lowpass_freq": 6000,
+        "hard_clip": True,
+        "clip_threshold": 0.8,
+        "mono_downmix": True,
+        "description": "C64 SID chip sound (mono)",
+    },
+    "atari": {
+        "name": "Atari 2600",
+        "bit_depth": 3,
+        "sample_rate_reduction": 10,
+        "mix": 1.0,
+        "lowpass_freq": 3000,
+        "hard_clip": True,
+        "clip_threshold": 0.75,
+        "mono_downmix": True,
+        "description": "Extremely lo-fi Atari 2600 sound (mono)",
+    },
+    # Modern interpretations
+    "mild": {
+        "name": "Mild Crunch",
+        "bit_depth": 12,
+        "sample_rate_reduction": 2,
+        "mix": 0.7,
+        "lowpass_freq": None,
+        "hard_clip": False,
+        "mono_downmix": False,
+        "description": "Subtle vintage digital sound",
+    },
+    "heavy": {
+        "name": "Heavy Crush",
+        "bit_depth": 6,
+        "sample_rate_reduction": 8,
+        "mix": 1.0,
+        "lowpass_freq": 5000,
+        "hard_clip": True,
+        "clip_threshold": 0.7,
+        "mono_downmix": False,
+        "description": "Aggressive bitcrushed sound",
+    },
+    "extreme": {
+        "name": "Extreme",
+        "bit_depth": 2,
+        "sample_rate_reduction": 16,
+        "mix": 1.0,
+        "lowpass_freq": 2000,
+        "hard_clip": True,
+        "clip_threshold": 0.6,
+        "mono_downmix": True,
+        "description": "Maximum destruction",
+    },
+}
+
+# Frames processed per engine block. Must stay a multiple of _TILE ** 2 so
+# the lowpass scan lines up the same way however a signal is split.
+BLOCK_FRAMES = 65536
+_TILE = 64
+
+# Peak level normalized output is scaled to (matches index.js)
+NORMALIZE_HEADROOM = 0.95
+
+# Minimum seconds between progress events within a render stage
+PROGRESS_INTERVAL = 0.05
+
+# Frames per live preview buffer (~93 ms at 44.1 kHz); a multiple of
+# _TILE ** 2 so the preview matches a render before normalization
+PREVIEW_BLOCK_FRAMES = 4096
+
+# Seconds an A/B switch takes to crossfade between the two signals
+AB_CROSSFADE = 0.01
+
+# Fewest channels a render splits across threads; stereo is cheaper as
+# two rows of one vectorized block than as two thread hand-offs
+PARALLEL_MIN_CHANNELS = 3
+
+# Setting this to a file path turns profiling on and writes the spans
+# there at exit (Chrome trace format if the name ends in .trace.json)
+PROFILE_ENV = "BITCRUSHER_PROFILE"
+
+
+@dataclass(frozen=True)
+class CrushParams:
+    """Fully resolved effect parameters, defaults as in the JS Bitcrusher"""
+    bit_depth: float = 8
+    sample_rate_reduction: float = 4
+    mix: float = 1.0
+    lowpass_freq: float | None = None
+    hard_clip: bool = False
+    clip_threshold: float = 0.8
+    mono_downmix: bool = False
+
+    @classmethod
+    def from_preset(cls, name):
+        """Build parameters from a named preset"""
         try:
-            file = dialog.save_finish(result)
-            if file:
-                self.output_file = file.get_path()
-                self.output_row.set_subtitle(os.path.basename(self.output_file))
-        except Exception as e:
-            print(f"Error selecting output file: {e}")
-
-    def on_process_clicked(self, button):
-        if not self.input_file:
-            self.show_error("Please select an input file")
+            preset = PRESETS[name.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown preset \"{name}\"") from None
+        fields = {key: value for key, value in preset.items()
+                  if key not in ("name", "description")}
+        return cls(**fields)
+
+    def canonical(self):
+        """Equivalent parameters with settings that have no effect reset
+
+        Two parameter sets that render the same audio compare equal after
+        this, which makes the result usable as a cache key.
+        """
+        return CrushParams(
+            bit_depth=float(self.bit_depth),
+            sample_rate_reduction=float(self.sample_rate_reduction),
+            mix=float(self.mix),
+            lowpass_freq=float(self.lowpass_freq) if self.lowpass_freq else None,
+            hard_clip=bool(self.hard_clip),
+            clip_threshold=float(self.clip_threshold) if self.hard_clip else CrushParams.clip_threshold,
+            mono_downmix=bool(self.mono_downmix),
+        )
+
+
+class ProgressReporter:
+    """Rate-limited progress events, delivered as `callback(stage, done, total)`
+
+    Counts are samples (frames x channels). The first event of a stage and
+    the one completing it always get through; others at most every
+    `interval` seconds, so a fast engine can't flood the receiver.
+    """
+    def __init__(self, callback=None, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.stage = None
+        self.last = 0.0
+
+    def __call__(self, stage, done, total):
+        if self.callback is None:
             return
-
-        # Disable button during processing
-        self.process_button.set_sensitive(False)
-
-        # Show progress UI
-        self.progress_bar.set_visible(True)
-        self.progress_bar.set_fraction(0.0)
-        self.progress_bar.set_text("Starting...")
-        self.status_frame.set_visible(True)
-        self.status_buffer.set_text("")
-        self.status_label.set_text("")
-
-        # Build command
-        script_dir = Path(__file__).parent
-        node_cmd = ["node", str(script_dir / "index.js"), "process", self.input_file, self.output_file]
-
-        # Add preset or custom parameters
-        selected = self.preset_row.get_selected()
-        if selected == 0:  # Custom
-            node_cmd.extend(["-b", str(int(self.bit_depth_row.get_value()))])
-            node_cmd.extend(["-s", str(int(self.sample_rate_row.get_value()))])
-            node_cmd.extend(["-m", str(self.mix_row.get_value())])
+        now = time.monotonic()
+        if stage != self.stage or done >= total or now - self.last >= self.interval:
+            self.stage = stage
+            self.last = now
+            self.callback(stage, done, total)
+
+
+def _report(progress, stage, frames, total_frames, n_channels):
+    """Send a progress event counted in samples, if anyone is listening"""
+    if progress is not None:
+        progress(stage, frames * n_channels, total_frames * n_channels)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes"""
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class _Span:
+    """One timed region; nested spans add their time to the parent's stages"""
+    __slots__ = ("profiler", "name", "args", "start", "stages")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.stages = {}
+
+    def __enter__(self):
+        self.profiler._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            parent = stack[-1].stages
+            parent[self.name] = parent.get(self.name, 0.0) + end - self.start
+        self.profiler.record(self.name, self.start, end, self.args, self.stages,
+                             top_level=not stack)
+
+
+class _NoSpan:
+    """Shared do-nothing span handed out while profiling is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Profiler:
+    """Timing spans around engine stages, off unless enabled
+
+    `span(name, **args)` times the body of a `with` block. While disabled
+    it returns a shared no-op, so instrumented code costs one call per
+    block. Spans are kept (up to `max_spans`) for `dump`, and every
+    top-level span becomes the latest result for its name, with the time
+    of the spans nested in it summed per stage. Times are
+    `time.perf_counter` seconds.
+    """
+    def __init__(self, enabled=False, max_spans=100000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.latest = {}
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start, end, args=None, stages=None, top_level=True, pid=None):
+        """Add a span measured elsewhere, e.g. across callbacks or in a worker"""
+        span = (name, start, end - start, pid or os.getpid(), threading.get_ident(), args or {})
+        with self._lock:
+            self.spans.append(span)
+            if top_level:
+                self.latest[name] = {"seconds": end - start, "stages": dict(stages or {}),
+                                     "args": args or {}}
+
+    def extend(self, spans):
+        """Add spans kept by another profiler, such as a worker process's"""
+        with self._lock:
+            self.spans.extend(spans)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.latest.clear()
+        self.origin = time.perf_counter()
+
+    def stats(self):
+        """Latest top-level spans by name, per-name totals and peak RSS"""
+        with self._lock:
+            spans = list(self.spans)
+            latest = {name: dict(entry) for name, entry in self.latest.items()}
+        totals = {}
+        for name, _, duration, *_ in spans:
+            count, seconds, longest = totals.get(name, (0, 0.0, 0.0))
+            totals[name] = (count + 1, seconds + duration, max(longest, duration))
+        return {
+            "latest": latest,
+            "totals": {name: {"count": count, "seconds": seconds, "max_seconds": longest}
+                       for name, (count, seconds, longest) in totals.items()},
+            "peak_rss_bytes": peak_rss(),
+        }
+
+    def chrome_trace(self):
+        """Spans as Chrome trace events (chrome://tracing, Perfetto)"""
+        with self._lock:
+            spans = list(self.spans)
+        events = [{"name": name, "cat": "bitcrusher", "ph": "X",
+                   "ts": (start - self.origin) * 1e6, "dur": duration * 1e6,
+                   "pid": pid, "tid": tid, "args": args}
+                  for name, start, duration, pid, tid, args in spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path, trace_format=None):
+        """Write spans and stats as "json", or as a "chrome" trace
+
+        The format defaults to "chrome" for names ending in .trace.json.
+        """
+        if trace_format is None:
+            trace_format = "chrome" if path.endswith(".trace.json") else "json"
+        if trace_format == "chrome":
+            report = self.chrome_trace()
         else:
-            preset = self.preset_values[selected]
-            node_cmd.extend(["-p", preset])
-
-        # Run process asynchronously
-        try:
-            self.process = subprocess.Popen(
-                node_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                cwd=str(script_dir)
-            )
-
-            # Watch stdout for updates
-            GLib.io_add_watch(
-                self.process.stdout,
-                GLib.IO_IN | GLib.IO_HUP,
-                self.on_process_output
-            )
-
-            # Watch stderr for errors
-            GLib.io_add_watch(
-                self.process.stderr,
-                GLib.IO_IN | GLib.IO_HUP,
-                self.on_process_error
-            )
-
-            # Check process completion
-            GLib.timeout_add(100, self.check_process_completion)
-
-        except Exception as e:
-            self.append_status(f"✗ Error starting process: {str(e)}\n")
-            self.finish_processing(False)
-
-    def on_process_output(self, source, condition):
-        """Handle stdout output from the processing subprocess"""
-        if condition == GLib.IO_HUP:
-            return False
-
-        line = source.readline()
-        if line:
-            self.append_status(line)
-            self.update_progress_from_output(line)
-
-        return True
-
-    def on_process_error(self, source, condition):
-        """Handle stderr output from the processing subprocess"""
-        if condition == GLib.IO_HUP:
-            return False
-
-        line = source.readline()
-        if line:
-            self.append_status(f"⚠ {line}")
-
-        return True
-
-    def append_status(self, text):
-        """Append text to the status buffer"""
-        end_iter = self.status_buffer.get_end_iter()
-        self.status_buffer.insert(end_iter, text)
-
-        # Auto-scroll to bottom
-        mark = self.status_buffer.create_mark(None, end_iter, False)
-        self.status_view.scroll_to_mark(mark, 0.0, True, 0.0, 1.0)
-
-    def update_progress_from_output(self, line):
-        """Update progress bar based on output text"""
-        line = line.strip()
-
-        if "Reading:" in line:
-            self.progress_bar.set_fraction(0.1)
-            self.progress_bar.set_text("Reading input file...")
-        elif "Sample Rate:" in line or "Channels:" in line:
-            self.progress_bar.set_fraction(0.2)
-            self.progress_bar.set_text("Analyzing audio...")
-        elif "Applying bitcrusher effect:" in line:
-            self.progress_bar.set_fraction(0.3)
-            self.progress_bar.set_text("Applying effect...")
-        elif "Normalizing output" in line:
-            self.progress_bar.set_fraction(0.8)
-            self.progress_bar.set_text("Normalizing...")
-        elif "Output saved to:" in line:
-            self.progress_bar.set_fraction(1.0)
-            self.progress_bar.set_text("Complete!")
-
-    def check_process_completion(self):
-        """Check if the process has completed"""
-        if self.process is None:
-            return False
-
-        returncode = self.process.poll()
-
-        if returncode is not None:
-            # Process has finished
-            success = returncode == 0
-
-            if success:
-                self.status_label.set_text(f"✓ Success! Saved to: {os.path.basename(self.output_file)}")
-            else:
-                self.status_label.set_text(f"✗ Processing failed with exit code {returncode}")
-
-            self.finish_processing(success)
-            return False
-
-        # Keep checking
-        return True
-
-    def finish_processing(self, success):
-        """Clean up after processing completes"""
-        self.process = None
-        self.process_button.set_sensitive(True)
-
-        if not success:
-            self.progress_bar.set_text("Failed")
-            self.progress_bar.add_css_class("error")
+            with self._lock:
+                spans = [{"name": name, "start": start - self.origin, "seconds": duration,
+                          "pid": pid, "thread": tid, "args": args}
+                         for name, start, duration, pid, tid, args in self.spans]
+            report = {**self.stats(), "spans": spans}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1, default=str)
+
+
+# The process-wide profiler the engine reports to
+profiler = Profiler()
+
+
+def enable_profiling(path=None, trace_format=None):
+    """Turn the profiler on, dumping to `path` (if given) at exit"""
+    profiler.enabled = True
+    if path:
+        atexit.register(profiler.dump, path, trace_format)
+
+
+# Worker processes inherit the variable but send their spans to the parent
+if os.environ.get(PROFILE_ENV) and parent_process() is None:
+    enable_profiling(os.environ[PROFILE_ENV])
+
+
+def _js_round(values):
+    """Round half up like Math.round (numpy rounds half to even)"""
+    rounded = np.floor(values)
+    rounded += (values - rounded) >= 0.5
+    return rounded
+
+
+def _linear_scan(u, g, y0, depth=2):
+    """Solve y[k] = g * y[k-1] + u[k] along the last axis of a planar array
+
+    The recurrence is split into tiles of _TILE samples whose zero-state
+    responses are computed in lockstep, then stitched together by solving
+    the same recurrence over the tile boundaries one level up. The tiling
+    is fixed relative to the start of `u`, so feeding a signal in chunks
+    that are multiples of _TILE ** depth gives bit-identical results.
+    """
+    n_channels, n = u.shape
+    if depth == 0:
+        y = np.empty_like(u)
+        acc = y0.copy()
+        for k in range(n):
+            acc *= g
+            acc += u[:, k]
+            y[:, k] = acc
+        return y
+
+    n_tiles = -(-n // _TILE)
+    if n % _TILE:
+        padded = np.zeros((n_channels, n_tiles * _TILE))
+        padded[:, :n] = u
+    else:
+        padded = u
+    # (channels, tile offset, tile index) so each step is a contiguous row
+    tiles = padded.reshape(n_channels, n_tiles, _TILE).transpose(0, 2, 1).copy()
+
+    acc = np.zeros((n_channels, n_tiles))
+    for k in range(_TILE):
+        acc *= g
+        acc += tiles[:, k]
+        tiles[:, k] = acc
+
+    powers = np.cumprod(np.full(_TILE, g))
+    ends = _linear_scan(tiles[:, -1], powers[-1], y0, depth - 1)
+    entry = np.concatenate([y0[:, None], ends[:, :-1]], axis=1)
+    tiles += powers[None, :, None] * entry[:, None, :]
+
+    return tiles.transpose(0, 2, 1).reshape(n_channels, -1)[:, :n]
+
+
+class Bitcrusher:
+    """Vectorized port of the JS Bitcrusher working on planar float32 audio
+
+    Channels are processed independently, so `process` covers both the
+    mono `process` and the stereo `processStereo` paths of bitcrusher.js.
+    """
+    def __init__(self, params=None):
+        self.params = params or CrushParams()
+        self.reset()
+
+    def reset(self, n_channels=0):
+        """Reset sample-and-hold and lowpass state"""
+        self.input_channels = n_channels
+        if self.params.mono_downmix:
+            n_channels = min(n_channels, 1)
+        self.n_channels = n_channels
+        self.position = 0
+        self.hold_state = np.zeros(n_channels)
+        self.filter_state = np.zeros(n_channels)
+
+    def set_params(self, params):
+        """Swap parameters mid-stream, keeping the hold phase and filter state
+
+        Toggling mono downmix changes the number of wet rows, so it restarts
+        the hold and filter state from silence at the current position.
+        """
+        previous, self.params = self.params, params
+        if params.mono_downmix != previous.mono_downmix:
+            position = self.position
+            self.reset(self.input_channels)
+            self.position = position
+
+    def process(self, channels, sample_rate, progress=None):
+        """Apply the effect to a whole (channels, frames) buffer
+
+        `progress(stage, done, total)` is called as "crush" after each block.
+        """
+        channels = np.asarray(channels, dtype=np.float32)
+        if channels.ndim == 1:
+            channels = channels[None, :]
+        self.reset(channels.shape[0])
+        return _process_blocks(self, channels, sample_rate, progress)
+
+    def process_block(self, block, sample_rate):
+        """Apply the effect to the next block, carrying state across calls"""
+        p = self.params
+        n_channels, n = block.shape
+        if self.position == 0:
+            self.reset(n_channels)
+        dry = block.astype(np.float64)
+
+        # Sample rate reduction (sample and hold), bit depth reduction and
+        # clipping; the last two only need to touch the held values
+        wet = self._hold(self._source(dry))
+
+        # Low-pass filter (one-pole)
+        if p.lowpass_freq:
+            rc = 1.0 / (p.lowpass_freq * 2 * math.pi)
+            dt = 1.0 / sample_rate
+            alpha = dt / (rc + dt)
+            wet *= alpha
+            wet = _linear_scan(wet, 1.0 - alpha, self.filter_state)
+            if n:
+                self.filter_state = wet[:, -1].copy()
+
+        # Mix wet/dry signal and clamp
+        wet *= p.mix
+        dry *= 1 - p.mix
+        dry += wet
+        np.minimum(dry, 1.0, out=dry)
+        np.maximum(dry, -1.0, out=dry)
+
+        self.position += n
+        return dry.astype(np.float32)
+
+    def hold_from(self, frame):
+        """Hold the crushed value of `frame`, the dry (channels, 1) input at a hold point
+
+        With `position` set to a later frame, processing carries on as if
+        the file had been crushed from the start.
+        """
+        self.hold_state = self._crush(self._source(frame.astype(np.float64)))[:, 0]
+
+    def _source(self, dry):
+        """The signal to crush; mono downmix shares one between all channels"""
+        if self.n_channels < dry.shape[0]:
+            return dry.sum(axis=0, keepdims=True) / dry.shape[0]
+        return dry
+
+    def _crush(self, values):
+        """Quantize and optionally clip held values"""
+        p = self.params
+        steps = 2.0 ** p.bit_depth - 1
+        values = _js_round(values * steps)
+        values /= steps
+        if p.hard_clip:
+            np.clip(values, -p.clip_threshold, p.clip_threshold, out=values)
+        return values
+
+    def _hold(self, source):
+        """Sample-and-hold `source`, returning crushed values for every frame"""
+        reduction = self.params.sample_rate_reduction
+        n_rows, n = source.shape
+        held = np.empty((n_rows, n))
+
+        if float(reduction).is_integer():
+            # Hold points fall every `reduction` frames from the file start
+            reduction = int(reduction)
+            first = min(-self.position % reduction, n)
+            values = self._crush(source[:, first::reduction])
+            held[:, :first] = self.hold_state[:, None]
+            held[:, first:] = np.repeat(values, reduction, axis=1)[:, :n - first]
         else:
-            # Load processed waveform and setup player
-            if self.output_file and os.path.exists(self.output_file):
-                samples, duration = self.load_waveform(self.output_file)
-                if samples:
-                    self.processed_waveform.set_waveform(samples)
-                    self.setup_player(self.output_file, "processed")
-                    self.processed_play_btn.set_sensitive(True)
-                    self.processed_stop_btn.set_sensitive(True)
-                    self.update_time_label("processed", 0)
-
-    def load_waveform(self, filepath):
-        """Load waveform data from a WAV file"""
-        try:
-            with wave.open(filepath, 'rb') as wf:
-                n_channels = wf.getnchannels()
-                sample_width = wf.getsampwidth()
-                n_frames = wf.getnframes()
-                framerate = wf.getframerate()
-
-                # Read all frames
-                frames = wf.readframes(n_frames)
-
-                # Convert to samples
-                if sample_width == 1:
-                    samples = struct.unpack(f"{n_frames * n_channels}B", frames)
-                    samples = [(s - 128) / 128.0 for s in samples]
-                elif sample_width == 2:
-                    samples = struct.unpack(f"{n_frames * n_channels}h", frames)
-                    samples = [s / 32768.0 for s in samples]
-                else:
-                    return None, 0
-
-                # Mix to mono for display
-                if n_channels == 2:
-                    mono = [(samples[i] + samples[i+1]) / 2 for i in range(0, len(samples), 2)]
-                    samples = mono
-
-                duration = n_frames / framerate
-                return samples, duration
-
-        except Exception as e:
-            print(f"Error loading waveform: {e}")
-            return None, 0
-
-    def setup_player(self, filepath, player_type):
-        """Setup GStreamer player for a file"""
-        # Clean up existing player
-        if player_type == "original" and self.original_player:
-            self.original_player.set_state(Gst.State.NULL)
-        elif player_type == "processed" and self.processed_player:
-            self.processed_player.set_state(Gst.State.NULL)
-
-        # Create new player
-        player = Gst.ElementFactory.make("playbin", None)
-        player.set_property("uri", f"file://{filepath}")
-
-        # Get duration
-        player.set_state(Gst.State.PAUSED)
-        player.get_state(Gst.CLOCK_TIME_NONE)
-
-        success, duration = player.query_duration(Gst.Format.TIME)
-        duration_sec = duration / Gst.SECOND if success else 0
-
-        # Reset to ready
-        player.set_state(Gst.State.READY)
-
-        if player_type == "original":
-            self.original_player = player
-            self.original_duration = duration_sec
+            # Match JS `i % reduction === 0` for fractional factors
+            frames = np.arange(self.position, self.position + n, dtype=np.float64)
+            index = np.where(np.fmod(frames, reduction) == 0, np.arange(1, n + 1), 0)
+            np.maximum.accumulate(index, out=index)
+            values = self._crush(source)
+            held[...] = np.concatenate([self.hold_state[:, None], values], axis=1)[:, index]
+
+        if n:
+            self.hold_state = held[:, -1].copy()
+        return held
+
+
+def _process_blocks(crusher, channels, sample_rate, progress=None):
+    """Run a whole (channels, frames) buffer through `crusher` block by block"""
+    n_channels, n_frames = channels.shape
+    output = np.empty_like(channels)
+    _report(progress, "crush", 0, n_frames, n_channels)
+    for start in range(0, n_frames, BLOCK_FRAMES):
+        stop = start + BLOCK_FRAMES
+        with profiler.span("dsp"):
+            output[:, start:stop] = crusher.process_block(channels[:, start:stop], sample_rate)
+        _report(progress, "crush", min(stop, n_frames), n_frames, n_channels)
+    return output
+
+
+def channel_workers(n_channels, params, max_workers=None):
+    """Threads worth splitting a render's channels across (at most `max_workers`)"""
+    if params.mono_downmix or n_channels < PARALLEL_MIN_CHANNELS:
+        return 1
+    return max(1, min(n_channels, max_workers or os.cpu_count() or 1))
+
+
+class ChannelPool:
+    """Independent Bitcrushers for groups of channels, run on a thread pool
+
+    Without mono downmix every channel is held and filtered on its own, so
+    splitting a block's rows between Bitcrushers gives the same output as
+    one, bit for bit. NumPy releases the GIL in its inner loops, so the
+    groups run side by side. Mono downmix shares one wet signal between
+    all channels and always uses a single Bitcrusher.
+    """
+    def __init__(self, params, n_channels, workers=1):
+        workers = 1 if params.mono_downmix else max(1, min(workers, n_channels))
+        bounds = np.linspace(0, n_channels, workers + 1).round().astype(int)
+        self.groups = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.crushers = [Bitcrusher(params) for _ in self.groups]
+        for crusher, group in zip(self.crushers, self.groups):
+            crusher.reset(group.stop - group.start)
+        self.executor = ThreadPoolExecutor(workers, "crush") if workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def process(self, channels, sample_rate, progress=None):
+        """Apply the effect to a whole (channels, frames) buffer, like `Bitcrusher.process`"""
+        for crusher, group in zip(self.crushers, self.groups):
+            crusher.reset(group.stop - group.start)
+        return _process_blocks(self, np.asarray(channels, dtype=np.float32), sample_rate, progress)
+
+    def process_block(self, block, sample_rate):
+        """Apply the effect to the next block, each group on its own thread"""
+        if self.executor is None:
+            return self.crushers[0].process_block(block, sample_rate)
+
+        output = np.empty(block.shape, dtype=np.float32)
+
+        def run(crusher, group):
+            output[group] = crusher.process_block(block[group], sample_rate)
+
+        for future in [self.executor.submit(run, crusher, group)
+                       for crusher, group in zip(self.crushers, self.groups)]:
+            future.result()
+        return output
+
+
+def normalize(channels, headroom=NORMALIZE_HEADROOM, progress=None):
+    """Scale channels in place so the peak sits at `headroom`; returns (peak, gain)"""
+    with profiler.span("normalize"):
+        peak = float(np.max(np.abs(channels))) if channels.size else 0.0
+        if peak == 0:
+            return peak, 1.0
+
+        gain = headroom / peak
+        n_channels, n_frames = channels.shape
+        _report(progress, "normalize", 0, n_frames, n_channels)
+        for start in range(0, n_frames, BLOCK_FRAMES):
+            block = channels[:, start:start + BLOCK_FRAMES]
+            scaled = block.astype(np.float64) * gain
+            np.clip(scaled, -1.0, 1.0, out=scaled)
+            block[...] = scaled
+            _report(progress, "normalize", min(start + BLOCK_FRAMES, n_frames), n_frames, n_channels)
+        return peak, gain
+
+
+# Residual of the low-pass filter's starting state left after pre-roll
+PREROLL_TOLERANCE = 2.0 ** -24
+
+
+def preroll_frames(params, sample_rate):
+    """Frames to run ahead of a seek so the low-pass filter state settles
+
+    The one-pole filter forgets its starting state by (1 - alpha) per
+    frame; this is enough frames for that to fall below float32
+    resolution.
+    """
+    if not params.lowpass_freq:
+        return 0
+    rc = 1.0 / (params.lowpass_freq * 2 * math.pi)
+    dt = 1.0 / sample_rate
+    alpha = dt / (rc + dt)
+    return math.ceil(math.log(PREROLL_TOLERANCE) / math.log1p(-alpha))
+
+
+def _last_hold_point(reduction, position):
+    """Last frame before `position` where the sample-and-hold takes a value, or None"""
+    if position <= 0:
+        return None
+    # The hold takes a value where `frame % reduction` is exactly zero. With
+    # the factor's exact value p/q in lowest terms, those are the multiples
+    # of p: just 0 for most fractional factors, every 5th frame for 2.5.
+    step = Fraction(reduction).numerator
+    return (position - 1) // step * step
+
+
+def prime_crusher(crusher, reader, frame):
+    """Ready `crusher` to continue `reader` from `frame` without processing what's before
+
+    The held value is crushed from the input at the last hold point, and
+    `preroll_frames` of input run through the filter, so the output from
+    `frame` on matches a render from the start to within float32
+    rounding.
+    """
+    first = max(0, frame - preroll_frames(crusher.params, reader.sample_rate))
+    crusher.reset(reader.n_channels)
+    crusher.position = first
+    hold = _last_hold_point(crusher.params.sample_rate_reduction, first)
+    if hold is not None:
+        crusher.hold_from(reader.read(hold, hold + 1))
+    if frame > first:
+        crusher.process_block(reader.read(first, frame), reader.sample_rate)
+
+
+class PreviewStream:
+    """Crush a WavReader on demand, a block at a time, for live preview
+
+    `read` decodes and processes the next block when the player asks for
+    it. `set_params`, `set_region` and `seek` may be called from another
+    thread and take effect from the next block, so a parameter change is
+    heard within one buffer. The preview is not normalized; only the
+    exported file is.
+    """
+    def __init__(self, reader, params, block_frames=PREVIEW_BLOCK_FRAMES):
+        self.reader = reader
+        self.block_frames = block_frames
+        self.crusher = Bitcrusher(params)
+        self.crusher.reset(reader.n_channels)
+        self._lock = threading.Lock()
+        self._params = params
+        self._seek = None
+        self._region = (0, reader.n_frames)
+
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def sample_rate(self):
+        return self.reader.sample_rate
+
+    @property
+    def n_channels(self):
+        return self.reader.n_channels
+
+    def set_params(self, params):
+        """Use `params` from the next block on"""
+        with self._lock:
+            self._params = params
+
+    def seek(self, frame):
+        """Continue from `frame` at the next block, with the effect state primed there"""
+        with self._lock:
+            start, stop = self._region
+            self._seek = max(start, min(int(frame), stop))
+
+    def set_region(self, start=None, stop=None):
+        """Play only frames [start, stop), from `start`; no arguments for the whole file"""
+        n_frames = self.reader.n_frames
+        start = 0 if start is None else max(0, min(int(start), n_frames))
+        stop = n_frames if stop is None else max(start, min(int(stop), n_frames))
+        with self._lock:
+            self._region = (start, stop)
+            self._seek = start
+
+    def read(self):
+        """Return (start frame, interleaved float32 block), or None at the end"""
+        chunk = self._next_block()
+        if chunk is None:
+            return None
+        start, _, processed = chunk
+        return start, np.ascontiguousarray(processed.T)
+
+    def _next_block(self):
+        """(start frame, planar input, planar processed) for the next block"""
+        with self._lock:
+            params, seek, self._seek = self._params, self._seek, None
+            stop = self._region[1]
+
+        crusher = self.crusher
+        if seek is not None:
+            crusher.params = params
+            prime_crusher(crusher, self.reader, seek)
+        elif params is not crusher.params:
+            crusher.set_params(params)
+
+        start = crusher.position
+        if start >= stop:
+            return None
+        with profiler.span("preview"):
+            block = self.reader.read(start, min(start + self.block_frames, stop))
+            with profiler.span("dsp"):
+                processed = crusher.process_block(block, self.reader.sample_rate)
+        return start, block, processed
+
+
+class ABStream(PreviewStream):
+    """PreviewStream that can switch between the original and crushed signal
+
+    Both signals come from the same decoded block, so a switch keeps the
+    position to the sample. `select` may be called from another thread;
+    the change starts at the next block and fades linearly over
+    `crossfade` seconds. The effect keeps running while the original is
+    heard, so switching back picks up its state without a glitch.
+    """
+    def __init__(self, reader, params, block_frames=PREVIEW_BLOCK_FRAMES, crossfade=AB_CROSSFADE):
+        super().__init__(reader, params, block_frames)
+        self.fade_frames = max(1, round(crossfade * reader.sample_rate))
+        self._processed = True
+        self._wet = 1.0
+
+    @property
+    def processed(self):
+        """Whether the crushed signal is (or is fading to be) the one heard"""
+        return self._processed
+
+    def select(self, processed):
+        """Hear the crushed signal if `processed`, else the original"""
+        with self._lock:
+            self._processed = bool(processed)
+
+    def read(self):
+        """Return (start frame, interleaved float32 block), or None at the end"""
+        chunk = self._next_block()
+        if chunk is None:
+            return None
+        start, dry, wet = chunk
+        with self._lock:
+            target = 1.0 if self._processed else 0.0
+
+        if self._wet == target:
+            out = wet if target else dry
         else:
-            self.processed_player = player
-            self.processed_duration = duration_sec
-
-        return player
-
-    def toggle_playback(self, player_type):
-        """Toggle play/pause for a player"""
-        if player_type == "original":
-            player = self.original_player
-            play_btn = self.original_play_btn
+            step = 1.0 / self.fade_frames
+            direction = 1.0 if target > self._wet else -1.0
+            ramp = self._wet + direction * step * np.arange(1, dry.shape[1] + 1)
+            np.clip(ramp, 0.0, 1.0, out=ramp)
+            self._wet = float(ramp[-1]) if len(ramp) else self._wet
+            # Exactly one signal at either end of the ramp
+            out = (dry * (1.0 - ramp) + wet * ramp).astype(np.float32)
+        return start, np.ascontiguousarray(out.T)
+
+
+class BufferStream:
+    """Serve an in-memory planar buffer block by block, like PreviewStream"""
+    def __init__(self, channels, sample_rate, block_frames=PREVIEW_BLOCK_FRAMES):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.n_channels = channels.shape[0]
+        self.block_frames = block_frames
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def seek(self, frame):
+        """Continue from `frame` at the next block"""
+        with self._lock:
+            self.position = max(0, min(int(frame), self.channels.shape[1]))
+
+    def read(self):
+        """Return (start frame, interleaved float32 block), or None at the end"""
+        with self._lock:
+            start = self.position
+            if start >= self.channels.shape[1]:
+                return None
+            self.position = start + self.block_frames
+        return start, np.ascontiguousarray(self.channels[:, start:start + self.block_frames].T)
+
+
+class ReaderStream:
+    """Serve a WavReader's frames block by block, like BufferStream
+
+    The reader's memory mapping stands in for the buffer, so a render too
+    large to hold plays straight from the page cache, decoding only the
+    block being played.
+    """
+    def __init__(self, reader, block_frames=PREVIEW_BLOCK_FRAMES):
+        self.reader = reader
+        self.sample_rate = reader.sample_rate
+        self.n_channels = reader.n_channels
+        self.block_frames = block_frames
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def seek(self, frame):
+        """Continue from `frame` at the next block"""
+        with self._lock:
+            self.position = max(0, min(int(frame), self.reader.n_frames))
+
+    def read(self):
+        """Return (start frame, interleaved float32 block), or None at the end"""
+        with self._lock:
+            start = self.position
+            if start >= self.reader.n_frames:
+                return None
+            self.position = start + self.block_frames
+        return start, np.ascontiguousarray(self.reader.read(start, start + self.block_frames).T)
+
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _pcm_lut(bits):
+    """Lookup table decoding 8/16-bit PCM codes with node-wav's scaling"""
+    if bits == 8:
+        codes = np.arange(256, dtype=np.float64) - 128
+    else:
+        codes = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.float64)
+    full_scale = 2.0 ** (bits - 1)
+    # node-wav divides negative values by 2^(n-1) and positive ones by 2^(n-1) - 1
+    return (codes / np.where(codes < 0, full_scale, full_scale - 1)).astype(np.float32)
+
+
+class WavReader:
+    """Memory-mapped WAV file exposing the sample data without copying
+
+    `frames` is a read-only (frames, channels) view straight onto the data
+    chunk, typed as uint8, int16, int32, float32 or float64. 24-bit PCM has
+    no numpy dtype, so its view is (frames, channels, 3) bytes. `read` and
+    `read_mono` decode ranges to float32 a block at a time.
+    """
+    _luts = {}
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        raw = np.memmap(filepath, dtype=np.uint8, mode='r')
+        if raw.size < 12 or bytes(raw[0:4]) != b'RIFF' or bytes(raw[8:12]) != b'WAVE':
+            raise ValueError(f"Not a WAV file: {filepath}")
+
+        fmt = None
+        data = None
+        pos = 12
+        while pos + 8 <= raw.size:
+            chunk_id = bytes(raw[pos:pos + 4])
+            (size,) = struct.unpack('<I', raw[pos + 4:pos + 8])
+            body = pos + 8
+            if chunk_id == b'fmt ':
+                fmt = bytes(raw[body:body + size])
+            elif chunk_id == b'data':
+                # Tolerate truncated files and streaming writers' bogus sizes
+                data = (body, min(size, raw.size - body))
+                if fmt is not None:
+                    break
+            pos = body + size + (size & 1)
+
+        if fmt is None or len(fmt) < 16:
+            raise ValueError("Missing \"fmt \" chunk")
+        if data is None:
+            raise ValueError("Missing \"data\" chunk")
+
+        format_tag, n_channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            (format_tag,) = struct.unpack('<H', fmt[24:26])
+        if format_tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Unsupported format in WAV file: {format_tag:x}")
+
+        self.is_float = format_tag == _WAVE_FORMAT_IEEE_FLOAT
+        self.n_channels = n_channels
+        self.sample_rate = sample_rate
+        self.sample_width = bits // 8
+        if self.is_float:
+            dtypes = {4: '<f4', 8: '<f8'}
         else:
-            player = self.processed_player
-            play_btn = self.processed_play_btn
-
-        if not player:
-            return
-
-        state = player.get_state(0)[1]
-
-        if state == Gst.State.PLAYING:
-            # Pause
-            player.set_state(Gst.State.PAUSED)
-            play_btn.set_icon_name("media-playback-start-symbolic")
-            if self.update_position_id:
-                GLib.source_remove(self.update_position_id)
-                self.update_position_id = None
+            dtypes = {1: np.uint8, 2: '<i2', 3: np.uint8, 4: '<i4'}
+        if self.sample_width not in dtypes or block_align != n_channels * self.sample_width:
+            raise ValueError(f"Unsupported WAV layout: {bits}-bit, {n_channels} channels")
+
+        offset, size = data
+        self.n_frames = size // block_align
+        frames = raw[offset:offset + self.n_frames * block_align]
+        if self.sample_width == 3:
+            self.frames = frames.reshape(self.n_frames, n_channels, 3)
         else:
-            # Play
-            player.set_state(Gst.State.PLAYING)
-            play_btn.set_icon_name("media-playback-pause-symbolic")
-
-            # Start position updates
-            if not self.update_position_id:
-                self.update_position_id = GLib.timeout_add(100, self.update_positions)
-
-    def stop_playback(self, player_type):
-        """Stop playback for a player"""
-        if player_type == "original":
-            player = self.original_player
-            play_btn = self.original_play_btn
-            waveform = self.original_waveform
+            self.frames = frames.view(dtypes[self.sample_width]).reshape(self.n_frames, n_channels)
+
+    @property
+    def duration(self):
+        return self.n_frames / self.sample_rate if self.sample_rate else 0
+
+    @property
+    def format(self):
+        """The output format matching this file's encoding (32-bit PCM maps to float32)"""
+        if self.is_float or self.sample_width == 4:
+            return "float32"
+        return f"pcm{self.sample_width * 8}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Drop this reader's reference to the mapping"""
+        self.frames = None
+
+    def _decode(self, raw):
+        """Decode interleaved raw frames to float32, scaled like node-wav"""
+        if self.is_float:
+            return raw.astype(np.float32)
+        if self.sample_width <= 2:
+            bits = self.sample_width * 8
+            lut = self._luts.get(bits)
+            if lut is None:
+                lut = self._luts[bits] = _pcm_lut(bits)
+            return lut[raw.view(np.uint8 if bits == 8 else "<u2")]
+
+        if self.sample_width == 3:
+            raw = raw.astype(np.int32)
+            data = raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)
+            data[data >= 0x800000] -= 0x1000000
+            data = data.astype(np.float64)
+            full_scale = 8388608.0
         else:
-            player = self.processed_player
-            play_btn = self.processed_play_btn
-            waveform = self.processed_waveform
-
-        if not player:
-            return
+            data = raw.astype(np.float64)
+            full_scale = 2147483648.0
+        data /= np.where(data < 0, full_scale, full_scale - 1)
+        return data.astype(np.float32)
+
+    def read(self, start=0, stop=None, progress=None):
+        """Decode frames [start, stop) to planar (channels, frames) float32
+
+        `progress(stage, done, total)` is called as "read" after each block.
+        """
+        stop = self.n_frames if stop is None else min(stop, self.n_frames)
+        start = min(start, stop)
+        channels = np.empty((self.n_channels, stop - start), dtype=np.float32)
+        _report(progress, "read", 0, stop - start, self.n_channels)
+        for pos in range(start, stop, BLOCK_FRAMES):
+            end = min(pos + BLOCK_FRAMES, stop)
+            with profiler.span("decode"):
+                channels[:, pos - start:end - start] = self._decode(self.frames[pos:end]).T
+            _report(progress, "read", end - start, stop - start, self.n_channels)
+        return channels
+
+    def read_mono(self, start=0, stop=None):
+        """Decode frames [start, stop) mixed down to one float32 channel"""
+        stop = self.n_frames if stop is None else min(stop, self.n_frames)
+        start = min(start, stop)
+        mono = np.empty(stop - start, dtype=np.float32)
+        for pos in range(start, stop, BLOCK_FRAMES):
+            end = min(pos + BLOCK_FRAMES, stop)
+            with profiler.span("decode"):
+                decoded = self._decode(self.frames[pos:end])
+                if self.n_channels == 1:
+                    mono[pos - start:end - start] = decoded[:, 0]
+                else:
+                    mono[pos - start:end - start] = decoded.mean(axis=1, dtype=np.float64)
+        return mono
+
+    def read_channel(self, channel, start=0, stop=None):
+        """Decode one channel's frames [start, stop) to float32"""
+        stop = self.n_frames if stop is None else min(stop, self.n_frames)
+        start = min(start, stop)
+        samples = np.empty(stop - start, dtype=np.float32)
+        for pos in range(start, stop, BLOCK_FRAMES):
+            end = min(pos + BLOCK_FRAMES, stop)
+            with profiler.span("decode"):
+                samples[pos - start:end - start] = self._decode(self.frames[pos:end, channel])
+        return samples
+
+
+def read_wav(filepath, progress=None):
+    """Read a WAV file into planar float32, scaled like node-wav"""
+    with WavReader(filepath) as reader:
+        return reader.read(progress=progress), reader.sample_rate
+
+
+# Samples per block in the finest level of a PeakPyramid
+PEAK_BASE_BLOCK = 256
+
+
+def _block_peaks(samples, block=PEAK_BASE_BLOCK):
+    """Min/max of each `block`-sample block along the last axis (the last may be short)"""
+    n_full = samples.shape[-1] // block
+    body = samples[..., :n_full * block].reshape(*samples.shape[:-1], n_full, block)
+    mins, maxs = body.min(axis=-1), body.max(axis=-1)
+    tail = samples[..., n_full * block:]
+    if tail.shape[-1]:
+        mins = np.concatenate([mins, tail.min(axis=-1, keepdims=True)], axis=-1)
+        maxs = np.concatenate([maxs, tail.max(axis=-1, keepdims=True)], axis=-1)
+    return mins, maxs
+
+
+def _halve(values, reduce):
+    """Combine neighbouring pairs of a peak level into the next level up"""
+    paired = len(values) // 2 * 2
+    merged = reduce(values[0:paired:2], values[1:paired:2])
+    if len(values) > paired:
+        merged = np.append(merged, values[-1])
+    return merged
+
+
+class PeakPyramid:
+    """Mipmapped min/max peaks of a mono signal for drawing at any zoom
+
+    Level `i` holds float32 mins and maxs over blocks of
+    PEAK_BASE_BLOCK * 2**i samples. Views finer than the base level read
+    the raw samples through `read(start, stop)` when one is available.
+    """
+    def __init__(self, n_samples, mins, maxs, read=None):
+        self.n_samples = n_samples
+        self.read = read
+        mins = np.asarray(mins, dtype=np.float32)
+        maxs = np.asarray(maxs, dtype=np.float32)
+        self.levels = [(mins, maxs)]
+        while len(mins) > 1:
+            mins, maxs = _halve(mins, np.minimum), _halve(maxs, np.maximum)
+            self.levels.append((mins, maxs))
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Build from an in-memory mono signal"""
+        samples = np.asarray(samples, dtype=np.float32)
+        mins, maxs = _block_peaks(samples)
+        return cls(len(samples), mins, maxs,
+                   read=lambda start, stop: samples[start:stop])
+
+    @classmethod
+    def from_reader(cls, reader, cancel=None):
+        """Build from a WavReader in one blockwise pass over the file
+
+        Returns None if the `cancel` event is set part way through.
+        """
+        mins, maxs = [], []
+        with profiler.span("peaks", input=reader.filepath):
+            for start in range(0, reader.n_frames, BLOCK_FRAMES):
+                if cancel is not None and cancel.is_set():
+                    return None
+                block_mins, block_maxs = _block_peaks(reader.read_mono(start, start + BLOCK_FRAMES))
+                mins.append(block_mins)
+                maxs.append(block_maxs)
+        if not mins:
+            mins = maxs = [np.zeros(0, dtype=np.float32)]
+        return cls(reader.n_frames, np.concatenate(mins), np.concatenate(maxs),
+                   read=reader.read_mono)
+
+    @classmethod
+    def channels_from_samples(cls, channels):
+        """Build one pyramid per row of an in-memory (channels, frames) buffer"""
+        channels = np.asarray(channels, dtype=np.float32)
+        mins, maxs = _block_peaks(channels)
+        return [cls(channels.shape[1], mins[channel], maxs[channel],
+                    read=lambda start, stop, samples=channels[channel]: samples[start:stop])
+                for channel in range(channels.shape[0])]
+
+    @classmethod
+    def channels_from_reader(cls, reader, cancel=None):
+        """Build one pyramid per channel in a single blockwise pass
+
+        Each block is decoded once for all channels and reduced with one
+        vectorized min/max. Returns None if the `cancel` event is set part
+        way through.
+        """
+        mins, maxs = [], []
+        with profiler.span("channel_peaks", input=reader.filepath):
+            for start in range(0, reader.n_frames, BLOCK_FRAMES):
+                if cancel is not None and cancel.is_set():
+                    return None
+                block_mins, block_maxs = _block_peaks(reader.read(start, start + BLOCK_FRAMES))
+                mins.append(block_mins)
+                maxs.append(block_maxs)
+        if not mins:
+            mins = maxs = [np.zeros((reader.n_channels, 0), dtype=np.float32)]
+        mins, maxs = np.concatenate(mins, axis=1), np.concatenate(maxs, axis=1)
+        return [cls(reader.n_frames, mins[channel], maxs[channel],
+                    read=lambda start, stop, channel=channel: reader.read_channel(channel, start, stop))
+                for channel in range(reader.n_channels)]
+
+    @property
+    def nbytes(self):
+        """Memory held by the peak levels"""
+        return sum(mins.nbytes + maxs.nbytes for mins, maxs in self.levels)
+
+    def query(self, start, stop, n_pixels):
+        """Min/max for each of `n_pixels` columns spanning samples [start, stop)
+
+        Columns without data are NaN. The cost is proportional to
+        `n_pixels`, whatever the zoom level or signal length.
+        """
+        mins = np.full(n_pixels, np.nan, dtype=np.float32)
+        maxs = np.full(n_pixels, np.nan, dtype=np.float32)
+        if n_pixels <= 0 or stop <= start or self.n_samples == 0:
+            return mins, maxs
+
+        edges = start + (stop - start) * np.arange(n_pixels + 1) / n_pixels
+        edges = np.clip(np.floor(edges), 0, self.n_samples).astype(np.int64)
+        valid = edges[:-1] < self.n_samples
+        if not valid.any():
+            return mins, maxs
+        starts = edges[:-1][valid]
+        samples_per_pixel = (stop - start) / n_pixels
+
+        if samples_per_pixel < PEAK_BASE_BLOCK and self.read is not None:
+            # Zoomed in past the base level: reduce the raw samples
+            first = starts[0]
+            last = min(max(edges[-1], starts[-1] + 1), self.n_samples)
+            segment = self.read(first, last)
+            mins[valid] = np.minimum.reduceat(segment, starts - first)
+            maxs[valid] = np.maximum.reduceat(segment, starts - first)
+            return mins, maxs
+
+        level = int(math.log2(max(samples_per_pixel / PEAK_BASE_BLOCK, 1)))
+        level = min(level, len(self.levels) - 1)
+        block = PEAK_BASE_BLOCK << level
+        level_mins, level_maxs = self.levels[level]
+
+        # Columns cover whole blocks, including any partial block at the end
+        block_starts = starts // block
+        block_ends = np.maximum(-(-edges[1:][valid] // block) - 1, block_starts)
+        block_ends = np.minimum(block_ends, len(level_mins) - 1)
+        first = block_starts[0]
+        last = block_ends[-1] + 1
+        mins[valid] = np.minimum(np.minimum.reduceat(level_mins[first:last], block_starts - first),
+                                 level_mins[block_ends])
+        maxs[valid] = np.maximum(np.maximum.reduceat(level_maxs[first:last], block_starts - first),
+                                 level_maxs[block_ends])
+        return mins, maxs
+
+
+def cache_dir():
+    """Per-user cache directory ($XDG_CACHE_HOME/bitcrusher)"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "bitcrusher")
+
+
+def file_identity(filepath, hash_span=65536):
+    """Path, size, mtime and a hash of the first and last `hash_span` bytes"""
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(digest_size=8)
+    with open(filepath, 'rb') as f:
+        digest.update(f.read(hash_span))
+        if stat.st_size > hash_span:
+            f.seek(max(stat.st_size - hash_span, hash_span))
+            digest.update(f.read())
+    return f"{filepath}\0{stat.st_size}\0{stat.st_mtime_ns}\0{digest.hexdigest()}"
+
+
+class PeakCache:
+    """On-disk cache of base-level peaks, keyed by file identity
+
+    Entries are keyed by path, size, mtime and a hash of the first and
+    last 64 KiB, so an edited file simply misses and its stale entry ages
+    out. The directory is capped at `max_bytes`, evicting the least
+    recently used entries first.
+    """
+    MAGIC = b'BCPK'
+    VERSION = 1
+    HASH_SPAN = 65536
+    # magic, version, key length, samples, sample rate, blocks
+    _HEADER = struct.Struct('<4sHHQIQ')
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.directory = directory or cache_dir()
+        self.max_bytes = max_bytes
+
+    def file_key(self, filepath):
+        """Identity of a file's current contents"""
+        return file_identity(filepath, self.HASH_SPAN)
+
+    def entry_path(self, key):
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{name}.peaks")
+
+    def load(self, reader):
+        """Cached PeakPyramid for an open WavReader, or None on a miss"""
+        with profiler.span("peak_cache_load", input=reader.filepath):
+            return self._load(reader)
+
+    def _load(self, reader):
+        try:
+            key = self.file_key(reader.filepath)
+            path = self.entry_path(key)
+            with open(path, 'rb') as f:
+                magic, version, key_size, n_samples, sample_rate, n_blocks = \
+                    self._HEADER.unpack(f.read(self._HEADER.size))
+                stored_key = f.read(key_size).decode(errors='replace')
+                if (magic != self.MAGIC or version != self.VERSION or stored_key != key
+                        or n_samples != reader.n_frames or sample_rate != reader.sample_rate):
+                    return None
+                peaks = np.fromfile(f, dtype='<f4', count=2 * n_blocks)
+            if len(peaks) != 2 * n_blocks:
+                return None
+            os.utime(path)  # Mark as recently used
+        except (OSError, struct.error):
+            return None
+
+        return PeakPyramid(n_samples, peaks[:n_blocks], peaks[n_blocks:], read=reader.read_mono)
+
+    def store(self, reader, pyramid):
+        """Write a pyramid's base level to the cache (best effort)"""
+        with profiler.span("peak_cache_store", input=reader.filepath):
+            self._store(reader, pyramid)
+
+    def _store(self, reader, pyramid):
+        try:
+            key = self.file_key(reader.filepath)
+            mins, maxs = pyramid.levels[0]
+            key_bytes = key.encode()
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.entry_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self._HEADER.pack(self.MAGIC, self.VERSION, len(key_bytes),
+                                          pyramid.n_samples, reader.sample_rate, len(mins)))
+                f.write(key_bytes)
+                f.write(np.asarray(mins, dtype='<f4').tobytes())
+                f.write(np.asarray(maxs, dtype='<f4').tobytes())
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError as e:
+            print(f"Error writing peak cache: {e}")
+
+    def evict(self):
+        """Delete least recently used entries until under the size cap"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.peaks'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def _mixdown(channels):
+    """Mix a planar (channels, frames) block down to float32 mono for drawing"""
+    if channels.shape[0] == 1:
+        return channels[0]
+    return channels.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+
+@dataclass
+class RenderedAudio:
+    """A normalized render held in memory with the peaks to draw it"""
+    channels: np.ndarray
+    sample_rate: int
+    peaks: PeakPyramid
+
+    @classmethod
+    def from_channels(cls, channels, sample_rate):
+        """Wrap a rendered (channels, frames) buffer, building its peaks"""
+        return cls(channels, sample_rate, PeakPyramid.from_samples(_mixdown(channels)))
+
+    @property
+    def duration(self):
+        return self.channels.shape[1] / self.sample_rate
+
+    @property
+    def nbytes(self):
+        """Memory held: samples, peak levels and the mono mixdown for zooming"""
+        mono = self.peaks.n_samples * 4 if self.channels.shape[0] > 1 else 0
+        return self.channels.nbytes + self.peaks.nbytes + mono
+
+
+class RenderCache:
+    """In-memory LRU cache of RenderedAudio, bounded by total bytes
+
+    Keys pair the input file's identity with canonical parameters, so a
+    preset and the same values entered by hand share an entry. `hits` and
+    `misses` count lookups for tuning `max_bytes`. Memory held elsewhere
+    under the same budget can be set aside with `reserve`. Safe to share
+    between threads.
+    """
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.reserved = 0
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(filepath, params):
+        """Cache key for rendering `filepath` with `params`"""
+        return file_identity(filepath), params.canonical()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Entry for `key` (now the most recently used), or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Add an entry, evicting the least recently used to stay in budget
+
+        Returns False if the entry alone is larger than the budget.
+        """
+        size = entry.nbytes
+        with self._lock:
+            if size > self.max_bytes - self.reserved:
+                return False
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._entries[key] = entry
+            self.nbytes += size
+            self._evict()
+        return True
 
-        player.set_state(Gst.State.READY)
-        play_btn.set_icon_name("media-playback-start-symbolic")
-        waveform.set_playback_position(0)
-
-        if self.update_position_id:
-            GLib.source_remove(self.update_position_id)
-            self.update_position_id = None
-
-        self.update_time_label(player_type, 0)
-
-    def update_positions(self):
-        """Update playback positions for all active players"""
-        active = False
-
-        # Update original player
-        if self.original_player:
-            state = self.original_player.get_state(0)[1]
-            if state == Gst.State.PLAYING:
-                active = True
-                success, position = self.original_player.query_position(Gst.Format.TIME)
-                if success:
-                    position_sec = position / Gst.SECOND
-                    self.update_time_label("original", position_sec)
-
-                    if self.original_duration > 0:
-                        fraction = position_sec / self.original_duration
-                        self.original_waveform.set_playback_position(fraction)
-
-                    # Check if finished
-                    if position_sec >= self.original_duration:
-                        self.stop_playback("original")
-
-        # Update processed player
-        if self.processed_player:
-            state = self.processed_player.get_state(0)[1]
-            if state == Gst.State.PLAYING:
-                active = True
-                success, position = self.processed_player.query_position(Gst.Format.TIME)
-                if success:
-                    position_sec = position / Gst.SECOND
-                    self.update_time_label("processed", position_sec)
-
-                    if self.processed_duration > 0:
-                        fraction = position_sec / self.processed_duration
-                        self.processed_waveform.set_playback_position(fraction)
-
-                    # Check if finished
-                    if position_sec >= self.processed_duration:
-                        self.stop_playback("processed")
-
-        return active  # Continue if any player is active
-
-    def update_time_label(self, player_type, position_sec):
-        """Update time label for a player"""
-        if player_type == "original":
-            duration = self.original_duration
-            label = self.original_time_label
+    def reserve(self, nbytes):
+        """Set aside `nbytes` of the budget, evicting entries to make room
+
+        The reservation replaces any earlier one; reserve 0 to release it.
+        """
+        with self._lock:
+            self.reserved = nbytes
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until they fit beside the reservation"""
+        while self._entries and self.nbytes > self.max_bytes - self.reserved:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def stats(self):
+        """Counters for tuning: entries, bytes, hits and misses"""
+        return {"entries": len(self._entries), "bytes": self.nbytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+class RenderPipeline:
+    """Render one input through cached stages, re-running only what changed
+
+    The effect chain is split into stages, each keyed by the parameters
+    it reads plus the key of the stage before it:
+
+        held     mono_downmix, sample_rate_reduction  input at the hold points
+        crushed  bit_depth, hard_clip, clip_threshold  held values quantized and clipped
+        wet      lowpass_freq                          filtered, full length (only with the filter)
+        output   mix                                   mixed with the dry input and normalized
+
+    Each stage keeps its latest result, so moving the mix re-runs only
+    the blend with the cached wet signal, and moving the cutoff reuses the
+    crushed values. The first two stages only hold one value per hold
+    point. Renders are bit-identical to `render_file`. `ran` lists the
+    stages the last `render` computed. Safe to share between threads;
+    renders run one at a time.
+
+    Progress goes to `progress(stage, done, total)` like `render_file`'s:
+    the decode reports "read", the effect stages "crush" and the
+    normalization "normalize".
+    """
+    STAGES = (
+        ("held", ("mono_downmix", "sample_rate_reduction")),
+        ("crushed", ("bit_depth", "hard_clip", "clip_threshold")),
+        ("wet", ("lowpass_freq",)),
+        ("output", ("mix",)),
+    )
+
+    def __init__(self, input_path, progress=None):
+        self.input_path = input_path
+        self.identity = file_identity(input_path)
+        self.dry, self.sample_rate = read_wav(input_path, ProgressReporter(progress))
+        self.dry.flags.writeable = False
+        self.ran = []
+        self._keys = {}
+        self._results = {}
+        self._normalized = (0.0, 1.0)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_nbytes(n_channels, n_frames):
+        """Most memory a pipeline for an input of this size holds
+
+        The dry input and output are float32 and the filtered wet signal
+        float64; the held and crushed values are float64 too and only reach
+        full length without sample rate reduction. The output also keeps a
+        mono mixdown for drawing.
+        """
+        return n_frames * (n_channels * 32 + 4)
+
+    @property
+    def nbytes(self):
+        """Memory held by the decoded input and the cached stages"""
+        total = self.dry.nbytes
+        for result in self._results.values():
+            if isinstance(result, RenderedAudio):
+                total += result.nbytes
+            elif result is not None:
+                total += sum(getattr(part, "nbytes", 0) for part in result)
+        return total
+
+    def render(self, params, log=None, progress=None):
+        """Normalized RenderedAudio of the input with `params`
+
+        `log` gets the same settings and normalization lines as
+        `render_file` writes.
+        """
+        progress = ProgressReporter(progress)
+        params = params.canonical()
+        with self._lock, profiler.span("render", input=self.input_path, mode="pipeline"):
+            if log is not None:
+                _log_render_header(log, params, *self.dry.shape, self.sample_rate)
+            self.ran = []
+            key = ()
+            for name, fields in self.STAGES:
+                key += tuple(getattr(params, field) for field in fields)
+                if self._keys.get(name) != key:
+                    with profiler.span(name):
+                        self._results[name] = getattr(self, f"_run_{name}")(params, progress)
+                    self._keys[name] = key
+                    self.ran.append(name)
+            if log is not None:
+                peak, gain = self._normalized
+                log("\nNormalizing output...")
+                if peak > 0:
+                    log(f"  Peak level: {peak * 100:.1f}%")
+                    log(f"  Normalization gain: {gain * 100:.1f}%")
+            return self._results["output"]
+
+    def _run_held(self, params, progress):
+        """(hold points, input at them, integer factor or None): the unexpanded sample-and-hold"""
+        n_channels, n_frames = self.dry.shape
+        reduction = params.sample_rate_reduction
+        step = int(reduction) if reduction.is_integer() else None
+        _report(progress, "crush", 0, n_frames, n_channels)
+        if step:
+            points = np.arange(0, n_frames, step)
         else:
-            duration = self.processed_duration
-            label = self.processed_time_label
-
-        pos_str = self.format_time(position_sec)
-        dur_str = self.format_time(duration)
-        label.set_text(f"{pos_str} / {dur_str}")
-
-    def format_time(self, seconds):
-        """Format seconds as MM:SS"""
-        minutes = int(seconds // 60)
-        secs = int(seconds % 60)
-        return f"{minutes}:{secs:02d}"
-
-    def show_error(self, message):
-        dialog = Adw.MessageDialog.new(self)
-        dialog.set_heading("Error")
-        dialog.set_body(message)
-        dialog.add_response("ok", "OK")
-        dialog.present()
-
-
-class BitcrusherApplication(Adw.Application):
-    def __init__(self):
-        super().__init__(application_id='com.github.bitcrusher',
-                         flags=Gio.ApplicationFlags.FLAGS_NONE)
-
-    def do_activate(self):
-        win = self.get_active_window()
-        if not win:
-            win = BitcrusherWindow(application=self)
-        win.present()
-
-
-def main():
+            # Match JS `i % reduction === 0` for fractional factors
+            points = np.concatenate([
+                start + np.flatnonzero(np.fmod(np.arange(start, min(start + BLOCK_FRAMES, n_frames),
+                                                         dtype=np.float64), reduction) == 0)
+                for start in range(0, n_frames, BLOCK_FRAMES)] or [np.arange(0)])
+        values = self.dry[:, points].astype(np.float64)
+        if params.mono_downmix and n_channels:
+            values = values.sum(axis=0, keepdims=True) / n_channels
+        return points, values, step
+
+    def _run_crushed(self, params, progress):
+        points, values, step = self._results["held"]
+        return points, Bitcrusher(params)._crush(values), step
+
+    def _expand(self, start, stop):
+        """Crushed values held over frames [start, stop), as a new float64 array"""
+        points, values, step = self._results["crushed"]
+        if step:
+            first = start // step
+            held = np.repeat(values[:, first:-(-stop // step)], step, axis=1)
+            return held[:, start - first * step:stop - first * step]
+        index = np.searchsorted(points, np.arange(start, stop), side='right') - 1
+        return values[:, index]
+
+    def _run_wet(self, params, progress):
+        if not params.lowpass_freq:
+            return None
+        rc = 1.0 / (params.lowpass_freq * 2 * math.pi)
+        dt = 1.0 / self.sample_rate
+        alpha = dt / (rc + dt)
+        n_frames = self.dry.shape[1]
+        wet = np.empty((self._results["crushed"][1].shape[0], n_frames))
+        state = np.zeros(wet.shape[0])
+        for start in range(0, n_frames, BLOCK_FRAMES):
+            stop = min(start + BLOCK_FRAMES, n_frames)
+            block = self._expand(start, stop)
+            block *= alpha
+            block = _linear_scan(block, 1.0 - alpha, state)
+            state = block[:, -1].copy()
+            wet[:, start:stop] = block
+            _report(progress, "crush", stop, n_frames, self.dry.shape[0])
+        return (wet,)
+
+    def _run_output(self, params, progress):
+        n_channels, n_frames = self.dry.shape
+        output = np.empty((n_channels, n_frames), dtype=np.float32)
+        for start in range(0, n_frames, BLOCK_FRAMES):
+            stop = min(start + BLOCK_FRAMES, n_frames)
+            if self._results["wet"] is not None:
+                wet = self._results["wet"][0][:, start:stop] * params.mix
+            else:
+                wet = self._expand(start, stop)
+                wet *= params.mix
+            dry = self.dry[:, start:stop].astype(np.float64)
+            dry *= 1 - params.mix
+            dry += wet
+            np.minimum(dry, 1.0, out=dry)
+            np.maximum(dry, -1.0, out=dry)
+            output[:, start:stop] = dry
+            _report(progress, "crush", stop, n_frames, n_channels)
+        self._normalized = normalize(output, progress=progress)
+        return RenderedAudio.from_channels(output, self.sample_rate)
+
+
+def audition_presets(input_path, names=None, cache=None, max_workers=None):
+    """Render presets of one input from a single shared decode
+
+    Yields (name, RenderedAudio) as each preset finishes. The input is
+    decoded once into a read-only buffer that every render reads from,
+    so memory stays near one decoded copy plus the outputs. The renders
+    run side by side on a thread pool, like `ChannelPool`. Renders found
+    in `cache` are yielded first and new ones are added to it. Closing
+    the generator drops renders that have not started.
+    """
+    names = list(PRESETS) if names is None else list(names)
+    pending = {}
+    for name in names:
+        params = CrushParams.from_preset(name)
+        key = RenderCache.key(input_path, params) if cache is not None else None
+        rendered = cache.get(key) if key else None
+        if rendered:
+            yield name, rendered
+        else:
+            pending[name] = (params, key)
+    if not pending:
+        return
+
+    channels, sample_rate = read_wav(input_path)
+    channels.flags.writeable = False
+
+    def render(name, params):
+        with profiler.span("audition", preset=name):
+            processed = Bitcrusher(params).process(channels, sample_rate)
+            normalize(processed)
+            return RenderedAudio.from_channels(processed, sample_rate)
+
+    workers = max(1, min(len(pending), max_workers or os.cpu_count() or 1))
+    executor = ThreadPoolExecutor(workers, "audition")
+    try:
+        futures = {executor.submit(render, name, params): name
+                   for name, (params, _) in pending.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            rendered = future.result()
+            if cache is not None:
+                cache.put(pending[name][1], rendered)
+            yield name, rendered
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+# Output encodings as (WAV format tag, bits per sample)
+OUTPUT_FORMATS = {
+    "pcm8": (_WAVE_FORMAT_PCM, 8),
+    "pcm16": (_WAVE_FORMAT_PCM, 16),
+    "pcm24": (_WAVE_FORMAT_PCM, 24),
+    "float32": (_WAVE_FORMAT_IEEE_FLOAT, 32),
+}
+
+
+def output_format(params, input_format):
+    """The "auto" output encoding: the smallest that keeps the crushed detail
+
+    A fully wet signal without the low-pass filter only takes
+    2 ** bit_depth - 1 levels each side of zero. Two more bits than the
+    bit depth keep every level at least one code apart after
+    normalization, so a 4-bit render fits 8-bit PCM. A dry mix or the
+    filter brings back detail finer than the bit depth, which gets the
+    input's own encoding.
+    """
+    if params.mix >= 1 and not params.lowpass_freq:
+        needed = math.ceil(params.bit_depth) + 2
+        for name in ("pcm8", "pcm16", "pcm24"):
+            if OUTPUT_FORMATS[name][1] >= needed:
+                return name
+        return "float32"
+    return input_format
+
+
+def resolve_output_format(fmt, params, input_path):
+    """Resolve "auto" for `input_path`; other format names pass through"""
+    if fmt != "auto":
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format \"{fmt}\"")
+        return fmt
+    with WavReader(input_path) as reader:
+        return output_format(params, reader.format)
+
+
+class WavWriter:
+    """Stream planar float32 blocks into a WAV file of any output format
+
+    The header is written with zero sizes and patched on `close`, so the
+    length doesn't have to be known up front. PCM is scaled like node-wav
+    decodes it (negative values by 2^(n-1), positive ones by 2^(n-1) - 1)
+    and rounded, so a file round-trips through `WavReader` unchanged.
+    With `dither`, triangular (TPDF) noise of +/-1 LSB is added before
+    rounding, from a generator seeded with `seed` so renders repeat
+    exactly.
+    """
+    _HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+    def __init__(self, filepath, n_channels, sample_rate, fmt="float32", dither=False, seed=0):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format \"{fmt}\"")
+        self.format = fmt
+        self.format_tag, self.bits = OUTPUT_FORMATS[fmt]
+        self.n_channels = n_channels
+        self.sample_rate = sample_rate
+        self.n_frames = 0
+        self.rng = np.random.default_rng(seed) if dither and fmt != "float32" else None
+        self.file = open(filepath, 'wb')
+        self.file.write(self._header())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _header(self):
+        width = self.bits // 8
+        data_size = self.n_frames * self.n_channels * width
+        return self._HEADER.pack(
+            b'RIFF', 36 + data_size, b'WAVE',
+            b'fmt ', 16, self.format_tag, self.n_channels, self.sample_rate,
+            self.sample_rate * self.n_channels * width, self.n_channels * width, self.bits,
+            b'data', data_size)
+
+    def encode(self, block):
+        """Interleaved bytes for a planar (channels, frames) block"""
+        frames = block.T
+        if self.format == "float32":
+            return np.ascontiguousarray(frames, dtype='<f4').tobytes()
+
+        full_scale = 2.0 ** (self.bits - 1)
+        values = np.clip(frames.astype(np.float64), -1.0, 1.0)
+        scaled = values * np.where(values < 0, full_scale, full_scale - 1)
+        if self.rng is not None:
+            noise = self.rng.random(frames.shape + (2,))
+            scaled += noise[..., 0] - noise[..., 1]
+        codes = np.ascontiguousarray(
+            np.clip(np.floor(scaled + 0.5), -full_scale, full_scale - 1), dtype="<i4")
+        if self.bits == 8:
+            return (codes + 128).astype(np.uint8).tobytes()
+        if self.bits == 16:
+            return codes.astype('<i2').tobytes()
+        return codes.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+    def write(self, block):
+        """Append a planar (channels, frames) block"""
+        with profiler.span("encode"):
+            raw = self.encode(block)
+        with profiler.span("write"):
+            self.file.write(raw)
+        self.n_frames += block.shape[1]
+
+    def close(self):
+        """Patch the header with the final sizes and close the file"""
+        if self.file.closed:
+            return
+        try:
+            self.file.seek(0)
+            self.file.write(self._header())
+        finally:
+            self.file.close()
+
+
+def write_wav(filepath, channels, sample_rate, progress=None, fmt="float32", dither=False):
+    """Write planar float32 audio as a WAV file in one of OUTPUT_FORMATS"""
+    n_channels, n_frames = channels.shape
+    with WavWriter(filepath, n_channels, sample_rate, fmt, dither) as writer:
+        _report(progress, "write", 0, n_frames, n_channels)
+        for start in range(0, n_frames, BLOCK_FRAMES):
+            writer.write(channels[:, start:start + BLOCK_FRAMES])
+            _report(progress, "write", min(start + BLOCK_FRAMES, n_frames), n_frames, n_channels)
+
+
+def _log_render_header(log, params, n_channels, n_frames, sample_rate):
+    """Log the input and effect settings the way index.js does"""
+    log(f"Sample Rate: {sample_rate} Hz")
+    log(f"Channels: {n_channels}")
+    log(f"Duration: {n_frames / sample_rate:.2f}s")
+
+    log("\nApplying bitcrusher effect:")
+    log(f"  Bit Depth: {params.bit_depth:g} bits")
+    log(f"  Sample Rate Reduction: {params.sample_rate_reduction:g}x")
+    log(f"  Mix: {params.mix * 100:.0f}%")
+    if params.lowpass_freq:
+        log(f"  Low-pass Filter: {params.lowpass_freq:g} Hz")
+    if params.hard_clip:
+        log(f"  Hard Clipping: enabled (threshold: {params.clip_threshold:g})")
+    if params.mono_downmix:
+        log("  Mono Downmix: enabled")
+
+
+def render_file(input_path, output_path, params, log=print, progress=None, max_workers=None,
+                output_format="auto", dither=False):
+    """Read, crush, normalize and write a WAV file (the index.js `process` path)
+
+    `progress(stage, done, total)` receives rate-limited sample counts for
+    the "read", "crush", "normalize" and "write" stages. Channels are
+    split across up to `max_workers` threads (see `channel_workers`).
+    `output_format` is one of OUTPUT_FORMATS or "auto" (see `output_format`),
+    and `dither` adds TPDF dither to PCM output.
+    """
+    progress = ProgressReporter(progress)
+    fmt = resolve_output_format(output_format, params, input_path)
+    with profiler.span("render", input=input_path, mode="memory"):
+        log(f"Reading: {input_path}")
+        channels, sample_rate = read_wav(input_path, progress)
+        n_channels, n_frames = channels.shape
+        _log_render_header(log, params, n_channels, n_frames, sample_rate)
+
+        workers = channel_workers(n_channels, params, max_workers)
+        with ChannelPool(params, n_channels, workers) as pool:
+            processed = pool.process(channels, sample_rate, progress)
+        del channels
+
+        log("\nNormalizing output...")
+        peak, gain = normalize(processed, progress=progress)
+        if peak > 0:
+            log(f"  Peak level: {peak * 100:.1f}%")
+            log(f"  Normalization gain: {gain * 100:.1f}%")
+
+        write_wav(output_path, processed, sample_rate, progress, fmt, dither)
+    log(f"\nOutput saved to: {output_path} ({_format_label(fmt, dither)})")
+    return processed, sample_rate
+
+
+def _format_label(fmt, dither):
+    bits = OUTPUT_FORMATS[fmt][1]
+    if fmt == "float32":
+        return "32-bit float"
+    return f"{bits}-bit PCM" + (", dithered" if dither else "")
+
+
+def render_stream(input_path, output_path, params, log=print, progress=None, max_workers=None,
+                  output_format="auto", dither=False, peaks=False):
+    """Like `render_file`, but in constant memory; returns (channels, frames, rate)
+
+    Blocks go from the memory-mapped input through the effect into a raw
+    float32 scratch file, tracking the peak on the way; that pass reports
+    as the "crush" stage. Normalization then maps the scratch file back
+    and streams it, scaled, through a `WavWriter`, so only a couple of
+    blocks are ever resident and the result matches `render_file` bit for
+    bit. The output is written next to its final path and moved into place
+    when complete, so rendering a file onto itself is safe. Channels are
+    split across threads as in `render_file`.
+
+    With `peaks`, a PeakPyramid of the output is returned as a fourth value.
+    It is reduced from the normalized blocks on their way to the writer, so
+    drawing the render needs no second pass over the file; PCM outputs may
+    differ from it by their quantization step. Zoomed-in views read the
+    finished output through a memory-mapped WavReader.
+    """
+    progress = ProgressReporter(progress)
+    fmt = resolve_output_format(output_format, params, input_path)
+    log(f"Reading: {input_path}")
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    scratch_path = f"{output_path}.{os.getpid()}.raw"
+    try:
+        with profiler.span("render", input=input_path, mode="stream"):
+            with WavReader(input_path) as reader:
+                n_channels, n_frames = reader.n_channels, reader.n_frames
+                sample_rate = reader.sample_rate
+                _log_render_header(log, params, n_channels, n_frames, sample_rate)
+
+                workers = channel_workers(n_channels, params, max_workers)
+                peak = 0.0
+                peak_mins, peak_maxs = [], []
+                with ChannelPool(params, n_channels, workers) as crusher, open(scratch_path, 'wb') as f:
+                    _report(progress, "crush", 0, n_frames, n_channels)
+                    for start in range(0, n_frames, BLOCK_FRAMES):
+                        block = reader.read(start, start + BLOCK_FRAMES)
+                        with profiler.span("dsp"):
+                            block = crusher.process_block(block, sample_rate)
+                            peak = max(peak, float(np.max(np.abs(block))))
+                        with profiler.span("write"):
+                            f.write(np.ascontiguousarray(block.T, dtype='<f4').tobytes())
+                        _report(progress, "crush", min(start + BLOCK_FRAMES, n_frames),
+                                n_frames, n_channels)
+
+            log("\nNormalizing output...")
+            gain = NORMALIZE_HEADROOM / peak if peak > 0 else 1.0
+            with WavWriter(tmp_path, n_channels, sample_rate, fmt, dither) as writer:
+                if n_frames:
+                    data = np.memmap(scratch_path, dtype='<f4', mode='r', shape=(n_frames, n_channels))
+                    _report(progress, "normalize", 0, n_frames, n_channels)
+                    for start in range(0, n_frames, BLOCK_FRAMES):
+                        block = data[start:start + BLOCK_FRAMES].T
+                        if peak > 0:
+                            with profiler.span("normalize"):
+                                scaled = block.astype(np.float64) * gain
+                                np.clip(scaled, -1.0, 1.0, out=scaled)
+                                block = scaled.astype(np.float32)
+                        writer.write(block)
+                        if peaks:
+                            block_mins, block_maxs = _block_peaks(_mixdown(block))
+                            peak_mins.append(block_mins)
+                            peak_maxs.append(block_maxs)
+                        _report(progress, "normalize", min(start + BLOCK_FRAMES, n_frames),
+                                n_frames, n_channels)
+                    del data
+            if peak > 0:
+                log(f"  Peak level: {peak * 100:.1f}%")
+                log(f"  Normalization gain: {gain * 100:.1f}%")
+
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, scratch_path):
+            if os.path.exists(path):
+                os.remove(path)
+    log(f"\nOutput saved to: {output_path} ({_format_label(fmt, dither)})")
+    if not peaks:
+        return n_channels, n_frames, sample_rate
+    if not peak_mins:
+        peak_mins = peak_maxs = [np.zeros(0, dtype=np.float32)]
+    # The pyramid keeps the mapping open to draw zoomed-in views
+    pyramid = PeakPyramid(n_frames, np.concatenate(peak_mins), np.concatenate(peak_maxs),
+                          read=WavReader(output_path).read_mono)
+    return n_channels, n_frames, sample_rate, pyramid
+
+
+def render_region(input_path, start, stop, params):
+    """Render frames [start, stop) of a file on their own; returns RenderedAudio
+
+    Only the region and a short pre-roll are read and crushed (see
+    `prime_crusher`), so the cost follows the region's length rather than
+    the file's. The region is normalized to its own peak.
+    """
+    with profiler.span("render", input=input_path, mode="region"):
+        with WavReader(input_path) as reader:
+            start = max(0, min(int(start), reader.n_frames))
+            stop = max(start, min(int(stop), reader.n_frames))
+            sample_rate = reader.sample_rate
+            crusher = Bitcrusher(params)
+            prime_crusher(crusher, reader, start)
+            output = np.empty((reader.n_channels, stop - start), dtype=np.float32)
+            for block_start in range(start, stop, BLOCK_FRAMES):
+                block_stop = min(block_start + BLOCK_FRAMES, stop)
+                with profiler.span("dsp"):
+                    output[:, block_start - start:block_stop - start] = crusher.process_block(
+                        reader.read(block_start, block_stop), sample_rate)
+        normalize(output)
+        return RenderedAudio.from_channels(output, sample_rate)
+
+
+def validate_params(params):
+    """Reject out-of-range parameters (same limits as index.js)"""
+    if params.bit_depth < 1 or params.bit_depth > 16:
+        raise ValueError("Bit depth must be between 1 and 16")
+    if params.sample_rate_reduction < 1:
+        raise ValueError("Sample rate reduction must be at least 1")
+    if params.mix < 0 or params.mix > 1:
+        raise ValueError("Mix must be between 0.0 and 1.0")
+
+
+def collect_inputs(patterns):
+    """Expand files, directories (searched recursively) and globs to WAV paths"""
+    found = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                for root, dirs, files in os.walk(match):
+                    dirs.sort()
+                    found.extend(os.path.join(root, name) for name in sorted(files)
+                                 if name.lower().endswith('.wav'))
+            elif os.path.isfile(match):
+                found.append(match)
+            else:
+                raise FileNotFoundError(f"Input file not found: {match}")
+
+    # De-duplicate, keeping the first occurrence
+    unique = []
+    seen = set()
+    for path in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def batch_output_path(input_path, output_dir=None, suffix="_crushed"):
+    """Output path for a batch input: next to it, or inside `output_dir`"""
+    path = Path(input_path)
+    directory = Path(output_dir) if output_dir else path.parent
+    return str(directory / f"{path.stem}{suffix}{path.suffix}")
+
+
+def _render_job(input_path, output_path, params, profile=False, max_workers=1,
+                output_format="auto", dither=False):
+    """Render one batch file in a pool worker, using up to `max_workers` threads
+
+    Returns (frames, channels, rate, seconds, spans); with `profile` the
+    worker's spans come back for the parent's profiler, otherwise None.
+    """
+    if profile:
+        profiler.enabled = True
+        profiler.clear()
+    start = time.perf_counter()
+    n_channels, n_frames, sample_rate = render_stream(input_path, output_path, params,
+                                                      log=lambda line: None,
+                                                      max_workers=max_workers,
+                                                      output_format=output_format, dither=dither)
+    spans = list(profiler.spans) if profile else None
+    return n_frames, n_channels, sample_rate, time.perf_counter() - start, spans
+
+
+def _format_rate(samples, seconds):
+    """Human readable samples/s"""
+    rate = samples / seconds if seconds > 0 else float('inf')
+    return f"{rate / 1e6:.1f} M samples/s"
+
+
+def batch_main(argv):
+    """Entry point for `bitcrusher batch`"""
+    parser = argparse.ArgumentParser(
+        prog="bitcrusher batch",
+        description="Render WAV files headlessly across a pool of processes")
+    parser.add_argument("inputs", nargs="+",
+                        help="WAV files, directories (searched recursively) or glob patterns")
+    parser.add_argument("-p", "--preset", help=f"Use a preset ({', '.join(PRESETS)})")
+    parser.add_argument("-b", "--bit-depth", type=float, help="Bit depth (1-16)")
+    parser.add_argument("-s", "--sample-rate", type=float, help="Sample rate reduction factor")
+    parser.add_argument("-m", "--mix", type=float, help="Wet/dry mix (0.0-1.0)")
+    parser.add_argument("-f", "--format", choices=("auto", *OUTPUT_FORMATS), default="auto",
+                        help="Output encoding (default: auto, the smallest that holds the "
+                             "crushed signal)")
+    parser.add_argument("--dither", action="store_true", help="Add TPDF dither to PCM output")
+    parser.add_argument("-o", "--output-dir", help="Write outputs here instead of next to each input")
+    parser.add_argument("--suffix", default="_crushed", help="Output filename suffix (default: _crushed)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="Skip files whose output is newer than the input")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Record timing spans and write them to FILE")
+    parser.add_argument("--profile-format", choices=("json", "chrome"),
+                        help="Profile format (default: chrome for *.trace.json, else json)")
+    args = parser.parse_args(argv)
+
+    # Determine effect parameters
+    try:
+        params = CrushParams.from_preset(args.preset) if args.preset else CrushParams()
+        if args.bit_depth is not None:
+            params = replace(params, bit_depth=args.bit_depth)
+        if args.sample_rate is not None:
+            params = replace(params, sample_rate_reduction=args.sample_rate)
+        if args.mix is not None:
+            params = replace(params, mix=args.mix)
+        validate_params(params)
+        inputs = collect_inputs(args.inputs)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1", file=sys.stderr)
+        return 2
+
+    jobs = {path: batch_output_path(path, args.output_dir, args.suffix) for path in inputs}
+    # Never treat another input's output as an input of its own
+    outputs = {os.path.abspath(output) for output in jobs.values()}
+    jobs = {path: output for path, output in jobs.items() if os.path.abspath(path) not in outputs}
+    # Same-named inputs from different folders would overwrite each other
+    # in a shared output directory
+    writers = {}
+    for path, output in jobs.items():
+        writers.setdefault(os.path.normcase(os.path.abspath(output)), []).append(path)
+    clashes = [(jobs[paths[0]], paths) for paths in writers.values() if len(paths) > 1]
+    if clashes:
+        for output, paths in clashes:
+            print(f"Error: {', '.join(paths)} would all be written to {output}", file=sys.stderr)
+        return 2
+
+    if args.update:
+        pending = {path: output for path, output in jobs.items()
+                   if not (os.path.exists(output)
+                           and os.path.getmtime(output) >= os.path.getmtime(path))}
+        skipped = len(jobs) - len(pending)
+        jobs = pending
+    else:
+        skipped = 0
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # Cores left over when there are fewer files than CPUs go to the
+    # channels of multichannel files
+    n_workers = min(args.jobs, max(len(jobs), 1))
+    channel_threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    print(f"Rendering {len(jobs)} file(s) with {n_workers} worker(s)"
+          + (f", {skipped} up to date" if skipped else ""))
+
+    if args.profile:
+        profiler.enabled = True
+
+    failed = 0
+    total_samples = 0
+    total_audio = 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = {pool.submit(_render_job, path, output, params, profiler.enabled,
+                               channel_threads, args.format, args.dither): (path, output)
+                   for path, output in jobs.items()}
+        for future in as_completed(futures):
+            path, output = futures[future]
+            try:
+                n_frames, n_channels, sample_rate, seconds, spans = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"✗ {path}: {e}", file=sys.stderr)
+                continue
+            if spans:
+                profiler.extend(spans)
+
+            samples = n_frames * n_channels
+            audio = n_frames / sample_rate if sample_rate else 0.0
+            total_samples += samples
+            total_audio += audio
+            print(f"✓ {path} -> {output} ({audio:.1f}s audio in {seconds:.2f}s, "
+                  f"{_format_rate(samples, seconds)})")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(jobs) - failed} rendered, {failed} failed, {skipped} skipped in {elapsed:.2f}s")
+    if total_samples:
+        print(f"Throughput: {_format_rate(total_samples, elapsed)}, "
+              f"{total_audio / elapsed:.1f}x realtime")
+    if args.profile:
+        profiler.dump(args.profile, args.profile_format)
+        print(f"Profile saved to: {args.profile}")
+    return 1 if failed else 0
+
+
+def __getattr__(name):
+    # GUI classes are loaded on first access so the engine never imports GTK
+    if name in ("WaveformWidget", "BitcrusherWindow", "BitcrusherApplication"):
+        import bitcrusher_gui
+        return getattr(bitcrusher_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    if len(argv) > 1 and argv[1] == "batch":
+        return batch_main(argv[2:])
+
+    from bitcrusher_gui import BitcrusherApplication
     app = BitcrusherApplication()
-    return app.run(sys.argv)
+    return app.run(argv)
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
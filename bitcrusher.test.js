@@ -4,7 +4,7 @@
 
 import { test, describe } from 'node:test';
 import assert from 'node:assert';
-import { Bitcrusher, presets } from './bitcrusher.js';
+import { Bitcrusher, presets, chooseOutputFormat } from './bitcrusher.js';
 
 describe('Bitcrusher Class', () => {
   describe('Constructor', () => {
@@ -239,6 +239,50 @@ describe('Bitcrusher Class', () => {
       assert.ok(Math.abs(output[2] - output[3]) > 0.1);
     });
   });
+
+  describe('Multichannel Processing', () => {
+    const sixChannels = () => [0.8, 0.4, -0.2, 0.1, 0.6, -0.5].map(
+      (value, c) => Float32Array.from({ length: 16 }, (_, i) => value * Math.cos(i / (c + 2))));
+
+    test('should match stereo processing for two channels', () => {
+      const options = { bitDepth: 6, sampleRateReduction: 3, lowpassFreq: 4000, hardClip: true };
+      const [left, right] = sixChannels();
+      const interleaved = new Float32Array(left.length * 2);
+      left.forEach((value, i) => { interleaved[i * 2] = value; interleaved[i * 2 + 1] = right[i]; });
+
+      for (const monoDownmix of [false, true]) {
+        const stereo = new Bitcrusher({ ...options, monoDownmix }).processStereo(interleaved, 44100);
+        const [outLeft, outRight] = new Bitcrusher({ ...options, monoDownmix })
+          .processChannels([left, right], 44100);
+        assert.deepStrictEqual(Array.from(outLeft), Array.from(stereo.filter((_, i) => i % 2 === 0)));
+        assert.deepStrictEqual(Array.from(outRight), Array.from(stereo.filter((_, i) => i % 2 === 1)));
+      }
+    });
+
+    test('should process each of six channels independently', () => {
+      const channels = sixChannels();
+      const output = new Bitcrusher({ bitDepth: 8, sampleRateReduction: 2 })
+        .processChannels(channels, 44100);
+
+      assert.strictEqual(output.length, 6);
+      channels.forEach((channel, c) => {
+        const alone = new Bitcrusher({ bitDepth: 8, sampleRateReduction: 2 }).process(channel, 44100);
+        assert.deepStrictEqual(Array.from(output[c]), Array.from(alone));
+      });
+    });
+
+    test('should downmix all channels to their average', () => {
+      const channels = sixChannels();
+      const output = new Bitcrusher({ bitDepth: 16, sampleRateReduction: 1, monoDownmix: true })
+        .processChannels(channels, 44100);
+
+      const average = channels.reduce((sum, channel) => sum + channel[0], 0) / 6;
+      for (const channel of output) {
+        assert.strictEqual(channel[0], output[0][0]);
+      }
+      assert.ok(Math.abs(output[0][0] - average) < 1e-4);
+    });
+  });
 });
 
 describe('Presets', () => {
@@ -290,6 +334,20 @@ describe('Presets', () => {
   });
 });
 
+describe('Output Format', () => {
+  test('should pick the smallest PCM format that holds the crushed levels', () => {
+    assert.strictEqual(chooseOutputFormat({ bitDepth: 4, mix: 1 }, 'float32'), 'pcm8');
+    assert.strictEqual(chooseOutputFormat({ bitDepth: 6.5, mix: 1 }, 'float32'), 'pcm16');
+    assert.strictEqual(chooseOutputFormat({ bitDepth: 16, mix: 1 }, 'pcm16'), 'pcm24');
+  });
+
+  test('should keep the input format when filtering or mixing in the dry signal', () => {
+    assert.strictEqual(chooseOutputFormat(presets.gameboy, 'pcm16'), 'pcm16');
+    assert.strictEqual(chooseOutputFormat(presets.mild, 'float32'), 'float32');
+    assert.strictEqual(chooseOutputFormat({ bitDepth: 4, mix: 0.5 }, 'pcm24'), 'pcm24');
+  });
+});
+
 describe('Low-pass Filter', () => {
   test('should apply low-pass filter when frequency is set', () => {
     const bc = new Bitcrusher({
@@ -0,0 +1,1850 @@
+#!/usr/bin/env python3
+"""
+Bitcrusher GUI - A GNOME application for applying bitcrusher effects to WAV files
+"""
+
+import gi
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+
+from gi.repository import Gtk, Adw, Gdk, Gio, GLib, GObject
+
+from bitcrusher import (CrushParams, ProgressReporter, enable_profiling, profiler,
+                        ABStream, BufferStream, ReaderStream,
+                        PeakCache, PeakPyramid,
+                        RenderCache, RenderedAudio, RenderPipeline, file_identity,
+                        render_file, render_region, render_stream, audition_presets,
+                        WavReader, resolve_output_format, write_wav)
+
+# Share of the progress bar given to each render stage, as (start, span)
+RENDER_STAGES = {
+    "read": (0.0, 0.15),
+    "crush": (0.15, 0.55),
+    "normalize": (0.7, 0.1),
+    "write": (0.8, 0.2),
+}
+STREAM_STAGES = {
+    "crush": (0.0, 0.85),
+    "normalize": (0.85, 0.15),
+}
+STAGE_LABELS = {
+    "read": "Reading input file",
+    "crush": "Applying effect",
+    "normalize": "Normalizing",
+    "write": "Writing output",
+}
+
+# Lines kept in the processing console; older ones scroll out
+STATUS_MAX_LINES = 500
+
+# Milliseconds between refreshes of the performance panel while shown
+STATS_INTERVAL_MS = 500
+
+# Waveform height in pixels, and per channel when showing channel lanes
+WAVEFORM_HEIGHT = 120
+LANE_HEIGHT = 48
+
+# Subtitle of the Process Selection row while nothing is selected
+SELECTION_HINT = "Shift-drag on the Original waveform, then preview and export only that range"
+
+# How long settings must stay still before a quick re-render from the
+# cached stages starts
+RERENDER_DELAY_MS = 150
+
+# Height of the waveform thumbnails in the preset audition grid
+AUDITION_THUMB_HEIGHT = 40
+
+# GStreamer is imported and initialized by init_gst() when the first
+# player is created, so starting the app doesn't pay for it up front
+Gst = None
+_gst_lock = threading.Lock()
+
+
+def init_gst():
+    """Import and initialize GStreamer on first use"""
+    global Gst
+    with _gst_lock:
+        if Gst is None:
+            gi.require_version('Gst', '1.0')
+            from gi.repository import Gst as gst
+            gst.init(None)
+            Gst = gst
+    return Gst
+
+
+def _format_seconds(seconds):
+    return f"{seconds * 1000:.1f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+
+def format_stats(stats):
+    """Text for the performance panel from `Profiler.stats()`
+
+    One line per top-level operation with its latest time, followed by
+    the time spent in each stage nested in it, slowest first.
+    """
+    lines = []
+    for name, entry in sorted(stats["latest"].items()):
+        line = f"{name:<16} {_format_seconds(entry['seconds']):>9}"
+        stages = sorted(entry["stages"].items(), key=lambda item: -item[1])
+        if stages:
+            line += "  " + " · ".join(f"{stage} {_format_seconds(seconds)}"
+                                      for stage, seconds in stages)
+        lines.append(line)
+    if not lines:
+        lines.append("No timings yet")
+    lines.append(f"Peak memory: {stats['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    return "\n".join(lines)
+
+
+class WaveformWidget(Gtk.DrawingArea):
+    """Custom widget to draw audio waveform
+
+    Dragging pans the view; Shift-dragging selects a range of samples and
+    emits "selection-changed" when the drag ends.
+    """
+    __gsignals__ = {
+        "selection-changed": (GObject.SignalFlags.RUN_FIRST, None, ()),
+    }
+
+    def __init__(self, height=WAVEFORM_HEIGHT):
+        super().__init__()
+        self.base_height = height  # Content height without channel lanes
+        self.peaks = None
+        self.lanes = None  # One PeakPyramid per channel, when split
+        self.playback_position = 0.0  # 0.0 to 1.0
+        self.view_start = 0.0  # First visible sample
+        self.view_span = 0.0  # Number of visible samples
+        self.pointer_x = 0.0
+        self.drag_start_view = 0.0
+        self.selection = None  # (start, stop) sample range, when selected
+        self.selection_anchor = None  # Sample a Shift-drag started from
+        self.waveform_cache = None  # cairo image surface holding the static waveform
+        self.waveform_cache_key = None
+        self.set_content_height(height)
+        self.set_draw_func(self.on_draw)
+
+        # Mouse-wheel zoom around the pointer
+        motion = Gtk.EventControllerMotion()
+        motion.connect("motion", self.on_motion)
+        self.add_controller(motion)
+
+        scroll = Gtk.EventControllerScroll.new(Gtk.EventControllerScrollFlags.VERTICAL)
+        scroll.connect("scroll", self.on_scroll)
+        self.add_controller(scroll)
+
+        # Drag to pan
+        drag = Gtk.GestureDrag()
+        drag.connect("drag-begin", self.on_drag_begin)
+        drag.connect("drag-update", self.on_drag_update)
+        drag.connect("drag-end", self.on_drag_end)
+        self.add_controller(drag)
+
+    def set_waveform(self, samples, lanes=None):
+        """Set waveform data from audio samples or a prebuilt PeakPyramid
+
+        With `lanes`, a list of per-channel pyramids, each channel is drawn
+        in a lane of its own; `samples` still drives zooming and panning.
+        """
+        if isinstance(samples, PeakPyramid):
+            self.peaks = samples if samples.n_samples else None
+        elif samples is None or len(samples) == 0:
+            self.peaks = None
+        else:
+            self.peaks = PeakPyramid.from_samples(samples)
+        self.selection = None
+        self.set_lanes(lanes)
+        self.reset_view()
+
+    def set_lanes(self, lanes):
+        """Draw one lane per channel, or the mixed-down signal for None"""
+        self.lanes = lanes if self.peaks and lanes and len(lanes) > 1 else None
+        self.set_content_height(max(self.base_height, LANE_HEIGHT * len(self.lanes))
+                                if self.lanes else self.base_height)
+        self.waveform_cache = None
+        self.queue_draw()
+
+    def reset_view(self):
+        """Show the whole signal"""
+        self.view_start = 0.0
+        self.view_span = float(self.peaks.n_samples) if self.peaks else 0.0
+        self.queue_draw()
+
+    def set_view(self, start, span):
+        """Show `span` samples from `start`, clamped to the signal"""
+        if not self.peaks:
+            return
+        total = self.peaks.n_samples
+        width = max(self.get_width(), 1)
+        # Allow zooming in to roughly 8 pixels per sample
+        self.view_span = min(max(span, width / 8), total)
+        self.view_start = min(max(start, 0.0), total - self.view_span)
+        self.queue_draw()
+
+    def on_motion(self, controller, x, y):
+        self.pointer_x = x
+
+    def on_scroll(self, controller, dx, dy):
+        """Zoom in/out around the pointer"""
+        if not self.peaks or dy == 0:
+            return False
+        width = max(self.get_width(), 1)
+        anchor = self.view_start + self.pointer_x / width * self.view_span
+        span = self.view_span * 1.25 ** dy
+        self.set_view(anchor - self.pointer_x / width * span, span)
+        return True
+
+    def sample_at(self, x):
+        """Sample under pixel column `x`, clamped to the signal"""
+        width = max(self.get_width(), 1)
+        sample = self.view_start + x / width * self.view_span
+        return int(round(min(max(sample, 0.0), self.peaks.n_samples)))
+
+    def set_selection(self, start, stop):
+        """Select samples [start, stop) in either order; an empty range clears it"""
+        start, stop = sorted((start, stop))
+        self.selection = (start, stop) if stop > start else None
+        self.queue_draw()
+
+    def on_drag_begin(self, gesture, x, y):
+        self.drag_start_view = self.view_start
+        shift = gesture.get_current_event_state() & Gdk.ModifierType.SHIFT_MASK
+        self.selection_anchor = (x, self.sample_at(x)) if self.peaks and shift else None
+
+    def on_drag_update(self, gesture, offset_x, offset_y):
+        """Pan the view with the pointer, or extend the selection with Shift"""
+        if not self.peaks:
+            return
+        if self.selection_anchor:
+            x, anchor = self.selection_anchor
+            self.set_selection(anchor, self.sample_at(x + offset_x))
+            return
+        width = max(self.get_width(), 1)
+        self.set_view(self.drag_start_view - offset_x / width * self.view_span, self.view_span)
+
+    def on_drag_end(self, gesture, offset_x, offset_y):
+        if self.selection_anchor:
+            self.selection_anchor = None
+            self.emit("selection-changed")
+
+    def set_playback_position(self, position):
+        """Set playback position (0.0 to 1.0)"""
+        width = self.get_width()
+        old_x = self.playhead_x(width)
+        self.playback_position = max(0.0, min(1.0, position))
+
+        # Only repaint when the cursor lands on a different pixel
+        if self.playhead_x(width) != old_x:
+            self.queue_draw()
+
+    def playhead_x(self, width):
+        """Pixel column of the playback cursor, or None when not visible"""
+        if not self.peaks or self.playback_position <= 0 or self.view_span <= 0:
+            return None
+        sample = self.playback_position * self.peaks.n_samples
+        position_x = round((sample - self.view_start) / self.view_span * width)
+        return position_x if 0 <= position_x <= width else None
+
+    def on_draw(self, area, cr, width, height):
+        """Draw the cached waveform and the playback cursor
+
+        The static waveform is rasterized once into an image surface at the
+        widget's scale factor. A group pushed on GTK's draw context would
+        only record the path and replay it on every frame.
+        """
+        scale = max(self.get_scale_factor(), 1)
+        key = (width, height, scale, self.view_start, self.view_span)
+        if self.waveform_cache is None or self.waveform_cache_key != key:
+            import cairo  # pycairo, only needed once GTK is drawing
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                         math.ceil(width * scale), math.ceil(height * scale))
+            surface.set_device_scale(scale, scale)
+            self.draw_waveform(cairo.Context(surface), width, height)
+            surface.flush()
+            self.waveform_cache = surface
+            self.waveform_cache_key = key
+
+        cr.set_source_surface(self.waveform_cache, 0, 0)
+        cr.paint()
+
+        # Shade the selection
+        if self.selection and self.view_span > 0:
+            x1, x2 = ((sample - self.view_start) / self.view_span * width
+                      for sample in self.selection)
+            cr.set_source_rgba(0.2, 0.6, 0.8, 0.25)
+            cr.rectangle(x1, 0, max(x2 - x1, 1), height)
+            cr.fill()
+
+        # Draw playback position line
+        position_x = self.playhead_x(width)
+        if position_x is not None:
+            cr.set_source_rgba(1, 0, 0, 0.7)
+            cr.set_line_width(2)
+            cr.move_to(position_x, 0)
+            cr.line_to(position_x, height)
+            cr.stroke()
+
+    def draw_waveform(self, cr, width, height):
+        """Draw the static waveform (rebuilt only on data, size or zoom changes)"""
+        # Background
+        cr.set_source_rgb(0.95, 0.95, 0.95)
+        cr.rectangle(0, 0, width, height)
+        cr.fill()
+
+        if not self.peaks:
+            # Draw placeholder text
+            cr.set_source_rgb(0.5, 0.5, 0.5)
+            cr.select_font_face("Sans", 0, 0)
+            cr.set_font_size(14)
+            text = "No audio loaded"
+            extents = cr.text_extents(text)
+            cr.move_to((width - extents.width) / 2, (height + extents.height) / 2)
+            cr.show_text(text)
+            return
+
+        # Draw every lane's waveform as one path of column segments
+        bands = self.lanes or [self.peaks]
+        band_height = height / len(bands)
+        for index, peaks in enumerate(bands):
+            self.add_peak_segments(cr, peaks, width, index * band_height, band_height)
+
+        cr.set_source_rgb(0.2, 0.6, 0.8)
+        cr.set_line_width(1)
+        cr.stroke()
+
+        if self.lanes:
+            # Lane dividers and channel numbers
+            cr.set_source_rgb(0.8, 0.8, 0.8)
+            for index in range(1, len(bands)):
+                cr.move_to(0, round(index * band_height) + 0.5)
+                cr.line_to(width, round(index * band_height) + 0.5)
+            cr.stroke()
+
+            cr.set_source_rgb(0.5, 0.5, 0.5)
+            cr.select_font_face("Sans", 0, 0)
+            cr.set_font_size(10)
+            for index in range(len(bands)):
+                cr.move_to(4, index * band_height + 12)
+                cr.show_text(f"{index + 1}")
+
+    def add_peak_segments(self, cr, peaks, width, top, height):
+        """Add the visible columns of `peaks` to the path, in a band from `top`"""
+        center_y = top + height / 2
+        scale_y = height / 2 * 0.9  # Leave some margin
+
+        mins, maxs = peaks.query(self.view_start, self.view_start + self.view_span, width)
+        columns = np.flatnonzero(~np.isnan(mins))
+        xs = (columns + 0.5).tolist()
+        y1s = (center_y - mins[columns] * scale_y).tolist()
+        y2s = (center_y - maxs[columns] * scale_y).tolist()
+
+        move_to, line_to = cr.move_to, cr.line_to
+        for x, y1, y2 in zip(xs, y1s, y2s):
+            move_to(x, y1)
+            line_to(x, y2)
+
+
+class StatusLog:
+    """Bounded, batched log sink for a TextView
+
+    `post` may be called from any thread. Lines are collected and written
+    to the buffer at most once per frame from a tick callback, the buffer
+    keeps only the last `max_lines` lines, and a single mark is reused to
+    keep the view scrolled to the end.
+    """
+    def __init__(self, view, max_lines=STATUS_MAX_LINES):
+        self.view = view
+        self.buffer = view.get_buffer()
+        self.max_lines = max_lines
+        self.end_mark = self.buffer.create_mark("status-end", self.buffer.get_end_iter(), False)
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=max_lines)
+        self._scheduled = False
+
+    def post(self, text):
+        """Queue text (ending in a newline) for the next frame"""
+        with self._lock:
+            self._pending.append(text)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        GLib.idle_add(self._schedule)
+
+    def clear(self):
+        """Drop everything shown and queued"""
+        with self._lock:
+            self._pending.clear()
+        self.buffer.set_text("")
+
+    def _schedule(self):
+        # Tick callbacks only run while the view is mapped
+        if self.view.get_mapped():
+            self.view.add_tick_callback(self._on_tick)
+        else:
+            self.flush()
+        return False
+
+    def _on_tick(self, view, frame_clock):
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Write queued text, trim to `max_lines` and scroll to the end"""
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending.clear()
+            self._scheduled = False
+        if not text:
+            return
+
+        self.buffer.insert(self.buffer.get_end_iter(), text)
+        # A trailing newline leaves an empty last line, which doesn't count
+        excess = self.buffer.get_line_count() - 1 - self.max_lines
+        if excess > 0:
+            _, cut = self.buffer.get_iter_at_line(excess)
+            self.buffer.delete(self.buffer.get_start_iter(), cut)
+
+        self.buffer.move_mark(self.end_mark, self.buffer.get_end_iter())
+        self.view.scroll_to_mark(self.end_mark, 0.0, True, 0.0, 1.0)
+
+
+class BitcrusherWindow(Adw.ApplicationWindow):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.set_title("Bitcrusher")
+        self.set_default_size(600, 950)
+
+        # Main container
+        self.main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+
+        # Header bar
+        header = Adw.HeaderBar()
+        self.main_box.append(header)
+
+        self.stats_button = Gtk.ToggleButton(icon_name="utilities-system-monitor-symbolic")
+        self.stats_button.set_tooltip_text("Show performance stats")
+        self.stats_button.connect("toggled", self.on_stats_toggled)
+        header.pack_end(self.stats_button)
+
+        # Content area with margins
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=20)
+        content.set_margin_top(20)
+        content.set_margin_bottom(20)
+        content.set_margin_start(20)
+        content.set_margin_end(20)
+
+        # Input file section
+        input_group = Adw.PreferencesGroup()
+        input_group.set_title("Input File")
+
+        self.input_row = Adw.ActionRow()
+        self.input_row.set_title("Select WAV file")
+        self.input_row.set_subtitle("No file selected")
+
+        input_button = Gtk.Button(label="Browse")
+        input_button.set_valign(Gtk.Align.CENTER)
+        input_button.connect("clicked", self.on_input_file_clicked)
+        self.input_row.add_suffix(input_button)
+
+        input_group.add(self.input_row)
+        content.append(input_group)
+
+        # Preview section
+        preview_group = Adw.PreferencesGroup()
+        preview_group.set_title("Audio Preview")
+        preview_group.set_description("Visualize and compare original vs. processed audio")
+
+        # Original waveform
+        original_label = Gtk.Label(label="Original")
+        original_label.set_xalign(0)
+        original_label.set_margin_top(5)
+        preview_group.add(original_label)
+
+        self.original_waveform = WaveformWidget()
+        preview_group.add(self.original_waveform)
+
+        # Original playback controls
+        original_controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        original_controls.set_margin_top(5)
+        original_controls.set_margin_bottom(10)
+
+        self.original_play_btn = Gtk.Button(icon_name="media-playback-start-symbolic")
+        self.original_play_btn.set_sensitive(False)
+        self.original_play_btn.connect("clicked", lambda b: self.toggle_playback("original"))
+        original_controls.append(self.original_play_btn)
+
+        self.original_stop_btn = Gtk.Button(icon_name="media-playback-stop-symbolic")
+        self.original_stop_btn.set_sensitive(False)
+        self.original_stop_btn.connect("clicked", lambda b: self.stop_playback("original"))
+        original_controls.append(self.original_stop_btn)
+
+        self.original_time_label = Gtk.Label(label="0:00 / 0:00")
+        self.original_time_label.set_margin_start(10)
+        original_controls.append(self.original_time_label)
+
+        self.original_spinner = Gtk.Spinner()
+        self.original_spinner.set_visible(False)
+        original_controls.append(self.original_spinner)
+
+        preview_group.add(original_controls)
+
+        # Processed waveform
+        processed_label = Gtk.Label(label="Processed")
+        processed_label.set_xalign(0)
+        processed_label.set_margin_top(15)
+        preview_group.add(processed_label)
+
+        self.processed_waveform = WaveformWidget()
+        preview_group.add(self.processed_waveform)
+
+        # Processed playback controls
+        processed_controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        processed_controls.set_margin_top(5)
+
+        self.processed_play_btn = Gtk.Button(icon_name="media-playback-start-symbolic")
+        self.processed_play_btn.set_sensitive(False)
+        self.processed_play_btn.connect("clicked", lambda b: self.toggle_playback("processed"))
+        processed_controls.append(self.processed_play_btn)
+
+        self.processed_stop_btn = Gtk.Button(icon_name="media-playback-stop-symbolic")
+        self.processed_stop_btn.set_sensitive(False)
+        self.processed_stop_btn.connect("clicked", lambda b: self.stop_playback("processed"))
+        processed_controls.append(self.processed_stop_btn)
+
+        self.processed_time_label = Gtk.Label(label="0:00 / 0:00")
+        self.processed_time_label.set_margin_start(10)
+        processed_controls.append(self.processed_time_label)
+
+        self.processed_spinner = Gtk.Spinner()
+        self.processed_spinner.set_visible(False)
+        processed_controls.append(self.processed_spinner)
+
+        # A/B: hear the original at the same position during live preview
+        self.ab_button = Gtk.ToggleButton(label="A/B")
+        self.ab_button.set_tooltip_text("Hear the original at the same position (A / B keys)")
+        self.ab_button.set_sensitive(False)
+        self.ab_button.set_hexpand(True)
+        self.ab_button.set_halign(Gtk.Align.END)
+        self.ab_button.connect("toggled", self.on_ab_toggled)
+        processed_controls.append(self.ab_button)
+
+        preview_group.add(processed_controls)
+
+        # Live preview toggle
+        live_row = Adw.ActionRow()
+        live_row.set_title("Live Preview")
+        live_row.set_subtitle("Play the crushed input on the Processed player as you adjust settings")
+        self.live_preview_switch = Gtk.Switch()
+        self.live_preview_switch.set_active(True)
+        self.live_preview_switch.set_valign(Gtk.Align.CENTER)
+        self.live_preview_switch.connect("notify::active", self.on_live_preview_toggled)
+        live_row.add_suffix(self.live_preview_switch)
+        live_row.set_activatable_widget(self.live_preview_switch)
+        live_row.set_margin_top(10)
+        preview_group.add(live_row)
+
+        # Per-channel lanes toggle
+        lanes_row = Adw.ActionRow()
+        lanes_row.set_title("Channel Lanes")
+        lanes_row.set_subtitle("Draw each channel of multichannel files in a lane of its own")
+        self.lanes_switch = Gtk.Switch()
+        self.lanes_switch.set_valign(Gtk.Align.CENTER)
+        self.lanes_switch.connect("notify::active", self.on_lanes_toggled)
+        lanes_row.add_suffix(self.lanes_switch)
+        lanes_row.set_activatable_widget(self.lanes_switch)
+        preview_group.add(lanes_row)
+
+        # Process only a selected range
+        self.selection_row = Adw.ActionRow()
+        self.selection_row.set_title("Process Selection")
+        self.selection_row.set_subtitle(SELECTION_HINT)
+        self.selection_switch = Gtk.Switch()
+        self.selection_switch.set_valign(Gtk.Align.CENTER)
+        self.selection_switch.connect("notify::active", self.on_selection_changed)
+        self.selection_row.add_suffix(self.selection_switch)
+        self.selection_row.set_activatable_widget(self.selection_switch)
+        preview_group.add(self.selection_row)
+        self.original_waveform.connect("selection-changed", self.on_selection_changed)
+
+        content.append(preview_group)
+
+        # Preset section
+        preset_group = Adw.PreferencesGroup()
+        preset_group.set_title("Effect Preset")
+        preset_group.set_description("Choose a classic console/computer preset or use custom settings")
+
+        preset_row = Adw.ComboRow()
+        preset_row.set_title("Preset")
+
+        # Create preset list
+        self.presets = Gtk.StringList()
+        self.preset_values = ["custom", "gameboy", "nes", "sega", "snes", "c64", "atari", "mild", "heavy", "extreme"]
+        preset_names = [
+            "Custom Settings",
+            "Game Boy",
+            "Nintendo NES",
+            "Sega Genesis",
+            "Super Nintendo",
+            "Commodore 64",
+            "Atari 2600",
+            "Mild Crunch",
+            "Heavy Crush",
+            "Extreme"
+        ]
+
+        for name in preset_names:
+            self.presets.append(name)
+
+        preset_row.set_model(self.presets)
+        preset_row.set_selected(0)
+        preset_row.connect("notify::selected", self.on_preset_changed)
+        self.preset_row = preset_row
+
+        preset_group.add(preset_row)
+
+        # Audition every preset from one decode of the input
+        audition_row = Adw.ActionRow()
+        audition_row.set_title("Audition All Presets")
+        audition_row.set_subtitle("Render every preset side by side to compare them")
+        self.audition_button = Gtk.Button(label="Audition")
+        self.audition_button.set_valign(Gtk.Align.CENTER)
+        self.audition_button.set_sensitive(False)
+        self.audition_button.connect("clicked", self.on_audition_clicked)
+        audition_row.add_suffix(self.audition_button)
+        preset_group.add(audition_row)
+
+        self.audition_grid = Gtk.FlowBox()
+        self.audition_grid.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.audition_grid.set_homogeneous(True)
+        self.audition_grid.set_min_children_per_line(3)
+        self.audition_grid.set_max_children_per_line(3)
+        self.audition_grid.set_margin_top(10)
+        self.audition_grid.set_visible(False)
+        preset_group.add(self.audition_grid)
+
+        content.append(preset_group)
+
+        # Custom parameters section
+        self.params_group = Adw.PreferencesGroup()
+        self.params_group.set_title("Custom Parameters")
+
+        # Bit depth
+        self.bit_depth_row = Adw.SpinRow()
+        self.bit_depth_row.set_title("Bit Depth")
+        self.bit_depth_row.set_subtitle("Lower values = more lo-fi sound (1-16)")
+        adjustment = Gtk.Adjustment(value=8, lower=1, upper=16, step_increment=1)
+        self.bit_depth_row.set_adjustment(adjustment)
+        self.bit_depth_row.set_digits(0)
+        self.bit_depth_row.connect("notify::value", self.on_params_changed)
+        self.params_group.add(self.bit_depth_row)
+
+        # Sample rate reduction
+        self.sample_rate_row = Adw.SpinRow()
+        self.sample_rate_row.set_title("Sample Rate Reduction")
+        self.sample_rate_row.set_subtitle("Higher values = more aliasing (1-32)")
+        adjustment = Gtk.Adjustment(value=4, lower=1, upper=32, step_increment=1)
+        self.sample_rate_row.set_adjustment(adjustment)
+        self.sample_rate_row.set_digits(0)
+        self.sample_rate_row.connect("notify::value", self.on_params_changed)
+        self.params_group.add(self.sample_rate_row)
+
+        # Mix
+        self.mix_row = Adw.SpinRow()
+        self.mix_row.set_title("Wet/Dry Mix")
+        self.mix_row.set_subtitle("0.0 = original, 1.0 = fully crushed")
+        adjustment = Gtk.Adjustment(value=1.0, lower=0.0, upper=1.0, step_increment=0.1)
+        self.mix_row.set_adjustment(adjustment)
+        self.mix_row.set_digits(1)
+        self.mix_row.connect("notify::value", self.on_params_changed)
+        self.params_group.add(self.mix_row)
+
+        content.append(self.params_group)
+
+        # Output section
+        output_group = Adw.PreferencesGroup()
+        output_group.set_title("Output")
+
+        self.output_row = Adw.ActionRow()
+        self.output_row.set_title("Output file")
+        self.output_row.set_subtitle("Auto-generated from input filename")
+
+        output_button = Gtk.Button(label="Change")
+        output_button.set_valign(Gtk.Align.CENTER)
+        output_button.connect("clicked", self.on_output_file_clicked)
+        self.output_row.add_suffix(output_button)
+
+        output_group.add(self.output_row)
+
+        # Output encoding
+        self.format_row = Adw.ComboRow()
+        self.format_row.set_title("Output Format")
+        self.format_row.set_subtitle("Auto picks the smallest format that holds the crushed signal")
+        self.format_values = ["auto", "pcm8", "pcm16", "pcm24", "float32"]
+        formats = Gtk.StringList()
+        for name in ["Auto", "8-bit PCM", "16-bit PCM", "24-bit PCM", "32-bit Float"]:
+            formats.append(name)
+        self.format_row.set_model(formats)
+        self.format_row.set_selected(0)
+        output_group.add(self.format_row)
+
+        dither_row = Adw.ActionRow()
+        dither_row.set_title("Dither")
+        dither_row.set_subtitle("Add TPDF dither when writing PCM")
+        self.dither_switch = Gtk.Switch()
+        self.dither_switch.set_valign(Gtk.Align.CENTER)
+        dither_row.add_suffix(self.dither_switch)
+        dither_row.set_activatable_widget(self.dither_switch)
+        output_group.add(dither_row)
+
+        content.append(output_group)
+
+        # Export button
+        self.process_button = Gtk.Button(label="Export Audio")
+        self.process_button.add_css_class("suggested-action")
+        self.process_button.add_css_class("pill")
+        self.process_button.set_sensitive(False)
+        self.process_button.connect("clicked", self.on_process_clicked)
+        self.process_button.set_margin_top(10)
+        content.append(self.process_button)
+
+        # Progress bar
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_margin_top(10)
+        self.progress_bar.set_show_text(True)
+        self.progress_bar.set_visible(False)
+        content.append(self.progress_bar)
+
+        # Status text view for detailed output
+        self.status_frame = Gtk.Frame()
+        self.status_frame.set_margin_top(10)
+        self.status_frame.set_visible(False)
+
+        status_scroll = Gtk.ScrolledWindow()
+        status_scroll.set_min_content_height(150)
+        status_scroll.set_max_content_height(200)
+
+        self.status_buffer = Gtk.TextBuffer()
+        self.status_view = Gtk.TextView()
+        self.status_view.set_buffer(self.status_buffer)
+        self.status_view.set_editable(False)
+        self.status_view.set_wrap_mode(Gtk.WrapMode.WORD)
+        self.status_view.set_margin_top(5)
+        self.status_view.set_margin_bottom(5)
+        self.status_view.set_margin_start(5)
+        self.status_view.set_margin_end(5)
+
+        self.status_log = StatusLog(self.status_view)
+
+        status_scroll.set_child(self.status_view)
+        self.status_frame.set_child(status_scroll)
+        content.append(self.status_frame)
+
+        # Status label
+        self.status_label = Gtk.Label(label="")
+        self.status_label.set_wrap(True)
+        self.status_label.set_margin_top(10)
+        content.append(self.status_label)
+
+        # Performance panel, revealed by the header bar's stats button
+        stats_group = Adw.PreferencesGroup()
+        stats_group.set_title("Performance")
+        stats_group.set_description("Latest time of each operation and stage, and peak memory")
+
+        self.stats_label = Gtk.Label(xalign=0)
+        self.stats_label.add_css_class("monospace")
+        self.stats_label.set_selectable(True)
+        stats_group.add(self.stats_label)
+
+        self.stats_revealer = Gtk.Revealer()
+        self.stats_revealer.set_child(stats_group)
+        content.append(self.stats_revealer)
+
+        # Scroll window
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_child(content)
+        scrolled.set_vexpand(True)
+
+        self.main_box.append(scrolled)
+        self.set_content(self.main_box)
+
+        # A and B keys pick the signal heard from the live preview
+        key_controller = Gtk.EventControllerKey()
+        key_controller.connect("key-pressed", self.on_key_pressed)
+        self.add_controller(key_controller)
+
+        # State
+        self.input_file = None
+        self.output_file = None
+        self.render_thread = None
+
+        # Audio players
+        self.original_player = None
+        self.processed_player = None
+        self.original_duration = 0
+        self.processed_duration = 0
+
+        # One long-lived playbin per lane, reused for every file it plays,
+        # and when each lane that is still prerolling started
+        self.playbins = {}
+        self.prerolling = {}
+
+        # Per-lane playhead tick callbacks (only while playing) and the
+        # whole second each time label currently shows
+        self.playhead_ticks = {}
+        self.shown_seconds = {}
+
+        # Cancellation events for in-flight loads and channel lane builds, per lane
+        self.load_cancel = {}
+        self.lanes_cancel = {}
+        self.peak_cache = PeakCache()
+
+        # Live preview source, and whatever stream feeds the processed player
+        self.preview = None
+        self.processed_stream = None
+
+        # Recent renders, so flipping back to heard settings is instant
+        self.render_cache = RenderCache()
+
+        # Cached render stages of the input once it has been exported, the
+        # pending re-render timer and the newest re-render's number
+        self.pipeline = None
+        self.rerender_timer = None
+        self.rerender_generation = 0
+
+        # Preset audition: cancellation event of the running audition, each
+        # preset's card widgets and render, and the card playing, if any
+        self.audition_cancel = None
+        self.audition_cards = {}
+        self.audition_playing = None
+        self.audition_player = None
+
+        # Latest progress from the render thread, drawn at most once per idle
+        self.progress_lock = threading.Lock()
+        self.pending_progress = None
+        self.progress_started = None
+
+        # Performance panel refresh timer, and whether profiling was on
+        # before the panel turned it on
+        self.stats_timer = None
+        self.profiling_was_enabled = profiler.enabled
+
+    def on_preset_changed(self, combo_row, param):
+        selected = combo_row.get_selected()
+        if selected == 0:  # Custom
+            self.params_group.set_sensitive(True)
+        else:
+            self.params_group.set_sensitive(False)
+        self.on_params_changed()
+
+    def on_params_changed(self, *args):
+        """Hand new settings to the live preview and show a cached or quick render
+
+        Cached and quick renders cover the whole file, so neither replaces
+        a selection's render while Process Selection is on.
+        """
+        if self.preview:
+            self.preview.set_params(self.current_params())
+        rendered = self.cached_render()
+        if rendered:
+            self.show_rendered(rendered)
+        elif self.pipeline is not None and self.selected_region() is None:
+            if self.rerender_timer is not None:
+                GLib.source_remove(self.rerender_timer)
+            self.rerender_timer = GLib.timeout_add(RERENDER_DELAY_MS, self.start_rerender)
+
+    def start_rerender(self):
+        """Re-render the current settings from the cached stages on a worker thread"""
+        self.rerender_timer = None
+        self.rerender_generation += 1
+        threading.Thread(target=self.run_rerender,
+                         args=(self.pipeline, self.current_params(), self.rerender_generation),
+                         daemon=True).start()
+        return False
+
+    def run_rerender(self, pipeline, params, generation):
+        """Render from `pipeline` and cache the result (runs on the worker thread)"""
+        try:
+            if file_identity(pipeline.input_path) != pipeline.identity:
+                return
+            rendered = pipeline.render(params)
+        except OSError:
+            return
+        self.render_cache.put(RenderCache.key(pipeline.input_path, params), rendered)
+        GLib.idle_add(self.on_rerendered, generation, rendered)
+
+    def on_rerendered(self, generation, rendered):
+        """Show a re-render unless newer settings or an export superseded it"""
+        if (generation == self.rerender_generation and self.render_thread is None
+                and self.selected_region() is None):
+            self.show_rendered(rendered)
+        return False
+
+    def release_pipeline(self):
+        """Drop the cached stages and hand their share of the budget back to the cache"""
+        self.pipeline = None
+        self.render_cache.reserve(0)
+
+    def cached_render(self):
+        """Cached whole-file render of the input with the current settings, if any
+
+        None while Process Selection is on, as the cache holds no region renders.
+        """
+        if not self.input_file or self.selected_region() is not None:
+            return None
+        try:
+            return self.render_cache.get(RenderCache.key(self.input_file, self.current_params()))
+        except OSError:
+            return None
+
+    def current_params(self):
+        """Effect parameters for the selected preset or the custom settings"""
+        selected = self.preset_row.get_selected()
+        if selected == 0:  # Custom
+            return CrushParams(
+                bit_depth=int(self.bit_depth_row.get_value()),
+                sample_rate_reduction=int(self.sample_rate_row.get_value()),
+                mix=self.mix_row.get_value(),
+            )
+        return CrushParams.from_preset(self.preset_values[selected])
+
+    def on_audition_clicked(self, button):
+        """Render every preset of the input on a worker thread, filling the grid"""
+        self.clear_audition()
+        cancel = threading.Event()
+        self.audition_cancel = cancel
+
+        for index, name in enumerate(self.preset_values[1:], start=1):
+            card = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+            title = Gtk.Label(label=self.presets.get_string(index))
+            title.set_xalign(0)
+            card.append(title)
+
+            thumb = WaveformWidget(AUDITION_THUMB_HEIGHT)
+            card.append(thumb)
+
+            controls = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+            play = Gtk.Button(icon_name="media-playback-start-symbolic")
+            play.set_sensitive(False)
+            play.connect("clicked", lambda b, name=name: self.toggle_audition(name))
+            controls.append(play)
+            use = Gtk.Button(label="Use")
+            use.set_tooltip_text("Select this preset")
+            use.connect("clicked", lambda b, index=index: self.preset_row.set_selected(index))
+            controls.append(use)
+            spinner = Gtk.Spinner()
+            spinner.start()
+            controls.append(spinner)
+            card.append(controls)
+
+            self.audition_grid.append(card)
+            self.audition_cards[name] = {"thumb": thumb, "play": play, "spinner": spinner,
+                                         "rendered": None}
+        self.audition_grid.set_visible(True)
+        button.set_sensitive(False)
+
+        threading.Thread(target=self.run_audition, args=(self.input_file, cancel),
+                         daemon=True).start()
+
+    def run_audition(self, input_file, cancel):
+        """Render the presets from one decode (runs on the worker thread)"""
+        results = audition_presets(input_file, self.preset_values[1:], cache=self.render_cache)
+        try:
+            for name, rendered in results:
+                if cancel.is_set():
+                    return
+                GLib.idle_add(self.on_audition_rendered, cancel, name, rendered)
+        except Exception as e:
+            GLib.idle_add(self.on_audition_done, cancel, str(e))
+        else:
+            GLib.idle_add(self.on_audition_done, cancel, None)
+        finally:
+            results.close()
+
+    def on_audition_rendered(self, cancel, name, rendered):
+        """Show one preset's thumbnail and enable its play button"""
+        if cancel is self.audition_cancel:
+            card = self.audition_cards[name]
+            card["rendered"] = rendered
+            card["thumb"].set_waveform(rendered.peaks)
+            card["play"].set_sensitive(True)
+            card["spinner"].stop()
+            card["spinner"].set_visible(False)
+        return False
+
+    def on_audition_done(self, cancel, error):
+        """Re-enable the audition button once every preset is in"""
+        if cancel is self.audition_cancel:
+            self.audition_button.set_sensitive(True)
+            if error:
+                self.show_error(f"Audition failed: {error}")
+        return False
+
+    def toggle_audition(self, name):
+        """Play a preset's render from memory, stopping any other card"""
+        playing = self.audition_playing
+        self.stop_audition()
+        if playing == name:
+            return
+
+        rendered = self.audition_cards[name]["rendered"]
+        stream = BufferStream(rendered.channels, rendered.sample_rate)
+        player = self.create_stream_player(stream)
+        bus = player.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message::eos", lambda bus, message: self.stop_audition())
+        bus.connect("message::error", lambda bus, message: self.stop_audition())
+        player.set_state(Gst.State.PLAYING)
+        self.audition_player = player
+        self.audition_playing = name
+        self.audition_cards[name]["play"].set_icon_name("media-playback-stop-symbolic")
+
+    def stop_audition(self):
+        """Stop and release the audition player"""
+        if self.audition_player is not None:
+            self.audition_player.get_bus().remove_signal_watch()
+            self.audition_player.set_state(Gst.State.NULL)
+            self.audition_player = None
+        card = self.audition_cards.get(self.audition_playing)
+        if card:
+            card["play"].set_icon_name("media-playback-start-symbolic")
+        self.audition_playing = None
+
+    def clear_audition(self):
+        """Cancel a running audition and empty the grid"""
+        if self.audition_cancel is not None:
+            self.audition_cancel.set()
+            self.audition_cancel = None
+        self.stop_audition()
+        self.audition_cards = {}
+        while (child := self.audition_grid.get_first_child()) is not None:
+            self.audition_grid.remove(child)
+        self.audition_grid.set_visible(False)
+        self.audition_button.set_sensitive(self.input_file is not None)
+
+    def selected_region(self):
+        """The (start, stop) frames to process in selection mode, else None"""
+        if self.selection_switch.get_active():
+            return self.original_waveform.selection
+        return None
+
+    def on_selection_changed(self, *args):
+        """Show the selected range and limit the live preview to it"""
+        selection = self.original_waveform.selection
+        if selection and self.original_duration:
+            rate = self.original_waveform.peaks.n_samples / self.original_duration
+            start, stop = (self.format_time(frame / rate) for frame in selection)
+            self.selection_row.set_subtitle(f"{start} – {stop} selected "
+                                            f"({(selection[1] - selection[0]) / rate:.1f}s)")
+        else:
+            self.selection_row.set_subtitle(SELECTION_HINT)
+        if self.preview:
+            self.preview.set_region(*(self.selected_region() or ()))
+
+    def on_key_pressed(self, controller, keyval, keycode, state):
+        """Switch A/B with the A and B keys while previewing"""
+        if not self.preview:
+            return False
+        key = Gdk.keyval_to_lower(keyval)
+        if key == Gdk.KEY_a:
+            self.ab_button.set_active(True)
+        elif key == Gdk.KEY_b:
+            self.ab_button.set_active(False)
+        else:
+            return False
+        return True
+
+    def on_ab_toggled(self, button):
+        """Crossfade the processed lane to the original (active) or back"""
+        if self.preview:
+            self.preview.select(not button.get_active())
+        button.set_label("A: Original" if button.get_active() else "A/B")
+
+    def on_live_preview_toggled(self, switch, param):
+        """Switch the processed player between live preview and the exported file"""
+        if switch.get_active():
+            if self.input_file and self.original_player:
+                self.start_preview()
+        elif self.preview:
+            self.preview = None
+            self.ab_button.set_active(False)
+            self.ab_button.set_sensitive(False)
+            self.remove_player("processed")
+            self.processed_play_btn.set_sensitive(False)
+            self.processed_stop_btn.set_sensitive(False)
+            rendered = self.cached_render()
+            if rendered:
+                self.show_rendered(rendered)
+            elif self.output_file and os.path.exists(self.output_file):
+                self.load_file(self.output_file, "processed")
+
+    def on_stats_toggled(self, button):
+        """Show or hide the performance panel, profiling while it is shown"""
+        shown = button.get_active()
+        self.stats_revealer.set_reveal_child(shown)
+        if shown:
+            self.profiling_was_enabled = profiler.enabled
+            profiler.enabled = True
+            self.update_stats()
+            self.stats_timer = GLib.timeout_add(STATS_INTERVAL_MS, self.update_stats)
+        else:
+            profiler.enabled = self.profiling_was_enabled
+            if self.stats_timer is not None:
+                GLib.source_remove(self.stats_timer)
+                self.stats_timer = None
+
+    def update_stats(self):
+        """Refresh the performance panel from the profiler"""
+        self.stats_label.set_text(format_stats(profiler.stats()))
+        return True
+
+    def on_input_file_clicked(self, button):
+        dialog = Gtk.FileDialog()
+
+        # Add WAV filter
+        wav_filter = Gtk.FileFilter()
+        wav_filter.set_name("WAV files")
+        wav_filter.add_pattern("*.wav")
+        wav_filter.add_pattern("*.WAV")
+
+        all_filter = Gtk.FileFilter()
+        all_filter.set_name("All files")
+        all_filter.add_pattern("*")
+
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        filters.append(wav_filter)
+        filters.append(all_filter)
+        dialog.set_filters(filters)
+        dialog.set_default_filter(wav_filter)
+
+        dialog.open(self, None, self.on_input_file_selected)
+
+    def on_input_file_selected(self, dialog, result):
+        try:
+            file = dialog.open_finish(result)
+            if file:
+                self.input_file = file.get_path()
+                self.release_pipeline()
+                self.input_row.set_subtitle(os.path.basename(self.input_file))
+
+                # Auto-generate output filename
+                path = Path(self.input_file)
+                self.output_file = str(path.parent / f"{path.stem}_crushed{path.suffix}")
+                self.output_row.set_subtitle(os.path.basename(self.output_file))
+
+                self.process_button.set_sensitive(True)
+                self.audition_button.set_sensitive(True)
+                self.clear_audition()
+                self.selection_row.set_subtitle(SELECTION_HINT)
+
+                # Load waveform and setup player
+                self.load_file(self.input_file, "original")
+
+        except Exception as e:
+            print(f"Error selecting file: {e}")
+
+    def on_output_file_clicked(self, button):
+        dialog = Gtk.FileDialog()
+        dialog.set_initial_name("output_crushed.wav")
+
+        # Add WAV filter
+        wav_filter = Gtk.FileFilter()
+        wav_filter.set_name("WAV files")
+        wav_filter.add_pattern("*.wav")
+
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        filters.append(wav_filter)
+        dialog.set_filters(filters)
+
+        dialog.save(self, None, self.on_output_file_selected)
+
+    def on_output_file_selected(self, dialog, result):
+        try:
+            file = dialog.save_finish(result)
+            if file:
+                self.output_file = file.get_path()
+                self.output_row.set_subtitle(os.path.basename(self.output_file))
+        except Exception as e:
+            print(f"Error selecting output file: {e}")
+
+    def on_process_clicked(self, button):
+        if not self.input_file:
+            self.show_error("Please select an input file")
+            return
+
+        # Disable button during processing
+        self.process_button.set_sensitive(False)
+
+        # Show progress UI
+        self.progress_bar.set_visible(True)
+        self.progress_bar.remove_css_class("error")
+        self.progress_bar.set_fraction(0.0)
+        self.progress_bar.set_text("Starting...")
+        self.status_frame.set_visible(True)
+        self.status_log.clear()
+        self.status_label.set_text("")
+
+        # Resolve effect parameters and output encoding
+        params = self.current_params()
+        output_format = self.format_values[self.format_row.get_selected()]
+        dither = self.dither_switch.get_active()
+
+        # Render on a worker thread; the engine releases the GIL in numpy
+        self.render_thread = threading.Thread(
+            target=self.run_render,
+            args=(self.input_file, self.output_file, params, output_format, dither,
+                  self.selected_region()),
+            daemon=True,
+        )
+        self.render_thread.start()
+
+    def run_render(self, input_file, output_file, params, output_format="auto", dither=False,
+                   region=None):
+        """Render the output file (runs on the worker thread)
+
+        A cached render is written out without recomputing it. Otherwise
+        the input's RenderPipeline, kept for later settings changes,
+        re-runs only the stages that changed. Renders too big for that are
+        done in one pass in memory, and anything larger still is streamed
+        to disk. With `region`, a (start, stop) frame range, only that range
+        is rendered and written.
+        """
+        def log(line):
+            self.status_log.post(f"{line}\n")
+
+        self.progress_started = (None, time.monotonic())
+
+        try:
+            key = RenderCache.key(input_file, params)
+            rendered = None if region else self.render_cache.get(key)
+            streamed = None
+            if region:
+                log(f"Rendering frames {region[0]}-{region[1]} of {input_file}")
+                rendered = render_region(input_file, *region, params)
+                fmt = resolve_output_format(output_format, params, input_file)
+                write_wav(output_file, rendered.channels, rendered.sample_rate,
+                          fmt=fmt, dither=dither)
+                log(f"\nOutput saved to: {output_file}")
+            elif rendered:
+                log("Using cached render")
+                fmt = resolve_output_format(output_format, params, input_file)
+                write_wav(output_file, rendered.channels, rendered.sample_rate,
+                          fmt=fmt, dither=dither)
+                log(f"\nOutput saved to: {output_file}")
+            else:
+                with WavReader(input_file) as reader:
+                    size = reader.n_frames * reader.n_channels * 4
+                    pipeline_size = RenderPipeline.estimate_nbytes(reader.n_channels,
+                                                                   reader.n_frames)
+                # Cached stages are charged to the render cache's budget by
+                # reserving their largest size; a pipeline for another input,
+                # or one over budget, is released
+                pipeline = self.pipeline
+                if pipeline is not None and (pipeline.input_path != input_file
+                                             or pipeline.identity != file_identity(input_file)
+                                             or pipeline_size > self.render_cache.max_bytes):
+                    self.release_pipeline()
+                    pipeline = None
+                progress = ProgressReporter(
+                    lambda *event: self.on_render_progress(RENDER_STAGES, *event))
+                if pipeline is None and pipeline_size <= self.render_cache.max_bytes:
+                    log(f"Reading: {input_file}")
+                    self.render_cache.reserve(pipeline_size)
+                    try:
+                        pipeline = RenderPipeline(input_file, progress)
+                    except Exception:
+                        self.render_cache.reserve(0)
+                        raise
+                    self.pipeline = pipeline
+                if pipeline is not None:
+                    rendered = pipeline.render(params, log=log, progress=progress)
+                    log(f"Re-ran stages: {', '.join(pipeline.ran) or 'none'}")
+                    write_wav(output_file, rendered.channels, rendered.sample_rate,
+                              progress=progress,
+                              fmt=resolve_output_format(output_format, params, input_file),
+                              dither=dither)
+                    log(f"\nOutput saved to: {output_file}")
+                    self.render_cache.put(key, rendered)
+                elif size <= self.render_cache.max_bytes:
+                    processed, sample_rate = render_file(
+                        input_file, output_file, params, log=log,
+                        output_format=output_format, dither=dither,
+                        progress=lambda *event: self.on_render_progress(RENDER_STAGES, *event))
+                    rendered = RenderedAudio.from_channels(processed, sample_rate)
+                    self.render_cache.put(key, rendered)
+                else:
+                    *_, streamed = render_stream(
+                        input_file, output_file, params, log=log,
+                        output_format=output_format, dither=dither, peaks=True,
+                        progress=lambda *event: self.on_render_progress(STREAM_STAGES, *event))
+            stats = self.render_cache.stats()
+            log(f"Render cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB"
+                + (f" + {self.render_cache.reserved / 1e6:.1f} MB of cached stages"
+                   if self.pipeline is not None else ""))
+        except Exception as e:
+            GLib.idle_add(self.on_render_done, False, str(e), output_file, None)
+        else:
+            GLib.idle_add(self.on_render_done, True, None, output_file, rendered, streamed)
+
+    def on_render_progress(self, stages, stage, done, total):
+        """Turn an engine progress event into bar state (runs on the render thread)
+
+        Only the newest state is kept, and a redraw is scheduled only when
+        none is pending, so the main loop sees at most one update per idle.
+        """
+        now = time.monotonic()
+        stage_started, render_started = self.progress_started
+        if stage_started is None or stage_started[0] != stage:
+            stage_started = (stage, now, done)
+            self.progress_started = (stage_started, render_started)
+
+        start, span = stages.get(stage, (0.0, 0.0))
+        fraction = start + span * (done / total if total else 1.0)
+        elapsed = now - stage_started[1]
+        rate = (done - stage_started[2]) / elapsed if elapsed > 0 else 0.0
+        total_elapsed = now - render_started
+        eta = total_elapsed * (1 - fraction) / fraction if fraction > 0 else None
+
+        with self.progress_lock:
+            scheduled = self.pending_progress is not None
+            self.pending_progress = (stage, fraction, rate, eta)
+        if not scheduled:
+            GLib.idle_add(self.flush_progress)
+
+    def flush_progress(self):
+        """Draw the newest progress state"""
+        with self.progress_lock:
+            state, self.pending_progress = self.pending_progress, None
+        if state is None or self.render_thread is None:
+            return False
+
+        stage, fraction, rate, eta = state
+        text = f"{STAGE_LABELS.get(stage, stage)}… {fraction * 100:.0f}%"
+        if rate > 0:
+            text += f" · {rate / 1e6:.1f} M samples/s"
+        if eta is not None:
+            text += f" · {self.format_time(eta)} left"
+        self.progress_bar.set_fraction(fraction)
+        self.progress_bar.set_text(text)
+        return False
+
+    def on_render_done(self, success, error, output_file, rendered, streamed=None):
+        """Handle completion of the render thread that wrote `output_file`
+
+        The path comes from the render rather than `self.output_file`, which
+        may have been changed while it ran.
+        """
+        if success:
+            self.status_label.set_text(f"✓ Success! Saved to: {os.path.basename(output_file)}")
+            self.progress_bar.set_fraction(1.0)
+            self.progress_bar.set_text("Complete!")
+        else:
+            self.status_log.post(f"⚠ Error processing file: {error}\n")
+            self.status_label.set_text("✗ Processing failed")
+
+        self.finish_processing(success, rendered, streamed, output_file)
+        return False
+
+    def finish_processing(self, success, rendered=None, streamed=None, output_file=None):
+        """Clean up after processing completes
+
+        A successful render hands over either the RenderedAudio itself or,
+        for a streamed render, the peaks built while it was written to
+        `output_file`, so the output is never decoded again just to be drawn.
+        """
+        self.render_thread = None
+        self.process_button.set_sensitive(True)
+
+        if not success:
+            self.progress_bar.set_text("Failed")
+            self.progress_bar.add_css_class("error")
+        elif rendered:
+            self.show_rendered(rendered)
+        elif streamed is not None:
+            self.show_streamed(streamed, output_file)
+
+    def show_rendered(self, rendered):
+        """Show an in-memory render on the processed lane
+
+        The waveform comes from the render's peaks. Unless the lane is
+        previewing live, the player streams the buffer from memory.
+        """
+        lanes = None
+        if self.lanes_switch.get_active() and rendered.channels.shape[0] > 1:
+            lanes = PeakPyramid.channels_from_samples(rendered.channels)
+        stream = None if self.preview else BufferStream(rendered.channels, rendered.sample_rate)
+        self.show_processed(rendered.peaks, lanes, stream, rendered.duration)
+
+    def show_streamed(self, peaks, output_file):
+        """Show a render that was streamed to `output_file`
+
+        The waveform comes from the peaks `render_stream` built on the way
+        out; the player, unless previewing live, reads the output's memory
+        mapping. Lanes, when shown, still take a pass over the file.
+        """
+        stream = duration = None
+        if not self.preview:
+            reader = WavReader(output_file)
+            stream, duration = ReaderStream(reader), reader.duration
+        self.show_processed(peaks, None, stream, duration)
+        if self.lanes_switch.get_active():
+            self.load_lanes(output_file, "processed")
+
+    def show_processed(self, peaks, lanes, stream, duration):
+        """Put finished peaks, and a player on `stream` if given, on the processed lane"""
+        pending = self.load_cancel.pop("processed", None)
+        if pending is not None:
+            pending.set()
+            self.processed_spinner.stop()
+            self.processed_spinner.set_visible(False)
+
+        self.processed_waveform.set_waveform(peaks, lanes)
+        if stream is not None:
+            player = self.create_stream_player(stream)
+            self.install_player(player, duration, "processed", stream)
+            self.processed_play_btn.set_sensitive(True)
+            self.processed_stop_btn.set_sensitive(True)
+            self.update_time_label("processed", 0)
+
+    def load_file(self, filepath, player_type, with_player=True):
+        """Load a lane's waveform and player on a worker thread
+
+        Starting a new load cancels the lane's previous one, and results
+        from a cancelled load are dropped rather than applied. Without
+        `with_player` only the waveform is replaced.
+        """
+        previous = self.load_cancel.get(player_type)
+        if previous is not None:
+            previous.set()
+        cancel = threading.Event()
+        self.load_cancel[player_type] = cancel
+
+        spinner = self.original_spinner if player_type == "original" else self.processed_spinner
+        spinner.set_visible(True)
+        spinner.start()
+
+        thread = threading.Thread(
+            target=self.run_load,
+            args=(filepath, player_type, cancel, with_player),
+            daemon=True,
+        )
+        thread.start()
+
+    def run_load(self, filepath, player_type, cancel, with_player):
+        """Build peaks and read the duration (runs on the worker thread)"""
+        with profiler.span("load", input=filepath):
+            peaks, duration = self.load_waveform(filepath, cancel)
+        if with_player:
+            # Pay for importing GStreamer here rather than on the main thread
+            init_gst()
+        GLib.idle_add(self.on_load_done, player_type, cancel, filepath, peaks, duration,
+                      with_player)
+
+    def on_load_done(self, player_type, cancel, filepath, peaks, duration, with_player):
+        """Apply a finished load unless it has been superseded
+
+        The lane's playbin is pointed at the file and prerolls in the
+        background; its controls are enabled once the bus reports
+        ASYNC_DONE.
+        """
+        if cancel.is_set() or self.load_cancel.get(player_type) is not cancel:
+            return False
+        del self.load_cancel[player_type]
+
+        if player_type == "original":
+            spinner, waveform = self.original_spinner, self.original_waveform
+            play_btn, stop_btn = self.original_play_btn, self.original_stop_btn
+        else:
+            spinner, waveform = self.processed_spinner, self.processed_waveform
+            play_btn, stop_btn = self.processed_play_btn, self.processed_stop_btn
+        if peaks is not None:
+            waveform.set_waveform(peaks)
+            if self.lanes_switch.get_active():
+                self.load_lanes(filepath, player_type)
+        if peaks is not None and with_player:
+            player = self.lane_playbin(player_type)
+            self.install_player(player, duration, player_type)
+            player.set_property("uri", Gst.filename_to_uri(filepath))
+            play_btn.set_sensitive(False)
+            stop_btn.set_sensitive(False)
+            self.update_time_label(player_type, 0)
+            self.prerolling[player_type] = time.perf_counter()
+            player.set_state(Gst.State.PAUSED)
+            if player_type == "original" and self.live_preview_switch.get_active():
+                self.start_preview()
+        else:
+            spinner.stop()
+            spinner.set_visible(False)
+        return False
+
+    def lane_playbin(self, player_type):
+        """The lane's playbin, created and watched on first use"""
+        player = self.playbins.get(player_type)
+        if player is None:
+            init_gst()
+            player = Gst.ElementFactory.make("playbin", None)
+            self.watch_player(player, player_type)
+            self.playbins[player_type] = player
+        return player
+
+    def watch_player(self, player, player_type):
+        """Route a player's bus messages to the lane"""
+        bus = player.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message::eos", self.on_player_eos, player, player_type)
+        bus.connect("message::error", self.on_player_error, player, player_type)
+        bus.connect("message::async-done", self.on_player_prerolled, player, player_type)
+
+    def on_player_prerolled(self, bus, message, player, player_type):
+        """Enable a lane's controls once its playbin has prerolled"""
+        if player_type not in self.prerolling or player is not self.get_player(player_type):
+            return
+        started = self.prerolling.pop(player_type)
+        if profiler.enabled:
+            profiler.record("preroll", started, time.perf_counter(), {"lane": player_type})
+
+        if player_type == "original":
+            spinner, play_btn, stop_btn = (self.original_spinner, self.original_play_btn,
+                                           self.original_stop_btn)
+        else:
+            spinner, play_btn, stop_btn = (self.processed_spinner, self.processed_play_btn,
+                                           self.processed_stop_btn)
+        spinner.stop()
+        spinner.set_visible(False)
+        play_btn.set_sensitive(True)
+        stop_btn.set_sensitive(True)
+
+    def on_lanes_toggled(self, switch, param):
+        """Split each waveform into per-channel lanes, or merge them back"""
+        if not switch.get_active():
+            for event in self.lanes_cancel.values():
+                event.set()
+            self.lanes_cancel.clear()
+            self.original_waveform.set_lanes(None)
+            self.processed_waveform.set_lanes(None)
+            return
+
+        if self.input_file and self.original_waveform.peaks:
+            self.load_lanes(self.input_file, "original")
+        rendered = self.cached_render()
+        if rendered and rendered.channels.shape[0] > 1:
+            self.processed_waveform.set_lanes(PeakPyramid.channels_from_samples(rendered.channels))
+        elif self.output_file and os.path.exists(self.output_file) and self.processed_waveform.peaks:
+            self.load_lanes(self.output_file, "processed")
+
+    def load_lanes(self, filepath, player_type):
+        """Build per-channel waveform lanes for a file on a worker thread"""
+        previous = self.lanes_cancel.get(player_type)
+        if previous is not None:
+            previous.set()
+        cancel = threading.Event()
+        self.lanes_cancel[player_type] = cancel
+
+        def run():
+            try:
+                # Each pyramid keeps the mapping open to draw zoomed-in views
+                reader = WavReader(filepath)
+                lanes = PeakPyramid.channels_from_reader(reader, cancel) if reader.n_channels > 1 else None
+            except Exception as e:
+                print(f"Error loading channel lanes: {e}")
+                lanes = None
+            GLib.idle_add(self.on_lanes_loaded, player_type, cancel, lanes)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_lanes_loaded(self, player_type, cancel, lanes):
+        """Show finished lanes unless the load was cancelled or superseded"""
+        if cancel.is_set() or self.lanes_cancel.get(player_type) is not cancel:
+            return False
+        del self.lanes_cancel[player_type]
+        waveform = self.original_waveform if player_type == "original" else self.processed_waveform
+        waveform.set_lanes(lanes)
+        return False
+
+    def load_waveform(self, filepath, cancel=None):
+        """Load waveform peaks from a WAV file"""
+        try:
+            # The pyramid keeps the mapping open to draw zoomed-in views
+            reader = WavReader(filepath)
+            peaks = self.peak_cache.load(reader)
+            if peaks is None:
+                peaks = PeakPyramid.from_reader(reader, cancel)
+                if peaks is not None:
+                    self.peak_cache.store(reader, peaks)
+            return peaks, reader.duration
+
+        except Exception as e:
+            print(f"Error loading waveform: {e}")
+            return None, 0
+
+    def start_preview(self):
+        """Put a live preview of the input on the processed player"""
+        reader = WavReader(self.input_file)
+        self.preview = ABStream(reader, self.current_params())
+        self.preview.set_region(*(self.selected_region() or ()))
+        self.preview.select(not self.ab_button.get_active())
+        self.ab_button.set_sensitive(True)
+        player = self.create_stream_player(self.preview)
+        self.install_player(player, reader.duration, "processed", self.preview)
+        self.processed_play_btn.set_sensitive(True)
+        self.processed_stop_btn.set_sensitive(True)
+        self.update_time_label("processed", 0)
+
+    def create_stream_player(self, stream):
+        """Build an appsrc pipeline that plays blocks pulled from `stream`
+
+        Blocks are read in appsrc's need-data callback on the streaming
+        thread, so a PreviewStream crushes as it plays. The source queues
+        at most one block so new settings reach the output within a buffer.
+        """
+        init_gst()
+        rate, n_channels = stream.sample_rate, stream.n_channels
+        caps = (f"audio/x-raw,format=F32LE,layout=interleaved,"
+                f"rate={rate},channels={n_channels}")
+        if n_channels > 2:
+            # Give surround streams GStreamer's default layout for their
+            # channel count, so audioconvert can downmix them for the device
+            gi.require_version('GstAudio', '1.0')
+            from gi.repository import GstAudio
+            mask = GstAudio.audio_channel_get_fallback_mask(n_channels)
+            caps += f",channel-mask=(bitmask){mask:#x}"
+        player = Gst.parse_launch(
+            f"appsrc name=src format=time caps={caps} ! "
+            "audioconvert ! audioresample ! autoaudiosink")
+        src = player.get_by_name("src")
+        src.set_property("max-bytes", stream.block_frames * n_channels * 4)
+        src.set_property("stream-type", 1)  # GST_APP_STREAM_TYPE_SEEKABLE
+
+        def on_need_data(src, length):
+            chunk = stream.read()
+            if chunk is None:
+                src.emit("end-of-stream")
+                return
+            start, block = chunk
+            buffer = Gst.Buffer.new_wrapped(block.tobytes())
+            buffer.pts = start * Gst.SECOND // rate
+            buffer.duration = len(block) * Gst.SECOND // rate
+            src.emit("push-buffer", buffer)
+
+        def on_seek_data(src, offset):
+            stream.seek(offset * rate // Gst.SECOND)
+            return True
+
+        src.connect("need-data", on_need_data)
+        src.connect("seek-data", on_seek_data)
+        player.set_state(Gst.State.READY)
+        return player
+
+    def install_player(self, player, duration_sec, player_type, stream=None):
+        """Make `player` the lane's player, with the duration from the WAV header
+
+        `player` is either the lane's reused playbin or an appsrc pipeline
+        pulling from `stream` (a BufferStream, ReaderStream or PreviewStream), which is
+        rewound when the lane is stopped. End of playback is picked up from
+        the player's bus.
+        """
+        self.remove_player(player_type)
+        self.prerolling.pop(player_type, None)
+        if player is not self.playbins.get(player_type):
+            self.watch_player(player, player_type)
+
+        if player_type == "original":
+            self.original_player = player
+            self.original_duration = duration_sec
+        else:
+            self.processed_player = player
+            self.processed_duration = duration_sec
+            self.processed_stream = stream
+
+    def remove_player(self, player_type):
+        """Stop a lane's player and release it unless it is the lane's playbin"""
+        player = self.original_player if player_type == "original" else self.processed_player
+        if not player:
+            return
+
+        self.stop_playback(player_type)
+        if player is not self.playbins.get(player_type):
+            player.get_bus().remove_signal_watch()
+            player.set_state(Gst.State.NULL)
+        if player_type == "original":
+            self.original_player = None
+        else:
+            self.processed_player = None
+            self.processed_stream = None
+
+    def on_player_eos(self, bus, message, player, player_type):
+        """Rewind a lane when its player reaches the end"""
+        if player is self.get_player(player_type):
+            self.stop_playback(player_type)
+
+    def on_player_error(self, bus, message, player, player_type):
+        """Stop a lane whose player failed"""
+        if player is self.get_player(player_type):
+            error, debug = message.parse_error()
+            print(f"Playback error: {error.message}")
+            if player_type in self.prerolling:
+                self.prerolling.pop(player_type, None)
+                spinner = self.original_spinner if player_type == "original" else self.processed_spinner
+                spinner.stop()
+                spinner.set_visible(False)
+            self.stop_playback(player_type)
+
+    def get_player(self, player_type):
+        return self.original_player if player_type == "original" else self.processed_player
+
+    def toggle_playback(self, player_type):
+        """Toggle play/pause for a player"""
+        if player_type == "original":
+            player = self.original_player
+            play_btn = self.original_play_btn
+        else:
+            player = self.processed_player
+            play_btn = self.processed_play_btn
+
+        if not player:
+            return
+
+        state = player.get_state(0)[1]
+
+        if state == Gst.State.PLAYING:
+            # Pause
+            player.set_state(Gst.State.PAUSED)
+            play_btn.set_icon_name("media-playback-start-symbolic")
+            self.stop_playhead(player_type)
+        else:
+            # Play
+            player.set_state(Gst.State.PLAYING)
+            play_btn.set_icon_name("media-playback-pause-symbolic")
+            self.start_playhead(player_type)
+
+    def stop_playback(self, player_type):
+        """Stop playback for a player"""
+        if player_type == "original":
+            player = self.original_player
+            play_btn = self.original_play_btn
+            waveform = self.original_waveform
+        else:
+            player = self.processed_player
+            play_btn = self.processed_play_btn
+            waveform = self.processed_waveform
+
+        if not player:
+            return
+
+        player.set_state(Gst.State.READY)
+        if player_type == "processed" and self.processed_stream:
+            self.processed_stream.seek(0)
+        play_btn.set_icon_name("media-playback-start-symbolic")
+        self.stop_playhead(player_type)
+        waveform.set_playback_position(0)
+        self.update_time_label(player_type, 0)
+
+    def start_playhead(self, player_type):
+        """Follow a lane's playback position once per frame while it plays"""
+        if player_type in self.playhead_ticks:
+            return
+        waveform = self.original_waveform if player_type == "original" else self.processed_waveform
+        self.playhead_ticks[player_type] = waveform.add_tick_callback(
+            self.on_playhead_tick, player_type)
+
+    def stop_playhead(self, player_type):
+        tick_id = self.playhead_ticks.pop(player_type, None)
+        if tick_id is not None:
+            waveform = self.original_waveform if player_type == "original" else self.processed_waveform
+            waveform.remove_tick_callback(tick_id)
+
+    def on_playhead_tick(self, waveform, frame_clock, player_type):
+        """Move the playhead to the player's position (runs once per frame)"""
+        player = self.get_player(player_type)
+        if not player:
+            self.playhead_ticks.pop(player_type, None)
+            return GLib.SOURCE_REMOVE
+
+        success, position = player.query_position(Gst.Format.TIME)
+        if success:
+            position_sec = position / Gst.SECOND
+            duration = self.original_duration if player_type == "original" else self.processed_duration
+            if duration <= 0:
+                # The duration wasn't known up front; ask again while playing
+                found, length = player.query_duration(Gst.Format.TIME)
+                if found:
+                    duration = length / Gst.SECOND
+                    if player_type == "original":
+                        self.original_duration = duration
+                    else:
+                        self.processed_duration = duration
+            if duration > 0:
+                waveform.set_playback_position(position_sec / duration)
+            self.update_time_label(player_type, position_sec)
+        return GLib.SOURCE_CONTINUE
+
+    def update_time_label(self, player_type, position_sec):
+        """Update time label for a player when the shown second changes"""
+        if player_type == "original":
+            duration = self.original_duration
+            label = self.original_time_label
+        else:
+            duration = self.processed_duration
+            label = self.processed_time_label
+
+        shown = (int(position_sec), int(duration))
+        if self.shown_seconds.get(player_type) == shown:
+            return
+        self.shown_seconds[player_type] = shown
+
+        pos_str = self.format_time(position_sec)
+        dur_str = self.format_time(duration)
+        label.set_text(f"{pos_str} / {dur_str}")
+
+    def format_time(self, seconds):
+        """Format seconds as MM:SS"""
+        minutes = int(seconds // 60)
+        secs = int(seconds % 60)
+        return f"{minutes}:{secs:02d}"
+
+    def show_error(self, message):
+        dialog = Adw.MessageDialog.new(self)
+        dialog.set_heading("Error")
+        dialog.set_body(message)
+        dialog.add_response("ok", "OK")
+        dialog.present()
+
+
+class BitcrusherApplication(Adw.Application):
+    def __init__(self):
+        super().__init__(application_id='com.github.bitcrusher',
+                         flags=Gio.ApplicationFlags.FLAGS_NONE)
+        self.add_main_option("profile", 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING,
+                             "Record timing spans and write them to FILE at exit "
+                             "(Chrome trace format for *.trace.json)", "FILE")
+
+    def do_handle_local_options(self, options):
+        profile = options.lookup_value("profile")
+        if profile is not None:
+            enable_profiling(profile.get_string())
+        return -1
+
+    def do_activate(self):
+        win = self.get_active_window()
+        if not win:
+            win = BitcrusherWindow(application=self)
+        win.present()
+
+
+def main():
+    app = BitcrusherApplication()
+    return app.run(sys.argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,21 +4,164 @@ import { program } from 'commander';
 import wav from 'node-wav';
 import fs from 'fs';
 import path from 'path';
-import { Bitcrusher, presets } from './bitcrusher.js';
+import readline from 'readline';
+import { Bitcrusher, presets, outputFormats, chooseOutputFormat } from './bitcrusher.js';
+
+// Frames encoded and written per block
+const BLOCK_FRAMES = 65536;
+
+/**
+ * Read and decode a WAV file
+ *
+ * Besides node-wav's channel data, `format` names the input's encoding
+ * ("pcm16", "float32", ...) for choosing the output format.
+ */
+function decodeWavFile(inputPath) {
+  const buffer = fs.readFileSync(inputPath);
+  const result = wav.decode(buffer);
+  result.format = wavFormat(buffer);
+  return result;
+}
+
+/**
+ * Name the sample encoding in a WAV file's fmt chunk (32-bit PCM maps to float32)
+ */
+function wavFormat(buffer) {
+  let offset = 12;
+  while (offset + 8 <= buffer.length) {
+    const id = buffer.toString('ascii', offset, offset + 4);
+    const size = buffer.readUInt32LE(offset + 4);
+    if (id === 'fmt ') {
+      let formatTag = buffer.readUInt16LE(offset + 8);
+      const bits = buffer.readUInt16LE(offset + 22);
+      if (formatTag === 0xFFFE && size >= 26) {
+        formatTag = buffer.readUInt16LE(offset + 32);
+      }
+      return formatTag === 3 || bits === 32 ? 'float32' : `pcm${bits}`;
+    }
+    offset += 8 + size + (size & 1);
+  }
+  throw new Error('Missing fmt chunk');
+}
+
+/**
+ * Seeded uniform random numbers in [0, 1), so dithered renders repeat
+ */
+function mulberry32(seed) {
+  return () => {
+    seed = (seed + 0x6D2B79F5) | 0;
+    let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+/**
+ * Stream planar blocks into a WAV file of any output format
+ *
+ * The header is written with zero sizes and patched on `close`. PCM is
+ * scaled the way node-wav decodes it (negative values by 2^(n-1),
+ * positive ones by 2^(n-1) - 1) and rounded, so it round-trips exactly;
+ * `dither` adds +/-1 LSB of triangular (TPDF) noise before rounding.
+ */
+class WavWriter {
+  constructor(outputPath, numChannels, sampleRate, format = 'float32', dither = false) {
+    const { float, bitDepth } = outputFormats[format];
+    this.float = float;
+    this.bitDepth = bitDepth;
+    this.numChannels = numChannels;
+    this.sampleRate = sampleRate;
+    this.frames = 0;
+    this.random = dither && !float ? mulberry32(0) : null;
+    this.fd = fs.openSync(outputPath, 'w');
+    fs.writeSync(this.fd, this.header());
+  }
+
+  header() {
+    const width = this.bitDepth / 8;
+    const dataSize = this.frames * this.numChannels * width;
+    const header = Buffer.alloc(44);
+    header.write('RIFF', 0, 'ascii');
+    header.writeUInt32LE(36 + dataSize, 4);
+    header.write('WAVEfmt ', 8, 'ascii');
+    header.writeUInt32LE(16, 16);
+    header.writeUInt16LE(this.float ? 3 : 1, 20);
+    header.writeUInt16LE(this.numChannels, 22);
+    header.writeUInt32LE(this.sampleRate, 24);
+    header.writeUInt32LE(this.sampleRate * this.numChannels * width, 28);
+    header.writeUInt16LE(this.numChannels * width, 32);
+    header.writeUInt16LE(this.bitDepth, 34);
+    header.write('data', 36, 'ascii');
+    header.writeUInt32LE(dataSize, 40);
+    return header;
+  }
+
+  /**
+   * Append frames [start, end) of planar channel data
+   */
+  write(channels, start, end) {
+    const width = this.bitDepth / 8;
+    const block = Buffer.alloc((end - start) * this.numChannels * width);
+    const fullScale = Math.pow(2, this.bitDepth - 1);
+    let offset = 0;
+    for (let i = start; i < end; i++) {
+      for (let c = 0; c < this.numChannels; c++) {
+        if (this.float) {
+          block.writeFloatLE(channels[c][i], offset);
+        } else {
+          const value = Math.max(-1, Math.min(1, channels[c][i]));
+          let scaled = value * (value < 0 ? fullScale : fullScale - 1);
+          if (this.random) {
+            scaled += this.random() - this.random();
+          }
+          const code = Math.max(-fullScale, Math.min(fullScale - 1, Math.floor(scaled + 0.5)));
+          if (this.bitDepth === 8) {
+            block.writeUInt8(code + 128, offset);
+          } else {
+            block.writeIntLE(code, offset, width);
+          }
+        }
+        offset += width;
+      }
+    }
+    fs.writeSync(this.fd, block);
+    this.frames += end - start;
+  }
+
+  /**
+   * Patch the header with the final sizes and close the file
+   */
+  close() {
+    fs.writeSync(this.fd, this.header(), 0, 44, 0);
+    fs.closeSync(this.fd);
+  }
+}
+
+/**
+ * Human readable name of an output format
+ */
+function formatLabel(format, dither) {
+  if (format === 'float32') {
+    return '32-bit float';
+  }
+  return `${outputFormats[format].bitDepth}-bit PCM${dither ? ', dithered' : ''}`;
+}
 
 /**
  * Process a WAV file with bitcrusher effect
+ *
+ * `log` receives each status line and `decode` turns the input path into
+ * decoded audio, so the worker can log as JSON and reuse a decoded input.
  */
-function processWavFile(inputPath, outputPath, options) {
-  console.log(`Reading: ${inputPath}`);
+function processWavFile(inputPath, outputPath, options, log = console.log, decode = decodeWavFile) {
+  log(`Reading: ${inputPath}`);
 
   // Read input WAV file
-  const buffer = fs.readFileSync(inputPath);
-  const result = wav.decode(buffer);
+  const result = decode(inputPath);
 
-  console.log(`Sample Rate: ${result.sampleRate} Hz`);
-  console.log(`Channels: ${result.channelData.length}`);
-  console.log(`Duration: ${(result.channelData[0].length / result.sampleRate).toFixed(2)}s`);
+  log(`Sample Rate: ${result.sampleRate} Hz`);
+  log(`Channels: ${result.channelData.length}`);
+  log(`Duration: ${(result.channelData[0].length / result.sampleRate).toFixed(2)}s`);
 
   // Create bitcrusher with specified options
   const bitcrusher = new Bitcrusher({
@@ -31,18 +174,18 @@ function processWavFile(inputPath, outputPath, options) {
     monoDownmix: options.monoDownmix
   });
 
-  console.log(`\nApplying bitcrusher effect:`);
-  console.log(`  Bit Depth: ${options.bitDepth} bits`);
-  console.log(`  Sample Rate Reduction: ${options.sampleRateReduction}x`);
-  console.log(`  Mix: ${(options.mix * 100).toFixed(0)}%`);
+  log(`\nApplying bitcrusher effect:`);
+  log(`  Bit Depth: ${options.bitDepth} bits`);
+  log(`  Sample Rate Reduction: ${options.sampleRateReduction}x`);
+  log(`  Mix: ${(options.mix * 100).toFixed(0)}%`);
   if (options.lowpassFreq) {
-    console.log(`  Low-pass Filter: ${options.lowpassFreq} Hz`);
+    log(`  Low-pass Filter: ${options.lowpassFreq} Hz`);
   }
   if (options.hardClip) {
-    console.log(`  Hard Clipping: enabled (threshold: ${options.clipThreshold})`);
+    log(`  Hard Clipping: enabled (threshold: ${options.clipThreshold})`);
   }
   if (options.monoDownmix) {
-    console.log(`  Mono Downmix: enabled`);
+    log(`  Mono Downmix: enabled`);
   }
 
   // Process audio
@@ -72,12 +215,12 @@ function processWavFile(inputPath, outputPath, options) {
 
     processedChannels = [leftChannel, rightChannel];
   } else {
-    console.error('Error: Only mono and stereo files are supported');
-    process.exit(1);
+    // Surround and multi-channel stems
+    processedChannels = bitcrusher.processChannels(result.channelData, result.sampleRate);
   }
 
   // Normalize the output audio
-  console.log('\nNormalizing output...');
+  log('\nNormalizing output...');
   let peak = 0;
   for (const channel of processedChannels) {
     for (let i = 0; i < channel.length; i++) {
@@ -92,8 +235,8 @@ function processWavFile(inputPath, outputPath, options) {
   if (peak > 0) {
     const headroom = 0.95; // Leave 5% headroom
     const normalizeGain = headroom / peak;
-    console.log(`  Peak level: ${(peak * 100).toFixed(1)}%`);
-    console.log(`  Normalization gain: ${(normalizeGain * 100).toFixed(1)}%`);
+    log(`  Peak level: ${(peak * 100).toFixed(1)}%`);
+    log(`  Normalization gain: ${(normalizeGain * 100).toFixed(1)}%`);
 
     for (const channel of processedChannels) {
       for (let i = 0; i < channel.length; i++) {
@@ -111,15 +254,146 @@ function processWavFile(inputPath, outputPath, options) {
     return clamped;
   });
 
-  // Encode and write output as 32-bit float WAV
-  const outputBuffer = wav.encode(clampedChannels, {
-    sampleRate: result.sampleRate,
-    float: true,
-    bitDepth: 32
-  });
+  // Encode and write output block by block
+  const format = !options.format || options.format === 'auto'
+    ? chooseOutputFormat(options, result.format)
+    : options.format;
+  const length = clampedChannels[0].length;
+  const writer = new WavWriter(outputPath, clampedChannels.length, result.sampleRate,
+    format, options.dither);
+  try {
+    for (let start = 0; start < length; start += BLOCK_FRAMES) {
+      writer.write(clampedChannels, start, Math.min(start + BLOCK_FRAMES, length));
+    }
+  } finally {
+    writer.close();
+  }
+  log(`\nOutput saved to: ${outputPath} (${formatLabel(format, options.dither)})`);
+}
+
+/**
+ * Resolve preset and custom options into Bitcrusher options
+ */
+function resolveEffectOptions(options) {
+  let effectOptions;
+
+  if (options.preset) {
+    const presetName = options.preset.toLowerCase();
+    if (!presets[presetName]) {
+      throw new Error(`Unknown preset "${options.preset}"`);
+    }
+    effectOptions = { ...presets[presetName] };
+  } else {
+    effectOptions = {
+      bitDepth: options.bitDepth || 8,
+      sampleRateReduction: options.sampleRate || 4,
+      mix: options.mix !== undefined ? options.mix : 1.0
+    };
+  }
+
+  // Override preset values if custom parameters are provided
+  if (options.bitDepth) effectOptions.bitDepth = options.bitDepth;
+  if (options.sampleRate) effectOptions.sampleRateReduction = options.sampleRate;
+  if (options.mix !== undefined) effectOptions.mix = options.mix;
 
-  fs.writeFileSync(outputPath, Buffer.from(outputBuffer));
-  console.log(`\nOutput saved to: ${outputPath}`);
+  // Output encoding
+  effectOptions.format = options.format || 'auto';
+  effectOptions.dither = Boolean(options.dither);
+
+  return effectOptions;
+}
+
+/**
+ * Return an error message for out-of-range options, or null
+ */
+function validateEffectOptions(effectOptions) {
+  if (effectOptions.bitDepth < 1 || effectOptions.bitDepth > 16) {
+    return 'Bit depth must be between 1 and 16';
+  }
+  if (effectOptions.sampleRateReduction < 1) {
+    return 'Sample rate reduction must be at least 1';
+  }
+  if (effectOptions.mix < 0 || effectOptions.mix > 1) {
+    return 'Mix must be between 0.0 and 1.0';
+  }
+  if (effectOptions.format !== 'auto' && !outputFormats[effectOptions.format]) {
+    return `Unknown output format "${effectOptions.format}"`;
+  }
+  return null;
+}
+
+/**
+ * Serve render jobs as line-delimited JSON on stdin/stdout
+ *
+ * Each input line is a job:
+ *   {"id": 1, "input": "in.wav", "output": "out.wav", "preset": "nes"}
+ * with the same optional "bitDepth", "sampleRate", "mix", "format" and
+ * "dither" options as the process command. Every output line is an event tagged with the
+ * job's id: {"id", "type": "log", "line"} for each status line, then
+ * {"id", "type": "done", "output"} or {"id", "type": "error", "message"}.
+ * A {"type": "ready"} event is sent once at startup. Jobs may be sent
+ * without waiting for earlier ones; they run in order. The last decoded
+ * input is kept, so re-rendering an unchanged file skips reading and
+ * decoding it.
+ */
+function runWorker() {
+  let lastInput = null;
+
+  const send = (event) => process.stdout.write(JSON.stringify(event) + '\n');
+
+  const decodeCached = (inputPath) => {
+    const stat = fs.statSync(inputPath);
+    const key = `${path.resolve(inputPath)}\0${stat.size}\0${stat.mtimeMs}`;
+    if (!lastInput || lastInput.key !== key) {
+      lastInput = { key, result: decodeWavFile(inputPath) };
+    }
+    return lastInput.result;
+  };
+
+  const runJob = (line) => {
+    let job;
+    try {
+      job = JSON.parse(line);
+    } catch (error) {
+      send({ id: null, type: 'error', message: `Invalid job: ${error.message}` });
+      return;
+    }
+
+    const id = job.id ?? null;
+    try {
+      if (!job.input) {
+        throw new Error('Job has no input');
+      }
+      if (!fs.existsSync(job.input)) {
+        throw new Error(`Input file not found: ${job.input}`);
+      }
+      let output = job.output;
+      if (!output) {
+        const parsed = path.parse(job.input);
+        output = path.join(parsed.dir, `${parsed.name}_crushed${parsed.ext}`);
+      }
+
+      const effectOptions = resolveEffectOptions(job);
+      const invalid = validateEffectOptions(effectOptions);
+      if (invalid) {
+        throw new Error(invalid);
+      }
+
+      const log = (text) => send({ id, type: 'log', line: text });
+      processWavFile(job.input, output, effectOptions, log, decodeCached);
+      send({ id, type: 'done', output });
+    } catch (error) {
+      send({ id, type: 'error', message: error.message });
+    }
+  };
+
+  const lines = readline.createInterface({ input: process.stdin, terminal: false });
+  lines.on('line', (line) => {
+    if (line.trim()) {
+      runJob(line);
+    }
+  });
+  send({ type: 'ready' });
 }
 
 /**
@@ -164,6 +438,8 @@ program
   .option('-b, --bit-depth <number>', 'Bit depth (1-16)', parseFloat)
   .option('-s, --sample-rate <number>', 'Sample rate reduction factor', parseFloat)
   .option('-m, --mix <number>', 'Wet/dry mix (0.0-1.0)', parseFloat)
+  .option('-f, --format <name>', 'Output format (auto, pcm8, pcm16, pcm24, float32)', 'auto')
+  .option('--dither', 'Add TPDF dither to PCM output')
   .action((input, output, options) => {
     // Determine output path
     if (!output) {
@@ -172,44 +448,21 @@ program
     }
 
     // Determine effect parameters
-    let effectOptions;
+    if (options.preset && !presets[options.preset.toLowerCase()]) {
+      console.error(`Error: Unknown preset "${options.preset}"`);
+      console.log('\nRun "bitcrusher presets" to see available presets');
+      process.exit(1);
+    }
 
+    const effectOptions = resolveEffectOptions(options);
     if (options.preset) {
-      const presetName = options.preset.toLowerCase();
-      if (!presets[presetName]) {
-        console.error(`Error: Unknown preset "${options.preset}"`);
-        console.log('\nRun "bitcrusher presets" to see available presets');
-        process.exit(1);
-      }
-
-      effectOptions = { ...presets[presetName] };
       console.log(`Using preset: ${effectOptions.name}`);
-    } else {
-      effectOptions = {
-        bitDepth: options.bitDepth || 8,
-        sampleRateReduction: options.sampleRate || 4,
-        mix: options.mix !== undefined ? options.mix : 1.0
-      };
     }
 
-    // Override preset values if custom parameters are provided
-    if (options.bitDepth) effectOptions.bitDepth = options.bitDepth;
-    if (options.sampleRate) effectOptions.sampleRateReduction = options.sampleRate;
-    if (options.mix !== undefined) effectOptions.mix = options.mix;
-
     // Validate parameters
-    if (effectOptions.bitDepth < 1 || effectOptions.bitDepth > 16) {
-      console.error('Error: Bit depth must be between 1 and 16');
-      process.exit(1);
-    }
-
-    if (effectOptions.sampleRateReduction < 1) {
-      console.error('Error: Sample rate reduction must be at least 1');
-      process.exit(1);
-    }
-
-    if (effectOptions.mix < 0 || effectOptions.mix > 1) {
-      console.error('Error: Mix must be between 0.0 and 1.0');
+    const invalid = validateEffectOptions(effectOptions);
+    if (invalid) {
+      console.error(`Error: ${invalid}`);
       process.exit(1);
     }
 
@@ -228,6 +481,13 @@ program
     }
   });
 
+program
+  .command('worker')
+  .description('Serve render jobs as line-delimited JSON on stdin/stdout')
+  .action(() => {
+    runWorker();
+  });
+
 program
   .command('presets')
   .description('List all available presets')
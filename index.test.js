@@ -0,0 +1,173 @@
+/**
+ * Tests for the index.js render worker
+ */
+
+import { test, describe } from 'node:test';
+import assert from 'node:assert';
+import { spawn, execFileSync } from 'node:child_process';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import readline from 'readline';
+import wav from 'node-wav';
+
+const indexPath = new URL('./index.js', import.meta.url).pathname;
+
+function writeTestWav(filePath, frequency) {
+  const left = new Float32Array(4000);
+  const right = new Float32Array(4000);
+  for (let i = 0; i < left.length; i++) {
+    left[i] = 0.5 * Math.sin(i * frequency);
+    right[i] = 0.5 * Math.cos(i * frequency);
+  }
+  fs.writeFileSync(filePath, Buffer.from(wav.encode([left, right], { sampleRate: 22050, float: true, bitDepth: 32 })));
+}
+
+/**
+ * Start a worker and collect its events by job id
+ */
+function startWorker() {
+  const child = spawn(process.execPath, [indexPath, 'worker']);
+  const events = [];
+  const waiters = [];
+  readline.createInterface({ input: child.stdout }).on('line', (line) => {
+    events.push(JSON.parse(line));
+    for (const waiter of waiters.splice(0)) waiter();
+  });
+
+  const until = async (predicate) => {
+    while (!events.some(predicate)) {
+      await new Promise((resolve) => waiters.push(resolve));
+    }
+  };
+  const send = (job) => child.stdin.write(JSON.stringify(job) + '\n');
+  return { child, events, until, send };
+}
+
+describe('Output Formats', () => {
+  test('should write each format to within half an LSB of the float render', () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'bitcrusher-'));
+    const input = path.join(dir, 'in.wav');
+    writeTestWav(input, 0.01);
+
+    try {
+      const render = (name, ...args) => {
+        const output = path.join(dir, `${name}.wav`);
+        execFileSync(process.execPath, [indexPath, 'process', input, output, '-p', 'snes', ...args]);
+        return fs.readFileSync(output);
+      };
+      const reference = wav.decode(render('float', '-f', 'float32')).channelData;
+      for (const bitDepth of [8, 16, 24]) {
+        const buffer = render(`pcm${bitDepth}`, '-f', `pcm${bitDepth}`);
+        assert.strictEqual(buffer.readUInt16LE(20), 1);
+        assert.strictEqual(buffer.readUInt16LE(34), bitDepth);
+        assert.strictEqual(buffer.readUInt32LE(40), buffer.length - 44);
+
+        const decoded = wav.decode(buffer).channelData;
+        const lsb = 1 / (Math.pow(2, bitDepth - 1) - 1);
+        for (let i = 0; i < reference[0].length; i++) {
+          assert.ok(Math.abs(decoded[0][i] - reference[0][i]) <= lsb / 2 + 1e-7);
+        }
+      }
+
+      const dithered = render('dithered', '-f', 'pcm8', '--dither');
+      assert.ok(!dithered.equals(render('plain', '-f', 'pcm8')));
+      assert.ok(dithered.equals(render('again', '-f', 'pcm8', '--dither')));
+    } finally {
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+
+  test('should default to the smallest format for a fully wet render', () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'bitcrusher-'));
+    const input = path.join(dir, 'in.wav');
+    writeTestWav(input, 0.01);
+
+    try {
+      const output = path.join(dir, 'out.wav');
+      const log = execFileSync(process.execPath, [indexPath, 'process', input, output, '-b', '4', '-m', '1']);
+      assert.match(log.toString(), /\(8-bit PCM\)/);
+      assert.strictEqual(fs.readFileSync(output).readUInt16LE(34), 8);
+
+      execFileSync(process.execPath, [indexPath, 'process', input, output, '-p', 'nes']);
+      assert.strictEqual(fs.readFileSync(output).readUInt16LE(34), 32);
+    } finally {
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+});
+
+describe('Worker', () => {
+  test('should run queued jobs in order and match the process command', async () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'bitcrusher-'));
+    const input = path.join(dir, 'in.wav');
+    writeTestWav(input, 0.01);
+
+    const worker = startWorker();
+    try {
+      await worker.until((event) => event.type === 'ready');
+      worker.send({ id: 'a', input, output: path.join(dir, 'a.wav'), preset: 'nes' });
+      worker.send({ id: 'b', input, output: path.join(dir, 'b.wav'), bitDepth: 4, mix: 0.5 });
+      await worker.until((event) => event.id === 'b' && event.type === 'done');
+
+      const finished = worker.events.filter((event) => event.type === 'done').map((event) => event.id);
+      assert.deepStrictEqual(finished, ['a', 'b']);
+      assert.ok(worker.events.some((event) => event.id === 'a' && event.line === 'Reading: ' + input));
+
+      execFileSync(process.execPath, [indexPath, 'process', input, path.join(dir, 'cli.wav'), '-p', 'nes']);
+      assert.ok(fs.readFileSync(path.join(dir, 'a.wav')).equals(fs.readFileSync(path.join(dir, 'cli.wav'))));
+    } finally {
+      worker.child.kill();
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+
+  test('should report failed jobs and keep serving', async () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'bitcrusher-'));
+    const input = path.join(dir, 'in.wav');
+    writeTestWav(input, 0.02);
+
+    const worker = startWorker();
+    try {
+      worker.child.stdin.write('not json\n');
+      worker.send({ id: 1, input: path.join(dir, 'missing.wav') });
+      worker.send({ id: 2, input, preset: 'nope' });
+      worker.send({ id: 3, input, mix: 2 });
+      worker.send({ id: 4, input });
+      await worker.until((event) => event.id === 4 && event.type !== 'log');
+
+      const errors = worker.events.filter((event) => event.type === 'error');
+      assert.deepStrictEqual(errors.map((event) => event.id), [null, 1, 2, 3]);
+      assert.match(errors[1].message, /Input file not found/);
+      assert.match(errors[2].message, /Unknown preset "nope"/);
+      assert.ok(worker.events.some((event) => event.id === 4 && event.type === 'done'));
+      assert.ok(fs.existsSync(path.join(dir, 'in_crushed.wav')));
+    } finally {
+      worker.child.kill();
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+
+  test('should re-decode an input that changed since the last job', async () => {
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'bitcrusher-'));
+    const input = path.join(dir, 'in.wav');
+    writeTestWav(input, 0.01);
+
+    const worker = startWorker();
+    try {
+      worker.send({ id: 1, input, output: path.join(dir, '1.wav') });
+      await worker.until((event) => event.id === 1 && event.type === 'done');
+      writeTestWav(input, 0.05);
+      fs.utimesSync(input, new Date(), new Date(Date.now() + 5000));
+      worker.send({ id: 2, input, output: path.join(dir, '2.wav') });
+      await worker.until((event) => event.id === 2 && event.type === 'done');
+
+      execFileSync(process.execPath, [indexPath, 'process', input, path.join(dir, 'cli.wav')]);
+      assert.ok(fs.readFileSync(path.join(dir, '2.wav')).equals(fs.readFileSync(path.join(dir, 'cli.wav'))));
+      assert.ok(!fs.readFileSync(path.join(dir, '1.wav')).equals(fs.readFileSync(path.join(dir, '2.wav'))));
+    } finally {
+      worker.child.kill();
+      fs.rmSync(dir, { recursive: true, force: true });
+    }
+  });
+});
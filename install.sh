@@ -142,6 +142,11 @@ npm install
 # Ensure PyGObject is present for the GUI
 ensure_pygobject
 
+# NumPy powers the in-process audio engine
+echo ""
+echo "Installing NumPy..."
+python3 -m pip install "${PIP_INSTALL_FLAGS[@]}" "numpy>=1.22"
+
 # Install Python package
 echo ""
 echo "Installing Python package..."
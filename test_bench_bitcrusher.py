@@ -0,0 +1,95 @@
+"""
+Unit tests for the Bitcrusher benchmarks
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import bench_bitcrusher as bench
+from bitcrusher import WavReader
+
+
+class TestSyntheticWav(unittest.TestCase):
+    """Synthetic files decode as the format they claim"""
+
+    def test_all_formats_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for fmt in bench.FORMATS:
+                for layout, n_channels in bench.CHANNELS.items():
+                    with self.subTest(fmt=fmt, layout=layout):
+                        path = bench.write_synthetic_wav(
+                            os.path.join(tmpdir, f"{fmt}-{layout}.wav"), n_channels, fmt, 0.5)
+                        with WavReader(path) as reader:
+                            self.assertEqual(reader.n_channels, n_channels)
+                            self.assertEqual(reader.n_frames, 22050)
+                            channels = reader.read(0, reader.n_frames)
+                        # Same signal whatever the encoding, to within 8-bit precision
+                        t = np.arange(22050) / bench.SAMPLE_RATE
+                        sine = 0.5 * np.sin(2 * np.pi * 220 * t)
+                        for channel in channels:
+                            self.assertLess(np.abs(channel - sine).mean(), 0.1)
+                            self.assertLessEqual(np.abs(channel).max(), 1.0)
+
+
+class TestCompare(unittest.TestCase):
+    """Regressions are flagged against a baseline"""
+
+    def result(self, p50, rss):
+        return {"p50_s": p50, "peak_rss_mib": rss}
+
+    def test_flags_slowdowns_and_growth(self):
+        baseline = {"a": self.result(1.0, 100), "b": self.result(1.0, 100)}
+        results = {"a": self.result(1.2, 120), "b": self.result(1.3, 130)}
+        self.assertEqual(bench.compare(results, baseline, tolerance=0.25, rss_tolerance=0.25),
+                         [("b", "p50_s", 1.0, 1.3), ("b", "peak_rss_mib", 100, 130)])
+
+    def test_ignores_skipped_and_new_cases(self):
+        baseline = {"a": {"skipped": "no display"}}
+        results = {"a": self.result(9.0, 900), "new": self.result(9.0, 900)}
+        self.assertEqual(bench.compare(results, baseline), [])
+
+
+class TestMain(unittest.TestCase):
+    """End-to-end run, save and compare"""
+
+    def test_run_and_compare(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "results.json")
+            args = ['--durations', '0.5', '--formats', 'pcm16', '--channels', 'mono',
+                    '--cases', 'load_peaks', 'render/gameboy', 'gui/*',
+                    '--repeat', '2', '--workdir', tmpdir]
+            self.assertEqual(bench.main(args + ['-o', output]), 0)
+            with open(output) as f:
+                results = json.load(f)["results"]
+            self.assertEqual(set(results), {
+                "load_peaks@pcm16/mono/0.5s", "render/gameboy@pcm16/mono/0.5s",
+                "gui/set_waveform@pcm16/mono/0.5s", "gui/draw@pcm16/mono/0.5s"})
+            render = results["render/gameboy@pcm16/mono/0.5s"]
+            self.assertGreater(render["samples_per_s"], 0)
+            self.assertLessEqual(render["min_s"], render["p50_s"])
+
+            # Against itself, with room for noise, nothing regresses
+            self.assertEqual(bench.main(args + ['--baseline', output, '--tolerance', '10',
+                                                '--rss-tolerance', '10']), 0)
+
+            # Against an impossibly fast baseline, the run fails
+            with open(output) as f:
+                report = json.load(f)
+            for result in report["results"].values():
+                if "p50_s" in result:
+                    result["p50_s"] = 1e-9
+            with open(output, 'w') as f:
+                json.dump(report, f)
+            self.assertEqual(bench.main(args + ['--baseline', output]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
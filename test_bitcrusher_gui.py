@@ -2,15 +2,21 @@
 Unit tests for Bitcrusher GUI application
 """
 
+import importlib.util
 import unittest
 import sys
 import os
+import tempfile
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 
+import numpy as np
+
 # Add current directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
+import bitcrusher as bc
+
 
 class TestBitcrusherWindow(unittest.TestCase):
     """Test BitcrusherWindow class"""
@@ -41,8 +47,6 @@ class TestBitcrusherWindow(unittest.TestCase):
 
     def test_preset_values_match_names(self):
         """Test that preset values and names are aligned"""
-        import bitcrusher as bc_module
-
         # The preset values list
         preset_values = ["custom", "gameboy", "nes", "sega", "snes",
                         "c64", "atari", "mild", "heavy", "extreme"]
@@ -87,6 +91,271 @@ class TestBitcrusherWindow(unittest.TestCase):
         self.assertEqual(output, "/home/user/my audio_crushed.wav")
 
 
+class FakeTextBuffer:
+    """Just enough of Gtk.TextBuffer for StatusLog, with offsets as iters"""
+
+    def __init__(self):
+        self.text = ""
+        self.marks = {}
+
+    def get_start_iter(self):
+        return 0
+
+    def get_end_iter(self):
+        return len(self.text)
+
+    def get_line_count(self):
+        return self.text.count("\n") + 1
+
+    def get_iter_at_line(self, line):
+        offset = 0
+        for _ in range(line):
+            offset = self.text.index("\n", offset) + 1
+        return True, offset
+
+    def insert(self, offset, text):
+        self.text = self.text[:offset] + text + self.text[offset:]
+
+    def delete(self, start, end):
+        self.text = self.text[:start] + self.text[end:]
+
+    def set_text(self, text):
+        self.text = text
+
+    def create_mark(self, name, offset, left_gravity):
+        self.marks[name] = offset
+        return name
+
+    def move_mark(self, mark, offset):
+        self.marks[mark] = offset
+
+
+class TestStatusLog(unittest.TestCase):
+    """Test the bounded processing console sink"""
+
+    def setUp(self):
+        self.saved_modules = {name: sys.modules.get(name) for name in
+                              ['gi', 'gi.repository', 'bitcrusher_gui']}
+        sys.modules['gi'] = MagicMock()
+        sys.modules['gi.repository'] = MagicMock()
+        sys.modules.pop('bitcrusher_gui', None)
+        import bitcrusher_gui
+        self.gui = bitcrusher_gui
+
+        self.buffer = FakeTextBuffer()
+        self.view = MagicMock()
+        self.view.get_buffer.return_value = self.buffer
+        self.view.get_mapped.return_value = False
+
+    def tearDown(self):
+        for name, module in self.saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    def test_batches_lines_until_flush(self):
+        """Test that posted lines reach the buffer together on flush"""
+        log = self.gui.StatusLog(self.view)
+        log.post("one\n")
+        log.post("two\n")
+        self.assertEqual(self.buffer.text, "")
+        log.flush()
+        self.assertEqual(self.buffer.text, "one\ntwo\n")
+        self.assertEqual(self.view.scroll_to_mark.call_count, 1)
+
+    def test_keeps_last_lines_and_one_mark(self):
+        """Test that the buffer is trimmed like a ring and the mark is reused"""
+        log = self.gui.StatusLog(self.view, max_lines=3)
+        for i in range(10):
+            log.post(f"line {i}\n")
+            if i % 4 == 0:
+                log.flush()
+        log.flush()
+        self.assertEqual(self.buffer.text, "line 7\nline 8\nline 9\n")
+        self.assertEqual(list(self.buffer.marks), ["status-end"])
+        self.assertEqual(self.buffer.marks["status-end"], len(self.buffer.text))
+
+    def test_clear_drops_pending_lines(self):
+        """Test that clearing discards lines not yet flushed"""
+        log = self.gui.StatusLog(self.view)
+        log.post("old\n")
+        log.clear()
+        log.post("new\n")
+        log.flush()
+        self.assertEqual(self.buffer.text, "new\n")
+
+
+class TestFormatStats(unittest.TestCase):
+    """Test the performance panel text"""
+
+    def setUp(self):
+        self.saved_modules = {name: sys.modules.get(name) for name in
+                              ['gi', 'gi.repository', 'bitcrusher_gui']}
+        sys.modules['gi'] = MagicMock()
+        sys.modules['gi.repository'] = MagicMock()
+        sys.modules.pop('bitcrusher_gui', None)
+        import bitcrusher_gui
+        self.gui = bitcrusher_gui
+
+    def tearDown(self):
+        for name, module in self.saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    def test_latest_operations_with_slowest_stage_first(self):
+        """Test one line per operation, stages by time, then peak memory"""
+        stats = {
+            "latest": {
+                "render": {"seconds": 2.5, "args": {},
+                           "stages": {"decode": 0.2, "dsp": 1.9, "write": 0.004}},
+                "preroll": {"seconds": 0.03, "args": {}, "stages": {}},
+            },
+            "totals": {},
+            "peak_rss_bytes": 150 * 2 ** 20,
+        }
+        lines = self.gui.format_stats(stats).splitlines()
+        self.assertEqual(lines[0].split(), ["preroll", "30.0", "ms"])
+        self.assertEqual(lines[1].split()[:3], ["render", "2.50", "s"])
+        self.assertIn("dsp 1.90 s · decode 200.0 ms · write 4.0 ms", lines[1])
+        self.assertEqual(lines[2], "Peak memory: 150.0 MiB")
+
+    def test_empty(self):
+        """Test the panel before anything has been timed"""
+        text = self.gui.format_stats({"latest": {}, "totals": {}, "peak_rss_bytes": 0})
+        self.assertEqual(text, "No timings yet\nPeak memory: 0.0 MiB")
+
+
+class FakeDrawingArea:
+    """Just enough of Gtk.DrawingArea for WaveformWidget, recording its height"""
+
+    def __init__(self):
+        self.content_height = None
+
+    def set_content_height(self, height):
+        self.content_height = height
+
+    def set_draw_func(self, func):
+        pass
+
+    def add_controller(self, controller):
+        pass
+
+    def queue_draw(self):
+        pass
+
+    def get_width(self):
+        return 400
+
+    def get_scale_factor(self):
+        return 2
+
+
+class TestWindowLogic(unittest.TestCase):
+    """Test window and widget logic against stand-in GTK base classes"""
+
+    def setUp(self):
+        self.saved_modules = {name: sys.modules.get(name) for name in
+                              ['gi', 'gi.repository', 'bitcrusher_gui']}
+        repository = MagicMock()
+        repository.Gtk.DrawingArea = FakeDrawingArea
+        repository.Adw.ApplicationWindow = type("ApplicationWindow", (), {})
+        repository.Adw.Application = type("Application", (), {})
+        sys.modules['gi'] = MagicMock()
+        sys.modules['gi.repository'] = repository
+        sys.modules.pop('bitcrusher_gui', None)
+        import bitcrusher_gui
+        self.gui = bitcrusher_gui
+
+    def tearDown(self):
+        for name, module in self.saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    def test_selection_skips_whole_file_rerenders(self):
+        """Test that settings changes leave a selection's render in place"""
+        window = MagicMock()
+        window.preview = None
+        window.input_file = "/tmp/in.wav"
+        window.selected_region.return_value = (100, 200)
+        Window = self.gui.BitcrusherWindow
+
+        self.assertIsNone(Window.cached_render(window))
+        window.render_cache.get.assert_not_called()
+
+        window.cached_render.return_value = None
+        Window.on_params_changed(window)
+        self.gui.GLib.timeout_add.assert_not_called()
+
+        window.rerender_generation = 1
+        window.render_thread = None
+        Window.on_rerendered(window, 1, MagicMock())
+        window.show_rendered.assert_not_called()
+
+        window.selected_region.return_value = None
+        Window.on_params_changed(window)
+        self.gui.GLib.timeout_add.assert_called_once()
+
+    def test_thumbnail_keeps_its_height(self):
+        """Test that an audition thumbnail stays small once its peaks arrive"""
+        thumb = self.gui.WaveformWidget(self.gui.AUDITION_THUMB_HEIGHT)
+        self.assertEqual(thumb.content_height, self.gui.AUDITION_THUMB_HEIGHT)
+        thumb.set_waveform(np.sin(np.arange(5000, dtype=np.float32) / 10))
+        self.assertEqual(thumb.content_height, self.gui.AUDITION_THUMB_HEIGHT)
+
+        waveform = self.gui.WaveformWidget()
+        waveform.set_waveform(np.zeros(5000, dtype=np.float32) + 0.5)
+        self.assertEqual(waveform.content_height, self.gui.WAVEFORM_HEIGHT)
+
+
+    @unittest.skipUnless(importlib.util.find_spec("cairo"), "pycairo not installed")
+    def test_waveform_cache_is_a_scaled_image(self):
+        """Test that the static waveform is rasterized once at the scale factor"""
+        import cairo
+        widget = self.gui.WaveformWidget()
+        widget.set_waveform(np.sin(np.arange(5000, dtype=np.float32) / 10))
+        target = cairo.ImageSurface(cairo.FORMAT_ARGB32, 400, 120)
+        widget.on_draw(widget, cairo.Context(target), 400, 120)
+        cache = widget.waveform_cache
+        self.assertIsInstance(cache, cairo.ImageSurface)
+        self.assertEqual((cache.get_width(), cache.get_height()), (800, 240))
+
+        widget.on_draw(widget, cairo.Context(target), 400, 120)
+        self.assertIs(widget.waveform_cache, cache)
+        widget.set_view(1000, 2000)
+        widget.on_draw(widget, cairo.Context(target), 400, 120)
+        self.assertIsNot(widget.waveform_cache, cache)
+
+    def test_streamed_render_shows_the_file_it_wrote(self):
+        """Test that a finished render ignores an output picked while it ran"""
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        written = os.path.join(tmpdir.name, "written.wav")
+        bc.write_wav(written, np.full((2, 3000), 0.25, dtype=np.float32), 22050)
+
+        window = MagicMock()
+        window.output_file = os.path.join(tmpdir.name, "picked-later.wav")
+        window.preview = None
+        window.lanes_switch.get_active.return_value = False
+        Window = self.gui.BitcrusherWindow
+        peaks = MagicMock()
+
+        Window.on_render_done(window, True, None, written, None, peaks)
+        window.status_label.set_text.assert_called_with("✓ Success! Saved to: written.wav")
+        window.finish_processing.assert_called_once_with(True, None, peaks, written)
+
+        Window.finish_processing(window, True, None, peaks, written)
+        window.show_streamed.assert_called_once_with(peaks, written)
+
+        Window.show_streamed(window, peaks, written)
+        stream = window.show_processed.call_args.args[2]
+        self.assertEqual(stream.reader.filepath, written)
+
+
 class TestCommandBuilding(unittest.TestCase):
     """Test command building logic"""
 